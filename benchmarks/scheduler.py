@@ -0,0 +1,76 @@
+#!/bin/env python
+"""
+Goal scheduler at scale: heap build, daily focus set, and incremental updates over tens of thousands of goals.
+
+usage: python benchmarks/scheduler.py [--goals 50000] [--updates 10000]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from journal import scheduler
+
+
+def synthetic_goals(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime.datetime(2020, 1, 1)
+    return [{
+        "id": i,
+        "prompt_type": "goal",
+        "name": "goal {0}".format(i),
+        "description": "synthetic goal",
+        "priority": rng.randint(1, 10),
+        "effort": rng.randint(1, 60),
+        "date": str(start + datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 5)))
+    } for i in range(n)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Goal scheduler benchmark")
+    parser.add_argument("--goals", type=int, default=50000)
+    parser.add_argument("--updates", type=int, default=10000)
+    parser.add_argument("--focus", type=int, default=scheduler.FOCUS_SIZE)
+    args = parser.parse_args(argv)
+
+    goals = synthetic_goals(args.goals)
+    rng = random.Random(1)
+    counts = {g["id"]: rng.randint(0, 20) for g in goals}
+
+    t = time.perf_counter()
+    schedule = scheduler.GoalScheduler.from_goals(goals, counts)
+    build_ms = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    for _ in range(100):
+        schedule.focus(args.focus)
+    focus_us = (time.perf_counter() - t) / 100 * 1e6
+
+    t = time.perf_counter()
+    for _ in range(args.updates):
+        goal_id = rng.randrange(args.goals)
+        if rng.random() < 0.5:
+            schedule.reselected(goal_id)
+        else:
+            goal = dict(schedule.entries[goal_id][3], priority=rng.randint(1, 10))
+            schedule.update(goal)
+    update_us = (time.perf_counter() - t) / args.updates * 1e6
+
+    t = time.perf_counter()
+    schedule.focus(args.focus)
+    focus_after_us = (time.perf_counter() - t) * 1e6
+
+    print("goals:                    {0}".format(args.goals))
+    print("build (heapify):          {0:10.2f} ms".format(build_ms))
+    print("focus({0}):                 {1:10.2f} us".format(args.focus, focus_us))
+    print("incremental update:       {0:10.2f} us/update ({1} updates)".format(update_us, args.updates))
+    print("focus after updates:      {0:10.2f} us".format(focus_after_us))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/bin/env python
+"""
+Load test for 'journal serve': many simulated users run a full session at once, each over its own keep-alive connection.
+
+With no --port/--unix, a server is started in-process on a temporary directory.
+
+usage: python benchmarks/serve_load.py [--users 200] [--port 8765 | --unix PATH] [--seed 0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from synthetic import sentence
+
+from journal import PROMPTS_TOML, QUOTES_TOML, catalog, server
+
+
+def synthetic_answer(prompt, rng):
+    if prompt["category"] == "bool":
+        return rng.random() < 0.6
+    elif prompt["category"] in ("text", "singleline"):
+        return sentence(rng)
+    elif prompt["category"] == "multiline":
+        return [sentence(rng) for _ in range(rng.randint(0, 4))]
+    return [[rng.randint(0, 10), sentence(rng)] for _ in range(rng.randint(0, 3))]
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write("{0} {1} HTTP/1.1\r\nHost: journal\r\nContent-Type: application/json\r\nContent-Length: {2}\r\n\r\n".format(method, path, len(body)).encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def user_session(user, address, rng, latencies):
+    if type(address) is str:
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(*address)
+    t = time.perf_counter()
+    status, state = await request(reader, writer, "POST", "/sessions", {"user": user})
+    latencies.append(time.perf_counter() - t)
+    if status not in (200, 201):
+        raise RuntimeError("{0}: {1}".format(user, state))
+    while state["next"] is not None:
+        t = time.perf_counter()
+        status, state = await request(reader, writer, "POST", "/sessions/{0}/answers".format(state["session"]), {"answer": synthetic_answer(state["next"], rng)})
+        latencies.append(time.perf_counter() - t)
+        if status != 200:
+            raise RuntimeError("{0}: {1}".format(user, state))
+    writer.close()
+    return state["file"]
+
+
+async def run(args):
+    journal_server = None
+    if args.port is None and args.unix is None:
+        root = tempfile.mkdtemp(prefix="journal_serve_")
+        prompts, quots = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML)
+        ready = asyncio.get_running_loop().create_future()
+        journal_server = asyncio.create_task(server.JournalServer(root, prompts).serve("127.0.0.1", 0, ready=ready))
+        address = (await ready).sockets[0].getsockname()[:2]
+    else:
+        address = args.unix if args.unix is not None else (args.host, args.port)
+    rng = random.Random(args.seed)
+    latencies = []
+    t0 = time.perf_counter()
+    files = await asyncio.gather(*(user_session("user{0:05d}".format(i), address, random.Random(rng.random()), latencies) for i in range(args.users)))
+    elapsed = time.perf_counter() - t0
+    if journal_server is not None:
+        journal_server.cancel()
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100)
+    print("users: {0}  sessions written: {1}  requests: {2}".format(args.users, sum(f is not None for f in files), len(latencies)))
+    print("elapsed: {0:.2f}s  {1:.0f} requests/s  {2:.1f} sessions/s".format(elapsed, len(latencies) / elapsed, args.users / elapsed))
+    print("latency ms: p50 {0:.2f}  p95 {1:.2f}  p99 {2:.2f}  max {3:.2f}".format(q[49] * 1000, q[94] * 1000, q[98] * 1000, latencies[-1] * 1000))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for 'journal serve'")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--unix", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
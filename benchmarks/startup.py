@@ -0,0 +1,76 @@
+#!/bin/env python
+"""
+Cold start budget for the `journal` console entry point.
+
+Runs `python -X importtime -c "import journal"` in a fresh interpreter and fails (exit status 1) when:
+  - any of the heavy prompt dependencies is imported eagerly, or
+  - the cumulative import time of the journal package exceeds the budget (best of --runs)
+
+usage: python benchmarks/startup.py [--budget-ms 150] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = (
+    "inquirer",
+    "prompt_toolkit",
+    "pygments",
+    "rich.console",
+    "rich.markdown",
+    "jsonschema",
+    "pydantic",
+    "yaml",
+    "journal.prompts",
+    "journal.render",
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importtime(module="journal"):
+    """
+    Return ({module_name: cumulative_us}, stderr) for a cold import of 'module'
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import {0}".format(module)],
+                          capture_output=True, text=True, env=env, cwd=REPO_ROOT)
+    if proc.returncode != 0:
+        raise RuntimeError("benchmarks/startup.py: 'import {0}' failed\n{1}".format(module, proc.stderr))
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        timings[name.strip()] = int(cumulative_us)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start import budget for journal.py")
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="Maximum cumulative 'import journal' time (ms)")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold imports; the fastest is compared to the budget")
+    args = parser.parse_args(argv)
+
+    best = None
+    eager = set()
+    for _ in range(args.runs):
+        timings = importtime()
+        eager.update(m for m in HEAVY_MODULES if m in timings)
+        total = timings["journal"] / 1000.0
+        best = total if best is None else min(best, total)
+
+    sys.stderr.write("import journal: {0:.1f} ms (budget {1:.1f} ms, best of {2})\n".format(best, args.budget_ms, args.runs))
+    failed = False
+    if eager:
+        sys.stderr.write("FAIL: heavy modules imported at startup: {0}\n".format(", ".join(sorted(eager))))
+        failed = True
+    if best > args.budget_ms:
+        sys.stderr.write("FAIL: cold start exceeded the budget by {0:.1f} ms\n".format(best - args.budget_ms))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+#!/bin/env python
+"""
+Benchmark suite for the hot paths, with machine-readable baselines.
+
+Groups (all inputs are scripted; nothing waits on a terminal):
+  startup  : cold (empty cache) and warm `journal quote` in a fresh interpreter
+  prompts  : per-prompt overhead of each helpers.prompt_* (schema validation, pydantic model vs journal.records record, banner rendering,
+             full call from a prompt data dict and from a compiled record)
+  yaml     : the journal_metadata YAML dump (pure Python and libyaml emitters) and a full headless make_prompts session
+  goals    : create_goal_list over 10 / 1k / 100k goals, without and with a GoalStore
+  history  : parsing N years of synthetic journal_metadata_*.yaml files, and building the columnar, habit and related-entries indexes from them
+
+Every result is in milliseconds per operation (lower is better).
+
+usage: python benchmarks/suite.py [--only startup,prompts,...] [--years 2] [--save results.json] [--compare baseline.json] [--tolerance 0.25]
+
+--compare exits with status 1 when a result is slower than the baseline by more than the tolerance (and by more than --min-ms).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from synthetic import synthetic_day, write_history
+from scheduler import synthetic_goals
+
+import journal
+from journal import PROMPTS_TOML, QUOTES_TOML, catalog, helpers, schemas, sources, banners, history, ingest, goals, records, prompts as prompt_models
+
+GROUPS = ("startup", "prompts", "yaml", "goals", "history")
+
+PROMPT_FUNCS = {
+    "boolean": helpers.prompt_boolean,
+    "text": helpers.prompt_text,
+    "singleline": helpers.prompt_singleline,
+    "multiline": helpers.prompt_multiline,
+    "belief": helpers.prompt_belief_list,
+}
+
+
+def per_op(func, n:int=None, budget:float=0.2):
+    """
+    Milliseconds per call of func(), repeated n times (or for about 'budget' seconds), best of 3. A call slower than the budget is timed once.
+    """
+    if n is None:
+        start = time.perf_counter()
+        func()
+        once = time.perf_counter() - start
+        if once >= budget:
+            return once * 1000.0
+        n = max(1, min(100000, int(budget / max(once, 1e-7))))
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(n):
+            func()
+        elapsed = (time.perf_counter() - start) / n * 1000.0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def wall_ms(argv:list, env:dict, runs:int):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, env=env, cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = (time.perf_counter() - start) * 1000.0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+"""
+Groups
+"""
+
+def bench_startup(args, results):
+    cache = tempfile.mkdtemp(prefix="journal_bench_cache_")
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""), XDG_CACHE_HOME=cache)
+    argv = [sys.executable, "-c", "import journal; journal.cli(['quote'])"]
+    cold = []
+    for _ in range(args.runs):
+        shutil.rmtree(os.path.join(cache, "journal"), ignore_errors=True)
+        cold.append(wall_ms(argv, env, 1))
+    results["startup.cold_cli"] = min(cold)
+    results["startup.warm_cli"] = wall_ms(argv, env, args.runs)
+    results["startup.import"] = wall_ms([sys.executable, "-c", "import journal"], env, args.runs)
+    results["startup.interpreter"] = wall_ms([sys.executable, "-c", "pass"], env, args.runs)
+    shutil.rmtree(cache, ignore_errors=True)
+
+
+def bench_prompts(args, results, prompts):
+    rng = random.Random(0)
+    answers = dict(synthetic_day(prompts, rng))
+    for category in ("bool", "text", "singleline", "multiline", "belieflist"):
+        name, prompt_data = next(iter(prompts[category].items()))
+        prompt_type = prompt_data["prompt_type"]
+        model = getattr(prompt_models, records.MODELS[prompt_type])
+        prompt = records.record(prompt_data, prompt_type)
+        value = answers.get(prompt_data["prompt"], [] if prompt_type in ("multiline", "belief") else "x")
+        source = sources.RecordedSource([[prompt_data["prompt"], value]])
+        func = PROMPT_FUNCS[prompt_type]
+        results["prompts.{0}.validate".format(prompt_type)] = per_op(lambda: schemas.validate(prompt_data, prompt_type))
+        results["prompts.{0}.pydantic".format(prompt_type)] = per_op(lambda: model(**prompt_data))
+        results["prompts.{0}.record".format(prompt_type)] = per_op(lambda: records.record(prompt_data, prompt_type))
+        results["prompts.{0}.call".format(prompt_type)] = per_op(lambda: func(prompt_data, validate=False, source=source))
+        results["prompts.{0}.call_record".format(prompt_type)] = per_op(lambda: func(prompt, validate=False, source=source))
+        results["prompts.{0}.call_validated".format(prompt_type)] = per_op(lambda: func(prompt_data, validate=True, source=source))
+    description = next(iter(prompts["text"].values()))["description"]
+    results["prompts.banner.pygments"] = per_op(lambda: journal.helpers.render.description_banner(description))
+    results["prompts.banner.cached"] = per_op(lambda: banners.banner(description))
+    results["prompts.validate_catalog"] = per_op(lambda: schemas.validate_catalog(prompts))
+
+
+def bench_yaml(args, results, prompts):
+    yaml = history.yaml
+    day = synthetic_day(prompts, random.Random(1))
+    results["yaml.dump_python"] = per_op(lambda: yaml.dump(day, Dumper=yaml.Dumper, sort_keys=False))
+    results["yaml.dump_libyaml"] = per_op(lambda: yaml.dump(day, Dumper=history.yaml_dumper(), sort_keys=False))
+    journal_dir = tempfile.mkdtemp(prefix="journal_bench_yaml_")
+    date = datetime.date(2025, 1, 1)
+    results["yaml.make_prompts_headless"] = per_op(lambda: journal.make_prompts(prompts, validated=True, source=sources.RecordedSource(day), date=date, journal_dir=journal_dir))
+    shutil.rmtree(journal_dir, ignore_errors=True)
+
+
+def bench_goals(args, results):
+    for n in args.goal_counts:
+        pool = synthetic_goals(n)
+        for g in pool:
+            g.pop("id")
+        selected = [g["name"] for g in pool[::2]]
+        new = [{"name": "new goal", "description": "benchmark", "priority": 5, "effort": 3}]
+        source = sources.RecordedSource([], goals={"selected": selected, "new": new})
+        results["goals.create_goal_list.{0}".format(n)] = per_op(lambda: helpers.create_goal_list(pool, source=source))
+        db = tempfile.mkdtemp(prefix="journal_bench_goals_")
+        store = goals.GoalStore(os.path.join(db, "goals.sqlite3"))
+        with store.conn:
+            store.conn.executemany("INSERT INTO goals (prompt_type, name, description, priority, effort, date) VALUES (?, ?, ?, ?, ?, ?)",
+                                   [tuple(g[f] for f in goals.GOAL_FIELDS) for g in pool])
+        active = store.active()
+        start = time.perf_counter()
+        helpers.create_goal_list(active, store=store, source=source)
+        results["goals.create_goal_list_store.{0}".format(n)] = (time.perf_counter() - start) * 1000.0
+        store.close()
+        shutil.rmtree(db, ignore_errors=True)
+
+
+def bench_history(args, results):
+    from journal import columnar, archive, habits
+
+    journal_dir = tempfile.mkdtemp(prefix="journal_bench_history_")
+    n = write_history(journal_dir, years=args.years, seed=0, end=datetime.date(2025, 12, 31))
+    days = history.list_days(journal_dir)
+    start = time.perf_counter()
+    for day in days:
+        history.load_day(day)
+    results["history.load_day_serial"] = (time.perf_counter() - start) * 1000.0
+    start = time.perf_counter()
+    for day, answers in ingest.iter_days(days):
+        pass
+    results["history.iter_days"] = (time.perf_counter() - start) * 1000.0
+    start = time.perf_counter()
+    columnar.ColumnStore.open(journal_dir)
+    results["history.columnar_build"] = (time.perf_counter() - start) * 1000.0
+    start = time.perf_counter()
+    columnar.ColumnStore.open(journal_dir)
+    results["history.columnar_open"] = (time.perf_counter() - start) * 1000.0
+    start = time.perf_counter()
+    store = habits.HabitStore.open(journal_dir)
+    results["history.habits_build"] = (time.perf_counter() - start) * 1000.0
+    start = time.perf_counter()
+    habits.HabitStore.open(journal_dir)
+    results["history.habits_open"] = (time.perf_counter() - start) * 1000.0
+    end = days[-1].date
+    results["history.habits_streaks"] = per_op(lambda: [store.streaks(p, end=end) for p in store.habits])
+    results["history.habits_rates"] = per_op(lambda: [store.rate(p, w, end=end) for p in store.habits for w in habits.RATE_WINDOWS])
+    results["history.habits_heatmap"] = per_op(lambda: [store.heatmap(p, 52, end) for p in store.habits])
+    try:
+        from journal import related
+    except ImportError:
+        related = None
+    if related is not None:
+        start = time.perf_counter()
+        index = related.RelatedIndex.open(journal_dir)
+        results["history.related_build"] = (time.perf_counter() - start) * 1000.0
+        start = time.perf_counter()
+        index = related.RelatedIndex.open(journal_dir)
+        index.matrix()
+        results["history.related_open"] = (time.perf_counter() - start) * 1000.0
+        texts = [related.answer_document(value) for prompt, value in history.load_day(days[-1])]
+        texts = [t for t in texts if t is not None]
+        results["history.related_query"] = per_op(lambda: [index.related(t, before=end) for t in texts]) / len(texts)
+    start = time.perf_counter()
+    archive.archive(journal_dir)
+    results["history.archive"] = (time.perf_counter() - start) * 1000.0
+    days = history.list_days(journal_dir)
+    results["history.list_days_archived"] = per_op(lambda: history.list_days(journal_dir))
+    results["history.read_day_archived"] = per_op(lambda: archive.read_day(days[0].segment, days[0].date))
+    start = time.perf_counter()
+    columnar.ColumnStore.open(journal_dir)
+    results["history.columnar_open_archived"] = (time.perf_counter() - start) * 1000.0
+    results["history.days"] = n
+    shutil.rmtree(journal_dir, ignore_errors=True)
+
+
+"""
+Baselines
+"""
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results:dict, baseline:dict, tolerance:float, min_ms:float):
+    """
+    [(name, baseline, current, ratio)] for the results slower than the baseline by more than the tolerance
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None or name.endswith(".days"):
+            continue
+        ratio = current / before if before > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance and current - before > min_ms:
+            regressions.append((name, before, current, ratio))
+            flag = "  REGRESSION"
+        print("{0:45s} {1:12.4f} {2:12.4f} {3:7.2f}x{4}".format(name, before, current, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="journal.py benchmark suite")
+    parser.add_argument("--only", default=",".join(GROUPS), help="Comma-separated groups to run (default: all)")
+    parser.add_argument("--years", type=float, default=2, help="Years of synthetic history for the 'history' group")
+    parser.add_argument("--goal-counts", type=lambda s: [int(x) for x in s.split(",")], default=[10, 1000, 100000])
+    parser.add_argument("--runs", type=int, default=5, help="Subprocess runs for the 'startup' group (best of)")
+    parser.add_argument("--save", default=None, help="Write the results as JSON to this path")
+    parser.add_argument("--compare", default=None, help="Baseline JSON written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a result counts as a regression")
+    parser.add_argument("--min-ms", type=float, default=0.01, help="Ignore slowdowns smaller than this many ms")
+    args = parser.parse_args(argv)
+
+    groups = [g for g in args.only.split(",") if g != ""]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error("unknown groups: {0}".format(", ".join(sorted(unknown))))
+    prompts = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML, use_cache=False).prompts
+    results = {}
+    for group in groups:
+        start = time.perf_counter()
+        if group == "startup":
+            bench_startup(args, results)
+        elif group == "prompts":
+            bench_prompts(args, results, prompts)
+        elif group == "yaml":
+            bench_yaml(args, results, prompts)
+        elif group == "goals":
+            bench_goals(args, results)
+        elif group == "history":
+            bench_history(args, results)
+        sys.stderr.write("{0}: {1:.1f}s\n".format(group, time.perf_counter() - start))
+
+    report = {
+        "meta": {
+            "date": str(datetime.datetime.now()),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.save is not None:
+        with open(args.save, 'w') as ofile:
+            json.dump(report, ofile, indent=2)
+        sys.stderr.write("Saved {0} results to '{1}'\n".format(len(results), args.save))
+    if args.compare is not None:
+        with open(args.compare, 'r') as ifile:
+            baseline = json.load(ifile)
+        print("{0:45s} {1:>12s} {2:>12s} {3:>8s}".format("benchmark (ms)", "baseline", "current", "ratio"))
+        regressions = compare(results, baseline["results"], args.tolerance, args.min_ms)
+        if regressions:
+            sys.stderr.write("{0} regression(s) against '{1}' (commit {2})\n".format(len(regressions), args.compare, baseline["meta"].get("commit")))
+            return 1
+        return 0
+    for name, value in sorted(results.items()):
+        print("{0:45s} {1:12.4f}".format(name, value))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#!/bin/env python
+"""
+Synthetic journal history for the benchmarks: one journal_metadata_YYYY_MM_DD.yaml per day, answering the prompts.toml catalog.
+
+usage: python benchmarks/synthetic.py OUTPUT_DIR [--years 5] [--seed 0]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tomllib
+
+import yaml
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from journal import PROMPTS_TOML, SAMPLE_MULTILINE
+
+WORDS = ("morning walk coffee mom dad code python guitar worry work goal plan sleep cook friends call "
+         "run lift read write lecture meeting anxiety calm focus budget groceries project paper review").split()
+
+
+def sentence(rng, n=12):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, n)))
+
+
+def synthetic_day(prompts, rng):
+    """
+    The [prompt, answer] pairs of one synthetic session
+    """
+    answers = []
+    for p in prompts["bool"].values():
+        answers.append([p["prompt"], rng.random() < 0.6])
+    for p in prompts["text"].values():
+        answers.append([p["prompt"], sentence(rng, 60)])
+    for p in prompts["singleline"].values():
+        answers.append([p["prompt"], sentence(rng)])
+    for p in rng.sample(list(prompts["multiline"].values()), SAMPLE_MULTILINE):
+        answers.append([p["prompt"], [sentence(rng) for _ in range(rng.randint(0, 4))]])
+    for p in prompts["belieflist"].values():
+        answers.append([p["prompt"], [[rng.choice([rng.randint(0, 10), round(rng.uniform(0, 10), 1)]), sentence(rng)] for _ in range(rng.randint(0, 3))]])
+    return answers
+
+
+def write_history(output_dir, years=5, seed=0, end=None):
+    """
+    Write 'years' years of daily files ending at 'end' (default: yesterday). Returns the number of files written.
+    """
+    with open(PROMPTS_TOML, 'rb') as ifile:
+        prompts = tomllib.load(ifile)
+    rng = random.Random(seed)
+    end = end if end is not None else datetime.date.today() - datetime.timedelta(days=1)
+    os.makedirs(output_dir, exist_ok=True)
+    n = 0
+    for i in range(int(365 * years)):
+        date = end - datetime.timedelta(days=i)
+        if rng.random() < 0.1: # Skipped days
+            continue
+        path = os.path.join(output_dir, "journal_metadata_{0}.yaml".format(str(date).replace("-", "_")))
+        with open(path, 'w') as ofile:
+            yaml.dump(synthetic_day(prompts, rng), ofile, sort_keys=False)
+        n += 1
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic journal history")
+    parser.add_argument("output_dir")
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    n = write_history(args.output_dir, years=args.years, seed=args.seed)
+    sys.stderr.write("Wrote {0} days to '{1}'\n".format(n, args.output_dir))
+
+
+if __name__ == '__main__':
+    main()
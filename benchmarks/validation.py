@@ -0,0 +1,68 @@
+#!/bin/env python
+"""
+Schema validation cost per journal session, before and after the compiled/cached validators.
+
+before: jsonschema.validate(prompt_data, schema) for every prompt asked in a session (metaschema check + new validator each call)
+after:  journal.schemas.validate_catalog(prompts) once per session, prompts then skip validation
+
+usage: python benchmarks/validation.py [--sessions 50]
+"""
+import argparse
+import os
+import sys
+import time
+import tomllib
+
+import jsonschema
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from journal import schemas, PROMPTS_TOML, SAMPLE_MULTILINE
+
+
+def session_prompts(prompts):
+    """
+    The prompts asked in one session of journal.make_prompts
+    """
+    asked = list(prompts["bool"].values()) + list(prompts["text"].values()) + list(prompts["singleline"].values())
+    asked += list(prompts["multiline"].values())[:SAMPLE_MULTILINE]
+    asked += list(prompts["belieflist"].values())
+    return asked
+
+
+def before(prompts):
+    for prompt_data in session_prompts(prompts):
+        jsonschema.validate(prompt_data, schemas.prompt_schemas[prompt_data["prompt_type"]])
+
+
+def after(prompts):
+    schemas.validate_catalog(prompts)
+
+
+def timeit(func, prompts, sessions):
+    start = time.perf_counter()
+    for _ in range(sessions):
+        func(prompts)
+    return (time.perf_counter() - start) / sessions * 1000.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validation cost per journal session")
+    parser.add_argument("--sessions", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    with open(PROMPTS_TOML, 'rb') as ifile:
+        prompts = tomllib.load(ifile)
+    after(prompts) # compile once, outside of the timing
+
+    before_ms = timeit(before, prompts, args.sessions)
+    after_ms = timeit(after, prompts, args.sessions)
+    print("prompts per session:     {0}".format(len(session_prompts(prompts))))
+    print("before (per-prompt):     {0:8.3f} ms/session".format(before_ms))
+    print("after (catalog, cached): {0:8.3f} ms/session".format(after_ms))
+    print("speedup:                 {0:8.1f}x".format(before_ms / after_ms))
+
+
+if __name__ == '__main__':
+    main()
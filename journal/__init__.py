@@ -21,26 +21,28 @@
 # PACKAGES
 ####################
 import os
-#import argparse
+import argparse
 import sys
 
 import datetime
+import time
 import random
 import copy
 from pathlib import Path
 
 import tomllib
-import yaml
 import json
 
-from rich.console import Console
-from rich.markdown import Markdown
-
 import logging
 import logging.config
 
 
-from journal import helpers, affirmations
+from journal.lazy import lazy_import
+
+yaml = lazy_import("yaml")
+habits = lazy_import("journal.habits")
+
+from journal import helpers, affirmations, schemas, catalog, answerlog, history, goals, scheduler, banners, sampler, tracing, records, preload, dictionary
 
 
 
@@ -55,11 +57,11 @@ JOURNAL_DIR = "/ffast/Documents/orgs/journal"
 PROMPTS_TOML = os.path.join(os.path.dirname(__file__), "prompts.toml")
 QUOTES_TOML  = os.path.join(os.path.dirname(__file__), "quotes.toml")
 GOALS_JSON   = os.path.join(os.path.dirname(__file__), "goals.json")
+GOALS_DB     = os.path.join(os.path.dirname(__file__), "goals.sqlite3")
 #GOALS_JSON   = os.path.join(Path.home(), ".goals.json")
 
 SAMPLE_MULTILINE = 3
-
-console = Console()
+RELATED_ENTRIES = 3 # Similar past entries shown after a text or multiline answer (0: none)
 
 
 ####################
@@ -86,21 +88,68 @@ belief : dual prompt: 1:10 and single line explanation
 ####################
 
 
-def make_prompts(prompts:dict):
-    answers = []    
+def make_prompts(prompts:dict, validated:bool=False, source=None, date:datetime.date=None, journal_dir:str=None):
+    """
+    Ask every prompt in the catalog and write the answers to the day's journal_metadata file (today's in JOURNAL_DIR by default).
 
-    today = str(datetime.date.today()).replace("-", "_")
-    journal_metadata_file = os.path.join(JOURNAL_DIR, "journal_metadata_{0}.yaml".format(today))
+    The catalog is validated in one pass up front (skipped if the caller already did so, validated=True), so the individual prompts are not re-validated.
+    Answers are appended to an answer log as they are given; an interrupted session resumes where it stopped, and the log is compacted to the YAML file at the end.
+    A non-interactive answer 'source' (journal.sources) keeps its log in memory and skips the prompts it has no answer for.
+    """
+    answers = []    
+    source = helpers.answer_source(source)
+
+    if validated is False:
+        with tracing.span("session", "catalog", "validation"):
+            schemas.validate_catalog(prompts)
+
+    date = date if date is not None else datetime.date.today()
+    journal_metadata_file = os.path.join(journal_dir if journal_dir is not None else JOURNAL_DIR, history.day_filename(date))
+
+    with tracing.span("session", "answer_log", "io"):
+        log = answerlog.AnswerLog(answerlog.log_path(journal_metadata_file) if source.interactive else None)
+    if len(log.answered) > 0:
+        sys.stderr.write("\n\nResuming interrupted session from '{0}' ({1} answers)...\n\n".format(log.path, len(log.answered)))
+
+    table = records.compile_catalog(prompts) # Prompt records, built once per catalog
+
+    def show_related(answer):
+        """
+        The most similar entries of past days (journal.related), if numpy is installed
+        """
+        if RELATED_ENTRIES <= 0:
+            return
+        try:
+            from journal import related
+        except ImportError:
+            return
+        with tracing.span("session", "related", "io"):
+            matches = related.session_index(journal_dir if journal_dir is not None else JOURNAL_DIR).related(
+                related.answer_document(answer) or "", k=RELATED_ENTRIES, before=date)
+        if len(matches) > 0:
+            sys.stderr.write("\n  Related past entries:\n{0}\n\n".format(related.format_matches(matches)))
+
+    def ask(category, name, prompt_func, **kwargs):
+        prompt = table[category][name]
+        if (category, name) in log.answered: # Answered before the session was interrupted
+            answer = log.answered[(category, name)]
+        elif source.skips(prompt.prompt):
+            return None
+        else:
+            answer = prompt_func(prompt, validate=False, source=source, **kwargs)
+            log.append(category, name, prompt.prompt, answer)
+            if source.interactive and category in ("text", "multiline"):
+                show_related(answer)
+        answers.append([prompt.prompt, answer])
+        return answer
     
     """
     Booleans
     """
     for name, prompt_data in prompts["bool"].items():
-        bool_answer = helpers.prompt_boolean(prompt_data)
+        bool_answer = ask("bool", name, helpers.prompt_boolean)
         #prompts["bool"][name]["answers"] = bool_answer
-        answers.append([prompt_data["prompt"], bool_answer])
-    with open(journal_metadata_file, 'w') as ofile:
-        yaml.dump(answers, ofile, sort_keys=False)
+    log.sync()
 
     """
     Choices (05/26/25: none)
@@ -122,40 +171,33 @@ def make_prompts(prompts:dict):
     Text
     """
     for name, prompt_data in prompts["text"].items():
-        text_answer = helpers.prompt_text(prompt_data)
+        text_answer = ask("text", name, helpers.prompt_text)
         #prompts["text"][name]["answers"] = text_answer
-        answers.append([prompt_data["prompt"], text_answer])
-
-    with open(journal_metadata_file, 'w') as ofile:
-        yaml.dump(answers, ofile, sort_keys=False)
+    log.sync()
 
     """
     singleline
     """
     for name, prompt_data in prompts["singleline"].items():
-        singleline_answer = helpers.prompt_singleline(prompt_data)
+        singleline_answer = ask("singleline", name, helpers.prompt_singleline)
         #prompts["singleline"][name]["answers"] = singleline_answer
-        answers.append([prompt_data["prompt"], singleline_answer])
-
-    with open(journal_metadata_file, 'w') as ofile:
-        yaml.dump(answers, ofile, sort_keys=False)
+    log.sync()
 
     """
     multiline (05/26/25: random selection)
     """
-    multiline_prompts = []
-    multiline_names = []
-    for name, prompt_data in prompts["multiline"].items():
-        multiline_prompts.append(prompt_data)
-        multiline_names.append(name)
-    selected_prompts = random.sample(multiline_prompts, SAMPLE_MULTILINE) # randomly select n prompts from the 21 prompts (05/26/25)
-    for i, p in enumerate(selected_prompts):
-        multiline_answers = helpers.prompt_multiline(p)
-        #prompts["multiline"][multiline_names[i]]["answers"] = multiline_answers
-        answers.append([prompt_data["prompt"], multiline_answers])
-
-    with open(journal_metadata_file, 'w') as ofile:
-        yaml.dump(answers, ofile, sort_keys=False)
+    if "multiline" in log.selections: # Ask the same prompts as the interrupted session
+        selected_names = log.selections["multiline"]
+    else:
+        selected_names = source.sample("multiline", prompts["multiline"], SAMPLE_MULTILINE)
+        if selected_names is None: # Favor the prompts that have rested longest or were answered briefly (journal.sampler)
+            with tracing.span("session", "sampler", "io"):
+                selected_names = sampler.PromptSampler.open(journal_dir if journal_dir is not None else JOURNAL_DIR, prompts["multiline"], date).sample(SAMPLE_MULTILINE)
+        log.select("multiline", selected_names)
+    for name in selected_names:
+        multiline_answers = ask("multiline", name, helpers.prompt_multiline)
+        #prompts["multiline"][name]["answers"] = multiline_answers
+    log.sync()
 
     """
     belief
@@ -174,37 +216,25 @@ def make_prompts(prompts:dict):
         if "scale_label" in prompt_data.keys() and "reason_label" in prompt_data.keys():
             scale_label=prompt_data["scale_label"]
             reason_label=prompt_data["reason_label"]
-        belieflist_answers = helpers.prompt_belief_list(prompt_data, scale_label=scale_label, reason_label=reason_label)
+        belieflist_answers = ask("belieflist", name, helpers.prompt_belief_list, scale_label=scale_label, reason_label=reason_label)
         #prompts["belieflist"][name]["answers"] = belieflist_answers
-        answers.append([prompt_data["prompt"], belieflist_answers])
 
 
-
-
-
-    with open(journal_metadata_file, 'w') as ofile:
-        yaml.dump(answers, ofile, sort_keys=False)
-    sys.stderr.write("\n\nWrote journal metadata answers to '{0}'...\n\n".format(journal_metadata_file))
+    log.compact(journal_metadata_file, dictionary.for_session(os.path.dirname(journal_metadata_file), prompts)) # Prompt ids once the directory is migrated
+    with tracing.span("session", "habits", "io"):
+        habits.record_session(journal_metadata_file, date, answers, prompts) # Keeps 'journal stats habits' incremental
+    if source.interactive:
+        sys.stderr.write("\n\nWrote journal metadata answers to '{0}'...\n\n".format(journal_metadata_file))
     # print(yaml.dump(answers))
     return answers
 
     
 
     
-def cli():
+def journal_session():
     """
-    Main routine:
+    Main routine: the morning journal session
     """
-    with open(PROMPTS_TOML, 'rb') as ifile: # Open journal prompts
-        prompts = tomllib.load(ifile)
-    with open(QUOTES_TOML, 'rb') as ifile: # Open quotes file
-        quotes = tomllib.load(ifile)
-    quots = [(q["author"], q["quote"]) for n, q in quotes["quotes"].items()] # Reorganize quotes.toml (a n n o y i n g - fuck these markup languages)
-    quote_of_the_day = random.sample(quots, 1)[0] # Select 1 quote randomly
-    with open(GOALS_JSON, 'r') as ifile: # Open up goals repository
-        goals = yaml.safe_load(ifile)
-        if goals is None: # Initialize goals list to empty if no goals are found
-            goals = []
     """
     Morning affirmations (old template.md header) # Thanks mom and dad. And especially you, Allison.
     """ 
@@ -213,34 +243,557 @@ def cli():
     affirmations.greet_mom()
     affirmations.greet_dad()
     """
+    Catalog, quote of the day and goals: loaded by journal.preload while the affirmations were on screen (or here, if cli() did not start it)
+    """
+    prompts, quots, quote_of_the_day, goal_store, active_goals, focus_goals = preload.result(*session_sources())
+    """
     Make trackable prompts for longitudinal/posterity
     """
-    journal_prompts = make_prompts(prompts)
+    journal_prompts = make_prompts(prompts, validated=True)
     """
     Set goals (move to bottom)
     """
-    goal_list = helpers.create_goal_list(goals)
-    with open(GOALS_JSON, 'w') as ofile:
-        ofile.write(json.dumps(goal_list, indent=2))
+    goal_list = helpers.create_goal_list(active_goals, store=goal_store, focus=focus_goals) # Re-selections and new goals are written to the store as they are made
+    with tracing.span("goals", "store", "io"):
+        goal_store.close()
+    with tracing.span("session", "banners", "io"):
+        banners.save() # Keep any banner rendered this session for the next one
 
     """
     Quote of the day
     """
-    console.print(Markdown("# Quote of the day"))
-    print("\n\n\n")
-    print(quote_of_the_day[1])
-    print("    - {0}".format(quote_of_the_day[0]))
-    print("\n\n\n")
+    with tracing.span("session", "quote", "render"):
+        affirmations.get_console().print(affirmations.rich_markdown.Markdown("# Quote of the day"))
+        print("\n\n\n")
+        print(quote_of_the_day[1])
+        print("    - {0}".format(quote_of_the_day[0]))
+        print("\n\n\n")
     """
     Closing thoughts
     """
     affirmations.closing_thoughts()
 
 
+def session_sources():
+    """
+    Arguments of journal.preload.load for the morning session
+    """
+    return (PROMPTS_TOML, QUOTES_TOML, GOALS_DB, GOALS_JSON, JOURNAL_DIR)
+
+
+def __getattr__(name):
+    """
+    The rich Console is created lazily by journal.affirmations
+    """
+    if name == "console":
+        return affirmations.get_console()
+    raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
+
+
+####################
+# SUBCOMMANDS
+####################
+
+
+def date_range(args):
+    """
+    (start, end) dates from the --year/--start/--end options
+    """
+    start = history.parse_date(args.start) if args.start is not None else None
+    end = history.parse_date(args.end) if args.end is not None else None
+    if args.year is not None:
+        start = datetime.date(args.year, 1, 1)
+        end = datetime.date(args.year, 12, 31)
+    return start, end
+
+
+def run_query(args):
+    """
+    journal query: filters and aggregates over the columnar answer store
+    """
+    from journal import columnar
+
+    prompts, quots = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML)
+    store = columnar.ColumnStore.open(args.journal_dir, prompts)
+    start, end = date_range(args)
+    if args.prompt is None:
+        lo, hi = store.rows(start, end)
+        for prompt, column in store.columns.items():
+            print("{0}\t{1}\t{2}".format(column.kind, column.days(lo, hi), prompt))
+        return
+    try:
+        if args.where is not None:
+            for date in store.where(args.prompt, args.where == "true", start, end):
+                print(date)
+        elif args.values is True:
+            for date, value in store.values(args.prompt, start, end):
+                print("{0}\t{1}".format(date, json.dumps(value)))
+        else:
+            print("prompt: {0}".format(store.resolve(args.prompt)))
+            for k, v in store.query(args.prompt, start, end).items():
+                print("{0}: {1}".format(k, v))
+    except (KeyError, TypeError) as e:
+        sys.stderr.write("{0}\n".format(e.args[0]))
+        sys.exit(1)
+
+
+def run_search(args):
+    """
+    journal search: ranked phrase/boolean search over the free-text answers
+    """
+    from journal import search
+
+    index = search.SearchIndex.open(args.journal_dir)
+    start, end = date_range(args)
+    hits = index.search(" ".join(args.query), limit=args.limit, start=start, end=end)
+    for hit in hits:
+        print("{0}  {1:6.2f}  {2}".format(hit.date, hit.score, hit.prompt))
+        print("    {0}".format(hit.text))
+    if len(hits) == 0:
+        sys.stderr.write("No matches.\n")
+
+
+def run_related(args):
+    """
+    journal related: the past entries most similar to a text (TF-IDF cosine similarity)
+    """
+    try:
+        from journal import related
+    except ImportError as e:
+        sys.stderr.write("{0}\n".format(e.args[0]))
+        sys.exit(1)
+
+    index = related.RelatedIndex.open(args.journal_dir)
+    start, end = date_range(args)
+    text = " ".join(args.text) if args.text != ["-"] else sys.stdin.read()
+    before = end + datetime.timedelta(days=1) if end is not None else None
+    for match in index.related(text, k=args.limit, before=before, start=start, min_score=0.0):
+        print("{0}  {1:.3f}  {2}".format(match.date, match.score, match.prompt))
+        print("    {0}".format(" ".join(match.text.split())))
+
+
+def run_stats_beliefs(args):
+    """
+    journal stats beliefs: rolling statistics, percentile bands and change-points of the belief scores
+    """
+    try:
+        from journal import beliefs
+    except ImportError as e:
+        sys.stderr.write("{0}\n".format(e.args[0]))
+        sys.exit(1)
+    from journal import columnar
+
+    prompts, quots = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML)
+    store = columnar.ColumnStore.open(args.journal_dir, prompts)
+    start, end = date_range(args)
+    try:
+        selected = [store.resolve(args.prompt)] if args.prompt is not None else beliefs.belief_prompts(store)
+    except KeyError as e:
+        sys.stderr.write("{0}\n".format(e.args[0]))
+        sys.exit(1)
+    try:
+        for prompt in selected:
+            try:
+                series = beliefs.belief_series(store, prompt, start, end)
+            except TypeError as e:
+                sys.stderr.write("{0}\n".format(e.args[0]))
+                sys.exit(1)
+            if args.series is True:
+                mean, var, bands = beliefs.rolling(series.means, args.window)
+                print("date\tmean\tcount\trolling_mean\trolling_var\t" + "\t".join("p{0}".format(p) for p in beliefs.PERCENTILES))
+                for i in range(len(series.dates)):
+                    print("\t".join([str(series.dates[i]), "{0:.3f}".format(series.means[i]), str(series.counts[i]), "{0:.3f}".format(mean[i]), "{0:.3f}".format(var[i])] + ["{0:.3f}".format(b) for b in bands[:, i]]))
+                continue
+            summary = beliefs.summarize(series, window=args.window)
+            print("\n{0}".format(prompt))
+            print("  days: {0}  scores: {1}  mean: {2}  sd: {3}".format(summary["days"], summary["scores"], fmt(summary["mean"]), fmt(summary["sd"])))
+            print("  last {0} days: mean {1}  sd {2}  band {3}".format(args.window, fmt(summary["rolling_mean"]), fmt(summary["rolling_sd"]),
+                                                                      " / ".join("p{0}={1}".format(p, fmt(v)) for p, v in summary["band"].items()) if summary["band"] else "-"))
+            for cp in summary["change_points"]:
+                print("  change-point {0}: {1} -> {2}".format(cp.date, fmt(cp.before), fmt(cp.after)))
+    except BrokenPipeError: # e.g. --series piped into head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+def run_stats_habits(args):
+    """
+    journal stats habits: current and longest streaks, completion rates and calendar heatmaps of the boolean prompts
+    """
+    prompts, quots = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML)
+    store = habits.HabitStore.open(args.journal_dir, prompts)
+    start, end = date_range(args)
+    try:
+        selected = [store.resolve(args.prompt)] if args.prompt is not None else list(store.habits)
+    except KeyError as e:
+        sys.stderr.write("{0}\n".format(e.args[0]))
+        sys.exit(1)
+    if len(selected) == 0:
+        sys.stderr.write("No boolean prompts in '{0}'\n".format(args.journal_dir))
+        sys.exit(1)
+    if args.heatmap is False:
+        print("current\tlongest\t" + "\t".join("{0}d".format(w) for w in habits.RATE_WINDOWS) + "\tall\tprompt")
+    for prompt in selected:
+        streaks = store.streaks(prompt, start, end)
+        rates = [store.rate(prompt, w, start, end)["rate"] for w in habits.RATE_WINDOWS] + [store.rate(prompt, None, start, end)["rate"]]
+        if args.heatmap is False:
+            print("{0}\t{1}\t{2}\t{3}".format(streaks["current"].length, streaks["longest"].length, "\t".join(fmt(r) for r in rates), prompt))
+            continue
+        monday, rows = store.heatmap(prompt, args.weeks, end)
+        print("\n{0}".format(prompt))
+        print("  current streak: {0} days{1}  longest: {2} days{3}".format(
+            streaks["current"].length, " (since {0})".format(streaks["current"].start) if streaks["current"].length > 0 else "",
+            streaks["longest"].length, " ({0} - {1})".format(streaks["longest"].start, streaks["longest"].end) if streaks["longest"].length > 0 else ""))
+        print("  " + "  ".join("{0}: {1}".format(w, fmt(r)) for w, r in zip(["{0}d".format(w) for w in habits.RATE_WINDOWS] + ["all"], rates)))
+        print("  weeks from {0}".format(monday))
+        for weekday, row in zip(("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"), rows):
+            print("  {0} {1}".format(weekday, row))
+
+
+def run_batch(args):
+    """
+    journal batch: replay pre-recorded sessions through make_prompts (and create_goal_list) without a terminal
+    """
+    from journal import sources
+
+    prompts, quots = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML)
+    goal_store = goals.open_store(args.goals_db) if args.goals_db is not None else None
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    def sessions():
+        for path in args.sessions:
+            if path == "-":
+                yield from sources.stream_sessions(sys.stdin)
+            else:
+                yield sources.load_session(path)
+
+    n = 0
+    mismatched = []
+    t0 = time.perf_counter()
+    try:
+        for source in sessions():
+            if source.date is None:
+                raise ValueError("journal batch: session {0} has no date".format(source.path))
+            original = None
+            if args.check is True and source.path is not None and os.path.isfile(source.path):
+                with open(source.path, 'rb') as ifile:
+                    original = ifile.read()
+            with tracing.session(source.date):
+                make_prompts(prompts, validated=True, source=source, date=source.date, journal_dir=args.output_dir)
+                if goal_store is not None and source.goals is not None:
+                    helpers.create_goal_list(goal_store.active(), store=goal_store, source=source)
+            if original is not None:
+                replayed = os.path.join(args.output_dir, history.day_filename(source.date))
+                with open(replayed, 'rb') as ifile:
+                    written = ifile.read()
+                # A replay into a migrated directory is dictionary-encoded: compare its answers with those of the original
+                if written != original and (dictionary.day_format(written) == dictionary.day_format(original) or
+                                            history.load_day(history.Day(source.date, source.path)) != history.load_day(history.Day(source.date, replayed))):
+                    mismatched.append(source.path)
+            n += 1
+    except (KeyError, TypeError, ValueError) as e:
+        sys.stderr.write("{0}\n".format(e.args[0]))
+        sys.exit(1)
+    finally:
+        if goal_store is not None:
+            goal_store.close()
+    elapsed = time.perf_counter() - t0
+    sys.stderr.write("Replayed {0} sessions into '{1}' in {2:.2f}s ({3:.0f} sessions/s)\n".format(n, args.output_dir, elapsed, n / elapsed if elapsed > 0 else 0))
+    if args.check is True:
+        for path in mismatched:
+            sys.stderr.write("differs: {0}\n".format(path))
+        if len(mismatched) > 0:
+            sys.exit(1)
+
+
+def run_serve(args):
+    """
+    journal serve: the multi-user asyncio server
+    """
+    from journal import server
+
+    prompts, quots = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML)
+    server.serve(args.root, prompts, host=args.host, port=args.port, unix_path=args.unix)
+
+
+def run_quote(args):
+    """
+    journal quote: the quote of the day, or the next quote of the no-repeat rotation
+    """
+    from journal import quotes
+
+    prompts, quots = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML)
+    if args.next is True:
+        author, quote = quots.next_quote(quotes.state_path(quots), seed=args.seed)
+    else:
+        author, quote = quots.quote_of_the_day(history.parse_date(args.date) if args.date is not None else None, seed=args.seed)
+    print(quote)
+    print("    - {0}".format(author))
+
+
+def run_profile(args):
+    """
+    journal profile: the per-step latencies of the sessions traced with journal --profile, aggregated across days
+    """
+    start, end = date_range(args)
+    paths = tracing.list_traces(args.journal_dir, start, end)
+    if len(paths) == 0:
+        sys.stderr.write("No traces in '{0}'. Run 'journal --profile' to record one.\n".format(tracing.trace_dir(args.journal_dir)))
+        sys.exit(1)
+    try:
+        if args.daily is True:
+            print("date\tsessions\t" + "\t".join(tracing.KINDS) + "\ttool\ttotal")
+            by_date = {}
+            for path in paths:
+                by_date.setdefault(os.path.basename(path)[len("profile_"):len("profile_") + 10], []).append(path)
+            for date, day_paths in sorted(by_date.items()):
+                summary = tracing.summarize(day_paths)
+                kinds = {k: sum(row[k] for row in summary["rows"].values()) for k in tracing.KINDS}
+                print("\t".join([date.replace("_", "-"), str(summary["sessions"])] + ["{0:.1f}".format(kinds[k]) for k in tracing.KINDS] +
+                                ["{0:.1f}".format(sum(kinds[k] for k in tracing.TOOL_KINDS)), "{0:.1f}".format(summary["total_ms"])]))
+        else:
+            print(tracing.format_summary(tracing.summarize(paths, by="step" if args.steps is True else "group")))
+    except ValueError as e:
+        sys.stderr.write("{0}\n".format(e.args[0]))
+        sys.exit(1)
+
+
+def run_export(args):
+    """
+    journal export: stream the history to CSV, JSON lines, Parquet or Arrow
+    """
+    from journal import export
+
+    prompts, quots = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML)
+    start, end = date_range(args)
+    if args.format in ("parquet", "arrow") and args.output == "-":
+        sys.stderr.write("journal export: --format {0} needs an output file (-o)\n".format(args.format))
+        sys.exit(1)
+    try:
+        only = export.resolve_prompts(args.prompt, prompts) if args.prompt is not None else None
+        if args.format in ("parquet", "arrow"):
+            n = export.export(args.journal_dir, args.output, args.format, args.layout, prompts, only, start, end)
+        elif args.output == "-":
+            n = export.export(args.journal_dir, sys.stdout, args.format, args.layout, prompts, only, start, end)
+        else:
+            with open(args.output, 'w', newline="" if args.format == "csv" else None) as ofile:
+                n = export.export(args.journal_dir, ofile, args.format, args.layout, prompts, only, start, end)
+    except (KeyError, ValueError, ImportError) as e:
+        sys.stderr.write("{0}\n".format(e.args[0]))
+        sys.exit(1)
+    except BrokenPipeError: # e.g. piped into head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    sys.stderr.write("Exported {0} rows ({1}, {2})\n".format(n, args.format, args.layout))
+
+
+def run_archive(args):
+    """
+    journal archive: roll the day files of closed months into compressed segments (or restore them, or list the segments)
+    """
+    from journal import archive
+
+    start, end = date_range(args)
+    try:
+        if args.list is True:
+            print("segment\tdays\tfirst\tlast\tbytes\tarchived bytes")
+            for path in archive.list_segments(args.journal_dir, start, end):
+                entries = sorted(archive.open_segment(path).entries.values())
+                print("{0}\t{1}\t{2}\t{3}\t{4}\t{5}".format(os.path.basename(path), len(entries), datetime.date.fromordinal(entries[0].ordinal) if entries else "-",
+                                                         datetime.date.fromordinal(entries[-1].ordinal) if entries else "-", sum(e.size for e in entries), os.path.getsize(path)))
+        elif args.restore is True:
+            n = archive.restore(args.journal_dir, start, end)
+            sys.stderr.write("Restored {0} day files to '{1}'\n".format(n, args.journal_dir))
+        else:
+            report = archive.archive(args.journal_dir, start, end, by=args.by, dry_run=args.dry_run)
+            for path, days, original, size in report:
+                sys.stderr.write("{0}: {1} days, {2} bytes{3}\n".format(os.path.basename(path), days, original,
+                                                                       "" if size is None else " -> {0} bytes".format(size)))
+            if len(report) == 0:
+                sys.stderr.write("Nothing to archive in '{0}'\n".format(args.journal_dir))
+    except (KeyError, ValueError) as e:
+        sys.stderr.write("{0}\n".format(e.args[0]))
+        sys.exit(1)
+    except BrokenPipeError: # --list piped into head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    except OSError as e:
+        sys.stderr.write("journal archive: {0}\n".format(e))
+        sys.exit(1)
+
+
+def run_fsck(args):
+    """
+    journal fsck: check the day files and goals.json against the catalog schemas, skipping the files unchanged since they last passed
+    """
+    from journal import manifest
+
+    prompts, quots = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML)
+    start, end = date_range(args)
+    started = time.perf_counter()
+    problems, checked, total = manifest.fsck(args.journal_dir, prompts, GOALS_JSON, start, end, full=args.full, processes=args.jobs)
+    for problem in problems:
+        print("{0}\t{1}".format(problem.path, problem.problem))
+    sys.stderr.write("Checked {0} of {1} files ({2} unchanged since they passed) in {3:.2f}s: {4} problem{5}\n".format(
+        checked, total, total - checked, time.perf_counter() - started, len(problems), "" if len(problems) == 1 else "s"))
+    if len(problems) > 0:
+        sys.exit(1)
+
+
+def run_migrate(args):
+    """
+    journal migrate: rewrite the history in another day file format (2: dictionary-encoded prompt ids, 1: [prompt, answer] pairs)
+    """
+    prompts, quots = catalog.load_catalog(PROMPTS_TOML, QUOTES_TOML)
+    try:
+        rewritten, skipped, before, after = dictionary.migrate(args.journal_dir, prompts, to=args.to, processes=args.jobs, dry_run=args.dry_run)
+    except (KeyError, ValueError) as e:
+        sys.stderr.write("{0}\n".format(e.args[0]))
+        sys.exit(1)
+    except OSError as e:
+        sys.stderr.write("journal migrate: {0}\n".format(e))
+        sys.exit(1)
+    sys.stderr.write("{0} {1} day files to format {2} ({3} bytes -> {4} bytes), {5} already in format {2}\n".format(
+        "Would rewrite" if args.dry_run else "Rewrote", rewritten, args.to, before, after, skipped))
+
+
+def fmt(x):
+    return "-" if x is None else "{0:.2f}".format(x)
+
+
+def positive_int(value:str):
+    """
+    argparse type of the options counted in days or weeks
+    """
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError("must be at least 1, not {0}".format(n))
+    return n
+
+
 ####################
 # OPTIONS AND MAIN
 ####################
 
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog="journal", description="Daily journal prompts. Run without a subcommand to start the morning session.")
+    parser.add_argument("--profile", action="store_true", help="Time each step of the session (or of each 'batch' session), write a trace to <journal dir>/.journal/profile and print a summary at exit")
+    parser.add_argument("--pace", type=float, default=1.0, help="Scale the minimum time the affirmations ({0:g} s) and closing thoughts ({1:g} s) stay on screen; 0 disables the pauses (default: %(default)s)".format(
+        affirmations.AFFIRMATIONS_PACE, affirmations.CLOSING_PACE))
+    subparsers = parser.add_subparsers(dest="command")
+
+    history_options = argparse.ArgumentParser(add_help=False)
+    history_options.add_argument("--journal-dir", default=JOURNAL_DIR, help="Directory of journal_metadata_*.yaml files (default: %(default)s)")
+    history_options.add_argument("--year", type=int, default=None, help="Restrict to one calendar year")
+    history_options.add_argument("--start", default=None, help="First date (YYYY-MM-DD, inclusive)")
+    history_options.add_argument("--end", default=None, help="Last date (YYYY-MM-DD, inclusive)")
+
+    query_parser = subparsers.add_parser("query", parents=[history_options], help="Filter and aggregate answers across all days")
+    query_parser.add_argument("prompt", nargs="?", default=None, help="Prompt text, prompts.toml name, or unique substring. Omit to list the columns.")
+    query_parser.add_argument("--where", choices=["true", "false"], default=None, help="List the dates a boolean prompt was answered true/false")
+    query_parser.add_argument("--values", action="store_true", help="Print every (date, answer) instead of aggregates")
+    query_parser.set_defaults(func=run_query)
+
+    search_parser = subparsers.add_parser("search", parents=[history_options], help="Search free-text answers: words (AND), \"phrases\", OR, -exclude")
+    search_parser.add_argument("query", nargs="+", help="Search query. Put '--' before a query that starts with -exclude.")
+    search_parser.add_argument("-n", "--limit", type=int, default=10, help="Number of results (default: %(default)s)")
+    search_parser.set_defaults(func=run_search)
+
+    related_parser = subparsers.add_parser("related", parents=[history_options], help="Past entries most similar to a text (requires numpy)")
+    related_parser.add_argument("text", nargs="+", help="Text to compare with the free-text answers. '-' reads it from stdin.")
+    related_parser.add_argument("-n", "--limit", type=int, default=5, help="Number of results (default: %(default)s)")
+    related_parser.set_defaults(func=run_related)
+
+    stats_parser = subparsers.add_parser("stats", help="Longitudinal statistics")
+    stats_subparsers = stats_parser.add_subparsers(dest="stats", required=True)
+    beliefs_parser = stats_subparsers.add_parser("beliefs", parents=[history_options], help="Belief score trends (requires numpy)")
+    beliefs_parser.add_argument("prompt", nargs="?", default=None, help="One belief prompt (text, name, or unique substring). Default: all.")
+    beliefs_parser.add_argument("--window", type=positive_int, default=30, help="Rolling window in answered days (default: %(default)s)")
+    beliefs_parser.add_argument("--series", action="store_true", help="Print the daily series with rolling statistics as TSV")
+    beliefs_parser.set_defaults(func=run_stats_beliefs)
+    habits_parser = stats_subparsers.add_parser("habits", parents=[history_options], help="Streaks, completion rates and heatmaps of the boolean prompts")
+    habits_parser.add_argument("prompt", nargs="?", default=None, help="One boolean prompt (text, name, or unique substring). Default: all.")
+    habits_parser.add_argument("--heatmap", action="store_true", help="Print each habit's streaks, rates and a calendar heatmap (█ done, · not done, blank: no answer)")
+    habits_parser.add_argument("--weeks", type=positive_int, default=26, help="Weeks in the heatmap (default: %(default)s)")
+    habits_parser.set_defaults(func=run_stats_habits)
+
+    batch_parser = subparsers.add_parser("batch", help="Replay recorded sessions without a terminal")
+    batch_parser.add_argument("sessions", nargs="+", help="Session files (journal_metadata YAML or JSON). '-' reads one JSON session per line from stdin.")
+    batch_parser.add_argument("-o", "--output-dir", required=True, help="Directory to write the journal_metadata files to")
+    batch_parser.add_argument("--goals-db", default=None, help="Goal store to apply the sessions' recorded goals to")
+    batch_parser.add_argument("--check", action="store_true", help="Fail if a replayed file differs from the session file it came from")
+    batch_parser.set_defaults(func=run_batch)
+
+    serve_parser = subparsers.add_parser("serve", help="Serve journal sessions to many users over HTTP (TCP or a unix socket)")
+    serve_parser.add_argument("--root", default=os.path.join(JOURNAL_DIR, "users"), help="Directory holding one journal directory per user (default: %(default)s)")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: %(default)s)")
+    serve_parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: %(default)s)")
+    serve_parser.add_argument("--unix", default=None, help="Listen on this unix socket path instead of a TCP port")
+    serve_parser.set_defaults(func=run_serve)
+
+    quote_parser = subparsers.add_parser("quote", help="Print the quote of the day")
+    quote_parser.add_argument("--date", default=None, help="Quote of the day for another date (YYYY-MM-DD)")
+    quote_parser.add_argument("--next", action="store_true", help="Next quote of the no-repeat rotation instead")
+    quote_parser.add_argument("--seed", type=int, default=0, help="Permutation seed (default: %(default)s)")
+    quote_parser.set_defaults(func=run_quote)
+
+    export_parser = subparsers.add_parser("export", parents=[history_options], help="Export the history as CSV, JSON lines, Parquet or Arrow")
+    export_parser.add_argument("-f", "--format", choices=["csv", "jsonl", "parquet", "arrow"], default="csv", help="Output format (parquet/arrow require pyarrow; default: %(default)s)")
+    export_parser.add_argument("--layout", choices=["long", "wide"], default="long", help="long: one row per answer item; wide: one row per day, one column per prompt (default: %(default)s)")
+    export_parser.add_argument("-p", "--prompt", action="append", default=None, help="Only this prompt (text, prompts.toml name, or unique substring). Repeatable.")
+    export_parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    export_parser.set_defaults(func=run_export)
+
+    profile_parser = subparsers.add_parser("profile", parents=[history_options], help="Summarize the session traces recorded with --profile")
+    profile_parser.add_argument("--steps", action="store_true", help="One row per step (prompt) instead of per group")
+    profile_parser.add_argument("--daily", action="store_true", help="Print the totals of each day as TSV")
+    profile_parser.set_defaults(func=run_profile)
+
+    archive_parser = subparsers.add_parser("archive", parents=[history_options], help="Roll the day files of closed months into compressed segments")
+    archive_parser.add_argument("--by", choices=["month", "year"], default="month", help="One segment per month or per year (default: %(default)s)")
+    archive_parser.add_argument("--dry-run", action="store_true", help="Print what would be archived")
+    archive_parser.add_argument("--restore", action="store_true", help="Write the archived days back to day files instead")
+    archive_parser.add_argument("--list", action="store_true", help="List the segments")
+    archive_parser.set_defaults(func=run_archive)
+
+    fsck_parser = subparsers.add_parser("fsck", parents=[history_options], help="Check the day files and goals.json for corrupt or truncated entries")
+    fsck_parser.add_argument("--full", action="store_true", help="Re-read every file, including those unchanged since they last passed")
+    fsck_parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: one per CPU)")
+    fsck_parser.set_defaults(func=run_fsck)
+
+    migrate_parser = subparsers.add_parser("migrate", help="Rewrite the day files with stable prompt ids (format 2) or back to [prompt, answer] pairs (format 1)")
+    migrate_parser.add_argument("--journal-dir", default=JOURNAL_DIR, help="Directory of journal_metadata_*.yaml files (default: %(default)s)")
+    migrate_parser.add_argument("--to", type=int, choices=[1, 2], default=2, help="Day file format (default: %(default)s)")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="Print what would be rewritten")
+    migrate_parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: one per CPU)")
+    migrate_parser.set_defaults(func=run_migrate)
+    return parser
+
+
+def cli(argv:list=None):
+    """
+    Console entry point
+    """
+    args = get_parser().parse_args(argv)
+    if args.profile is True:
+        tracing.enable(args.output_dir if args.command == "batch" else JOURNAL_DIR)
+    try:
+        if args.command is None:
+            try:
+                affirmations.set_pace(args.pace)
+            except ValueError as e:
+                sys.stderr.write("{0}\n".format(e.args[0]))
+                sys.exit(1)
+            with tracing.session(): # A no-op without --profile
+                preload.start(*session_sources()) # Load the catalog, goals and sampler and warm the prompt imports while the affirmations are read
+                return journal_session()
+        return args.func(args)
+    finally:
+        if args.profile is True:
+            tracing.report()
+
+
 if __name__ == '__main__':
     cli()
 
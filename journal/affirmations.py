@@ -1,14 +1,65 @@
 
 import time
 
-from rich.console import Console
-from rich.markdown import Markdown
+from journal.lazy import lazy_import
 
-console = Console()
+from journal import tracing
 
+rich_console = lazy_import("rich.console")
+rich_markdown = lazy_import("rich.markdown")
 
+AFFIRMATIONS_PACE = 8.0 # Minimum seconds the affirmations stay on screen before the session goes on
+CLOSING_PACE = 4.0 # ...and the closing thoughts
 
-affirmations = Markdown("""
+_console = None
+_pace_scale = 1.0
+
+
+def set_pace(scale:float):
+    """
+    Scale the minimum pacing of the affirmations and closing thoughts (0 disables the pauses)
+    """
+    global _pace_scale
+    if scale < 0:
+        raise ValueError("journal.affirmations.set_pace: the pace scale must be >= 0")
+    _pace_scale = scale
+
+
+def pace(step:str, seconds:float, since:float):
+    """
+    Pause until 'seconds' (scaled by set_pace) have passed since 'since' (a time.monotonic() reading), so the time spent rendering
+    (and whatever ran meanwhile) counts towards the minimum instead of adding to it
+    """
+    remaining = seconds * _pace_scale - (time.monotonic() - since)
+    if remaining > 0:
+        with tracing.span("affirmations", step, "pause"):
+            time.sleep(remaining)
+
+
+def get_console():
+    """
+    Shared rich Console, created on first use so that rich is not imported at startup
+    """
+    global _console
+    if _console is None:
+        _console = rich_console.Console()
+    return _console
+
+
+def __getattr__(name):
+    """
+    Lazy module attributes: the rich Console and the rendered Markdown blocks
+    """
+    if name == "console":
+        return get_console()
+    elif name == "affirmations":
+        return rich_markdown.Markdown(affirmations_md)
+    elif name == "closing":
+        return rich_markdown.Markdown(closing_md)
+    raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
+
+
+affirmations_md = """
 #  | Daily affirmations | - 🌾 | 🪴 | 🖖 | 🧫 | 🛸 | ♻️ | 💻
 
 It's **normal** to feel *stressed* 😔 in the morning, **even if you're in a better mood**.
@@ -38,49 +89,59 @@ It's **normal** to feel *stressed* 😔 in the morning, **even if you're in a be
 `You don't need to be perfect or rich or define success by other's terms.`
 
 🗾🙏🚗🌊💍
-""")
+"""
 
-closing = Markdown("""
+closing_md = """
 Keep journaling, keep writing, make blog posts, don't stress about technical achievement.
 
 **Build the** goddamn **second brain**.
-""")
+"""
 
 def greet_dad():
     greeting = "> Dad: Good morning buddy 🌅\n"
-    r = input(greeting)
-    while r.lower() != "hi dad":
-        print("Answer 'hi dad' to continue...")
+    with tracing.span("affirmations", "greet_dad", "user"):
         r = input(greeting)
+        while r.lower() != "hi dad":
+            print("Answer 'hi dad' to continue...")
+            r = input(greeting)
 
 def greet_mom():
     greeting = "> Mom: Hi sweetie ☀️\n"
-    r = input(greeting)
-    while r.lower() != "hi mom":
-        print("Answer 'hi mom' to continue...")
+    with tracing.span("affirmations", "greet_mom", "user"):
         r = input(greeting)
+        while r.lower() != "hi mom":
+            print("Answer 'hi mom' to continue...")
+            r = input(greeting)
 
 def greet_al():
     greeting = "> _: I love you, matt! 💐🪺\n"
-    r = input(greeting)
-    while r.lower() != "hi allison":
-        print("Answer 'hi allison' to continue...")
+    with tracing.span("affirmations", "greet_al", "user"):
         r = input(greeting)
+        while r.lower() != "hi allison":
+            print("Answer 'hi allison' to continue...")
+            r = input(greeting)
 
 
 def make_morning_affirmations():
-    console.print(affirmations)
-    time.sleep(8)
+    shown = time.monotonic()
+    with tracing.span("affirmations", "affirmations", "render"):
+        get_console().print(rich_markdown.Markdown(affirmations_md))
+    pace("affirmations", AFFIRMATIONS_PACE, shown)
 
-    input("\n\nOkay... begin. Good morning.\n")
-    journal_header_md = Markdown("\n\n# journal.py | brought to you by    Matt McMattface\n\n")
-    console.print(journal_header_md)
+    with tracing.span("affirmations", "begin", "user"):
+        input("\n\nOkay... begin. Good morning.\n")
+    with tracing.span("affirmations", "header", "render"):
+        journal_header_md = rich_markdown.Markdown("\n\n# journal.py | brought to you by    Matt McMattface\n\n")
+        get_console().print(journal_header_md)
 
 
 
     
 def closing_thoughts():
-    console.print(closing)
-    time.sleep(4)
+    shown = time.monotonic()
+    with tracing.span("affirmations", "closing", "render"):
+        get_console().print(rich_markdown.Markdown(closing_md))
+    pace("closing", CLOSING_PACE, shown)
 
-    input("Complete. Save to file?")
+    with tracing.span("affirmations", "closing", "user"):
+        input("Complete. Save to file?")
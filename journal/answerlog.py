@@ -0,0 +1,129 @@
+import os
+
+import json
+
+from journal import history, tracing, dictionary
+
+"""
+Append-only answer log for a journal session
+
+Each answer is appended to 'journal_metadata_<date>.log' as one JSON record as soon as it is given, and fsync'd in batches.
+An interrupted session is resumed from the log, and compact() produces the usual journal_metadata_<date>.yaml at the end.
+A log with no path keeps the records in memory only (non-interactive sessions, which have nothing to resume).
+"""
+
+SYNC_EVERY = 8
+
+
+def log_path(journal_metadata_file:str):
+    """
+    The answer log that accompanies a journal_metadata YAML file
+    """
+    root, ext = os.path.splitext(journal_metadata_file)
+    return root + ".log"
+
+
+class AnswerLog:
+    """
+    One JSON record per line:
+      {"category": "bool", "name": "cooking_today", "prompt": "Are you cooking today?", "value": true}
+      {"category": "multiline", "selection": ["worries_me_today", ...]}
+    """
+    def __init__(self, path:str, sync_every:int=SYNC_EVERY):
+        self.path = path
+        self.sync_every = sync_every
+        self.records = self.read()
+        self.answered = {(r["category"], r["name"]): r["value"] for r in self.records if "value" in r}
+        self.selections = {r["category"]: r["selection"] for r in self.records if "selection" in r}
+        self._ofile = None
+        self._unsynced = 0
+
+    def read(self):
+        """
+        Records already in the log. A truncated final line (crash mid-write) is dropped.
+        """
+        records = []
+        self._valid_size = 0
+        if self.path is None or not os.path.exists(self.path):
+            return records
+        with open(self.path, 'rb') as ifile:
+            for line in ifile:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                self._valid_size += len(line)
+        return records
+
+    def _write(self, record:dict):
+        if self.path is None:
+            self.records.append(record)
+            return
+        with tracing.span("session", "answer_log", "io"):
+            if self._ofile is None:
+                if os.path.exists(self.path) and os.path.getsize(self.path) != self._valid_size:
+                    os.truncate(self.path, self._valid_size) # Cut back to the last complete record before appending
+                self._ofile = open(self.path, 'a')
+            self._ofile.write(json.dumps(record) + "\n")
+            self._ofile.flush()
+        self.records.append(record)
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def append(self, category:str, name:str, prompt:str, value):
+        """
+        Record an answer
+        """
+        self._write({"category": category, "name": name, "prompt": prompt, "value": value})
+        self.answered[(category, name)] = value
+
+    def select(self, category:str, names:list):
+        """
+        Record which prompts were sampled from a category, so a resumed session asks the same ones
+        """
+        self._write({"category": category, "selection": names})
+        self.selections[category] = names
+
+    def sync(self):
+        """
+        Flush the batch of appended records to disk
+        """
+        if self._ofile is not None and self._unsynced > 0:
+            with tracing.span("session", "answer_log", "io"):
+                self._ofile.flush()
+                os.fsync(self._ofile.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        self.sync()
+        if self._ofile is not None:
+            self._ofile.close()
+            self._ofile = None
+
+    def compact(self, journal_metadata_file:str, prompt_dictionary=None):
+        """
+        Write the answers, in order, as the journal_metadata YAML file (atomically) and remove the log. With a journal.dictionary
+        PromptDictionary the file is written in the dictionary-encoded format, the prompts referenced by the id of their catalog key.
+        """
+        self.close()
+        answered = [r for r in self.records if "value" in r]
+        answers = [[r["prompt"], r["value"]] for r in answered]
+        data = answers
+        tmp = "{0}.{1}.tmp".format(journal_metadata_file, os.getpid())
+        with tracing.span("session", "journal_metadata", "io"):
+            if prompt_dictionary is not None:
+                records = prompt_dictionary.encode(answers, ["{0}.{1}".format(r["category"], r["name"]) for r in answered])
+                prompt_dictionary.save(os.path.dirname(journal_metadata_file)) # Only if encode() added a prompt
+                data = prompt_dictionary.day_data(records)
+            with open(tmp, 'w') as ofile:
+                dictionary.dump_day(data, ofile)
+                if self.path is not None:
+                    ofile.flush()
+                    os.fsync(ofile.fileno())
+            os.replace(tmp, journal_metadata_file)
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
+        return answers
@@ -0,0 +1,289 @@
+import os
+
+import re
+import zlib
+import struct
+import datetime
+from collections import Counter, namedtuple
+
+from journal import history
+
+"""
+Segmented archive of closed months (journal archive)
+
+The day files of a closed month (or year) are rolled into one segment file in JOURNAL_DIR/archive:
+
+  journal_metadata_YYYY_MM.seg (or journal_metadata_YYYY.seg)
+
+  magic        : b"JRNLSEG1"
+  dictionary   : zlib preset dictionary shared by the days of the segment (the lines repeated across them, e.g. the prompts)
+  day blobs    : each day file compressed on its own (raw deflate with the dictionary)
+  index        : one ENTRY per day, by date: (ordinal, offset, length, size, mtime_ns, crc32)
+  footer       : (dictionary offset, dictionary length, index offset, number of days, magic)
+
+A day is read with one seek into the segment and the decompression of that day alone. The original bytes, size and mtime of each
+file are kept, so 'journal archive --restore' gives back the same files and the derived indexes (columnar, search, sampler) see an
+archived day as unchanged.
+
+history.list_days() and history.load_day() read archived and live days as one history. A live file for a day that is also archived
+takes precedence (it is merged into the segment the next time the month is archived).
+"""
+
+ARCHIVE_DIRNAME = "archive"
+MAGIC = b"JRNLSEG1"
+ENTRY = struct.Struct("<IQIIqI")
+FOOTER = struct.Struct("<QIQI8s")
+DICT_SIZE = 32768 # zlib's window: the most a preset dictionary can use
+LEVEL = 9
+
+SEGMENT_RE = re.compile(r"^journal_metadata_(\d{4})(?:_(\d{2}))?\.seg$")
+
+Entry = namedtuple("Entry", ["ordinal", "offset", "length", "size", "mtime_ns", "crc32"])
+Segment = namedtuple("Segment", ["path", "dictionary", "entries"]) # entries: {ordinal: Entry}
+
+_segments = {} # path: ((size, mtime_ns), Segment)
+
+
+def archive_dir(journal_dir:str):
+    return os.path.join(journal_dir, ARCHIVE_DIRNAME)
+
+
+def segment_name(date:datetime.date, by:str="month"):
+    if by == "year":
+        return "journal_metadata_{0:04d}.seg".format(date.year)
+    return "journal_metadata_{0:04d}_{1:02d}.seg".format(date.year, date.month)
+
+
+def segment_range(name:str):
+    """
+    (first, last) date a segment file can hold, from its name. None if it is not a segment.
+    """
+    m = SEGMENT_RE.match(name)
+    if m is None:
+        return None
+    year = int(m.group(1))
+    if m.group(2) is None:
+        return datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+    month = int(m.group(2))
+    last = (datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1))
+    return datetime.date(year, month, 1), last
+
+
+def list_segments(journal_dir:str, start:datetime.date=None, end:datetime.date=None):
+    """
+    Segment paths in 'journal_dir' that can hold days between start and end (inclusive), by name
+    """
+    try:
+        names = os.listdir(archive_dir(journal_dir))
+    except FileNotFoundError:
+        return []
+    paths = []
+    for name in sorted(names):
+        span = segment_range(name)
+        if span is None or (start is not None and span[1] < start) or (end is not None and span[0] > end):
+            continue
+        paths.append(os.path.join(archive_dir(journal_dir), name))
+    return paths
+
+
+"""
+Reading
+"""
+
+def open_segment(path:str):
+    """
+    The dictionary and index of a segment, cached until the file changes
+    """
+    st = os.stat(path)
+    key = (st.st_size, st.st_mtime_ns)
+    cached = _segments.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(path, 'rb') as ifile:
+        if ifile.read(len(MAGIC)) != MAGIC:
+            raise ValueError("journal.archive: '{0}' is not a journal segment".format(path))
+        ifile.seek(-FOOTER.size, os.SEEK_END)
+        dict_offset, dict_length, index_offset, count, magic = FOOTER.unpack(ifile.read(FOOTER.size))
+        if magic != MAGIC:
+            raise ValueError("journal.archive: '{0}' is truncated (no footer)".format(path))
+        ifile.seek(dict_offset)
+        dictionary = ifile.read(dict_length)
+        ifile.seek(index_offset)
+        raw = ifile.read(count * ENTRY.size)
+    entries = {}
+    for i in range(count):
+        entry = Entry(*ENTRY.unpack_from(raw, i * ENTRY.size))
+        entries[entry.ordinal] = entry
+    segment = Segment(path, dictionary, entries)
+    _segments[path] = (key, segment)
+    return segment
+
+
+def read_day(path:str, date:datetime.date):
+    """
+    The original bytes of one archived day file
+    """
+    segment = open_segment(path)
+    entry = segment.entries.get(date.toordinal())
+    if entry is None:
+        raise KeyError("journal.archive: {0} is not in '{1}'".format(date, path))
+    with open(path, 'rb') as ifile:
+        ifile.seek(entry.offset)
+        blob = ifile.read(entry.length)
+    try:
+        data = zlib.decompressobj(-15, zdict=segment.dictionary).decompress(blob) if segment.dictionary else zlib.decompress(blob, -15)
+    except zlib.error:
+        data = None
+    if data is None or len(data) != entry.size or zlib.crc32(data) != entry.crc32:
+        raise ValueError("journal.archive: {0} in '{1}' is corrupt".format(date, path))
+    return data
+
+
+def archived_days(journal_dir:str, start:datetime.date=None, end:datetime.date=None):
+    """
+    history.Day for each archived day between start and end. Day.segment is the segment it is read from.
+    """
+    days = []
+    for path in list_segments(journal_dir, start, end):
+        for ordinal in sorted(open_segment(path).entries):
+            date = datetime.date.fromordinal(ordinal)
+            if (start is None or date >= start) and (end is None or date <= end):
+                days.append(history.Day(date, os.path.join(journal_dir, history.day_filename(date)), path))
+    return days
+
+
+def day_stat(day):
+    """
+    (size, mtime_ns) of an archived day, as it was when it was archived
+    """
+    entry = open_segment(day.segment).entries[day.date.toordinal()]
+    return (entry.size, entry.mtime_ns)
+
+
+"""
+Writing
+"""
+
+def build_dictionary(files:list, size:int=DICT_SIZE):
+    """
+    zlib preset dictionary for a set of day files: the lines found in more than one file, the most common last (nearest the data)
+    """
+    counts = Counter()
+    for data in files:
+        counts.update(set(data.splitlines(keepends=True)))
+    common = [line for line, n in sorted(counts.items(), key=lambda item: (item[1], item[0])) if n > 1]
+    dictionary = b"".join(common)
+    return dictionary[-size:]
+
+
+def write_segment(path:str, days:list):
+    """
+    Write a segment from [(date, bytes, mtime_ns)] (atomically, fsync'd). Returns the segment size.
+    """
+    days = sorted(days)
+    dictionary = build_dictionary([data for date, data, mtime_ns in days])
+    tmp = "{0}.{1}.tmp".format(path, os.getpid())
+    with open(tmp, 'wb') as ofile:
+        ofile.write(MAGIC)
+        dict_offset = ofile.tell()
+        ofile.write(dictionary)
+        entries = []
+        for date, data, mtime_ns in days:
+            compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, -15, zdict=dictionary) if dictionary else zlib.compressobj(LEVEL, zlib.DEFLATED, -15)
+            blob = compressor.compress(data) + compressor.flush()
+            entries.append(ENTRY.pack(date.toordinal(), ofile.tell(), len(blob), len(data), mtime_ns, zlib.crc32(data)))
+            ofile.write(blob)
+        index_offset = ofile.tell()
+        ofile.write(b"".join(entries))
+        ofile.write(FOOTER.pack(dict_offset, len(dictionary), index_offset, len(entries), MAGIC))
+        ofile.flush()
+        os.fsync(ofile.fileno())
+        size = ofile.tell()
+    os.replace(tmp, path)
+    return size
+
+
+def sync_dir(path:str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def archive(journal_dir:str, start:datetime.date=None, end:datetime.date=None, by:str="month", dry_run:bool=False):
+    """
+    Roll the live day files of the closed months (or years, by="year") dated start..end into segments, one per month (or year).
+    The current month (year) is never archived. A period that is already archived is rewritten with its new days merged in.
+    Each segment is read back and checked before the files it replaces are deleted.
+
+    Returns [(segment path, days, bytes of day files, segment bytes)].
+    """
+    if by not in ("month", "year"):
+        raise ValueError("journal.archive.archive: 'by' must be 'month' or 'year'")
+    today = datetime.date.today()
+    closed = (today.replace(month=1, day=1) if by == "year" else today.replace(day=1)) - datetime.timedelta(days=1)
+    live = history.list_days(journal_dir, start=start, end=min(end, closed) if end is not None else closed, archived=False)
+    periods = {}
+    for day in live:
+        periods.setdefault(segment_name(day.date, by), []).append(day)
+    report = []
+    for name, days in sorted(periods.items()):
+        path = os.path.join(archive_dir(journal_dir), name)
+        merged = {}
+        if os.path.exists(path): # Keep what is already archived; a live file replaces its archived day
+            for ordinal, entry in open_segment(path).entries.items():
+                date = datetime.date.fromordinal(ordinal)
+                merged[ordinal] = (date, read_day(path, date), entry.mtime_ns)
+        original = 0
+        for day in days:
+            with open(day.path, 'rb') as ifile:
+                data = ifile.read()
+            merged[day.date.toordinal()] = (day.date, data, os.stat(day.path).st_mtime_ns)
+            original += len(data)
+        if dry_run:
+            report.append((path, len(days), original, None))
+            continue
+        os.makedirs(archive_dir(journal_dir), exist_ok=True)
+        size = write_segment(path, list(merged.values()))
+        sync_dir(archive_dir(journal_dir))
+        for date, data, mtime_ns in merged.values():
+            if read_day(path, date) != data:
+                raise ValueError("journal.archive.archive: verification of '{0}' failed for {1}; no files were removed".format(path, date))
+        for day in days:
+            os.remove(day.path)
+        sync_dir(journal_dir)
+        report.append((path, len(days), original, size))
+    return report
+
+
+def restore(journal_dir:str, start:datetime.date=None, end:datetime.date=None):
+    """
+    Write the archived days between start and end back to day files (with their original mtimes) and remove the segments that were
+    fully restored. A live file that already exists is left as it is. Returns the number of files written.
+    """
+    n = 0
+    for path in list_segments(journal_dir, start, end):
+        segment = open_segment(path)
+        kept = 0
+        for ordinal, entry in sorted(segment.entries.items()):
+            date = datetime.date.fromordinal(ordinal)
+            if (start is not None and date < start) or (end is not None and date > end):
+                kept += 1
+                continue
+            target = os.path.join(journal_dir, history.day_filename(date))
+            if os.path.exists(target):
+                continue
+            tmp = "{0}.{1}.tmp".format(target, os.getpid())
+            with open(tmp, 'wb') as ofile:
+                ofile.write(read_day(path, date))
+                ofile.flush()
+                os.fsync(ofile.fileno())
+            os.utime(tmp, ns=(entry.mtime_ns, entry.mtime_ns))
+            os.replace(tmp, target)
+            n += 1
+        sync_dir(journal_dir)
+        if kept == 0:
+            os.remove(path)
+            _segments.pop(path, None)
+    return n
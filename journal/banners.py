@@ -0,0 +1,90 @@
+import os
+
+import functools
+
+from journal.lazy import lazy_import
+
+from journal import history, catalog
+
+render = lazy_import("journal.render")
+
+"""
+Cache of the rendered prompt description banners
+
+A banner depends only on its description text, so it is rendered by pygments (journal.render) at most once:
+
+  memory : an LRU over banner()
+  disk   : {description: banner} pickled in the catalog cache directory. The catalog descriptions are pre-rendered when the catalog is
+           compiled (journal.catalog.load_catalog); other descriptions (e.g. the goal prompts) are added the first time they are shown.
+
+When every banner a session shows is already cached, pygments is never imported.
+"""
+
+BANNER_CACHE_VERSION = 1 # Bump when journal.render changes its output
+BANNER_CACHE_FILE = "banners.pickle"
+BANNER_LRU_SIZE = 256
+
+_disk = None # {description: banner}, loaded on first use
+_disk_path = os.path.join(catalog.CACHE_DIR, BANNER_CACHE_FILE)
+_dirty = False
+
+
+def configure(cache_dir:str):
+    """
+    Use 'cache_dir' for the on-disk tier (None disables it)
+    """
+    global _disk, _disk_path, _dirty
+    _disk_path = os.path.join(cache_dir, BANNER_CACHE_FILE) if cache_dir is not None else None
+    _disk = None
+    _dirty = False
+    banner.cache_clear()
+
+
+def disk_cache():
+    global _disk
+    if _disk is None:
+        stored = history.read_index(_disk_path, BANNER_CACHE_VERSION) if _disk_path is not None else None
+        _disk = stored["banners"] if stored is not None else {}
+    return _disk
+
+
+def preload(banners:dict):
+    """
+    Add pre-rendered banners to the disk tier
+    """
+    global _dirty
+    cache = disk_cache()
+    new = {d: b for d, b in banners.items() if cache.get(d) != b}
+    if len(new) > 0:
+        cache.update(new)
+        _dirty = True
+
+
+@functools.lru_cache(maxsize=BANNER_LRU_SIZE)
+def banner(description:str):
+    """
+    The highlighted banner for a description, rendered only if neither cache tier has it
+    """
+    global _dirty
+    cache = disk_cache()
+    if description not in cache:
+        cache[description] = render.description_banner(description)
+        _dirty = True
+    return cache[description]
+
+
+def render_all(descriptions):
+    """
+    {description: banner} for a set of descriptions (used when compiling the catalog)
+    """
+    return {d: render.description_banner(d) for d in set(descriptions)}
+
+
+def save():
+    """
+    Write the disk tier back if banners were added to it
+    """
+    global _dirty
+    if _dirty is True and _disk_path is not None:
+        history.write_index(_disk_path, BANNER_CACHE_VERSION, {"banners": _disk})
+    _dirty = False
@@ -0,0 +1,126 @@
+import datetime
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("journal.beliefs requires numpy. Install it with: pip install 'journal.py[stats]'") from e
+
+from journal import columnar
+
+"""
+Belief-score time series analytics
+
+The (score, reason) pairs collected by helpers.prompt_belief_list are read straight from the columnar store's packed score arrays
+(no copy) and reduced to one mean score per answered day. Rolling statistics, percentile bands and change-points are computed with
+vectorized NumPy over the whole history at once.
+"""
+
+WINDOW = 30 # answered days
+PERCENTILES = (10, 50, 90)
+MIN_SEGMENT = 14 # answered days
+CHANGE_PENALTY = 3.0 # x variance x log(n), BIC-style threshold for accepting a change-point
+
+BeliefSeries = namedtuple("BeliefSeries", ["prompt", "dates", "means", "counts"])
+ChangePoint = namedtuple("ChangePoint", ["date", "before", "after"])
+
+
+def belief_series(store:columnar.ColumnStore, prompt:str, start:datetime.date=None, end:datetime.date=None):
+    """
+    Daily mean belief score for one prompt: dates (datetime64[D]), means and number of scores, for the days that have scores
+    """
+    column = store.columns[store.resolve(prompt)]
+    if column.kind != "belief":
+        raise TypeError("journal.beliefs: '{0}' is not a belief prompt".format(prompt))
+    lo, hi = store.rows(start, end)
+    offsets = np.frombuffer(column.offsets, dtype=np.int64)[lo:hi + 1]
+    scores = np.frombuffer(column.scores, dtype=np.float64)[offsets[0]:offsets[-1]]
+    counts = np.diff(offsets)
+    rows = np.repeat(np.arange(hi - lo), counts)
+    sums = np.bincount(rows, weights=scores, minlength=hi - lo)
+    has_scores = counts > 0
+    ordinals = np.frombuffer(store.dates, dtype="i{0}".format(store.dates.itemsize))[lo:hi][has_scores]
+    dates = (ordinals - datetime.date(1970, 1, 1).toordinal()).astype("datetime64[D]")
+    return BeliefSeries(store.resolve(prompt), dates, sums[has_scores] / counts[has_scores], counts[has_scores])
+
+
+def rolling(means:np.ndarray, window:int=WINDOW, percentiles:tuple=PERCENTILES):
+    """
+    Rolling mean, variance and percentile bands over the last 'window' answered days. The first window-1 entries are NaN.
+    Returns (mean, variance, bands) with bands shaped (len(percentiles), len(means)).
+    """
+    if window < 1:
+        raise ValueError("journal.beliefs.rolling: the window must be at least 1 day, not {0}".format(window))
+    n = len(means)
+    mean = np.full(n, np.nan)
+    var = np.full(n, np.nan)
+    bands = np.full((len(percentiles), n), np.nan)
+    if n < window:
+        return mean, var, bands
+    windows = np.lib.stride_tricks.sliding_window_view(means, window)
+    mean[window - 1:] = windows.mean(axis=1)
+    var[window - 1:] = windows.var(axis=1, ddof=1) if window > 1 else 0.0
+    bands[:, window - 1:] = np.percentile(windows, percentiles, axis=1)
+    return mean, var, bands
+
+
+def best_split(x:np.ndarray, min_segment:int):
+    """
+    (index, gain) of the split of x that most reduces the within-segment sum of squares, computed for every split at once
+    """
+    n = len(x)
+    k = np.arange(min_segment, n - min_segment + 1)
+    if len(k) == 0:
+        return None, 0.0
+    cs = np.concatenate(([0.0], np.cumsum(x)))
+    left = cs[k] / k
+    right = (cs[n] - cs[k]) / (n - k)
+    gain = k * (n - k) / n * (left - right) ** 2
+    i = int(np.argmax(gain))
+    return int(k[i]), float(gain[i])
+
+
+def change_points(means:np.ndarray, min_segment:int=MIN_SEGMENT, penalty:float=CHANGE_PENALTY):
+    """
+    Indices where the mean level shifts, by binary segmentation. A split is kept if its gain exceeds penalty * variance * log(n).
+    """
+    n = len(means)
+    if n < 2 * min_segment:
+        return []
+    threshold = penalty * max(float(np.var(means)), 1e-9) * np.log(n)
+    found = []
+    segments = [(0, n)]
+    while segments:
+        a, b = segments.pop()
+        split, gain = best_split(means[a:b], min_segment)
+        if split is None or gain < threshold:
+            continue
+        found.append(a + split)
+        segments.extend([(a, a + split), (a + split, b)])
+    return sorted(found)
+
+
+def summarize(series:BeliefSeries, window:int=WINDOW, min_segment:int=MIN_SEGMENT, penalty:float=CHANGE_PENALTY):
+    """
+    Summary statistics and change-points for one prompt's series
+    """
+    means = series.means
+    mean, var, bands = rolling(means, window)
+    cps = change_points(means, min_segment, penalty)
+    bounds = [0] + cps + [len(means)]
+    changes = [ChangePoint(series.dates[c].item(), float(means[bounds[i]:c].mean()), float(means[c:bounds[i + 2]].mean()))
+               for i, c in enumerate(cps)]
+    return {
+        "days": int(len(means)),
+        "scores": int(series.counts.sum()),
+        "mean": float(means.mean()) if len(means) > 0 else None,
+        "sd": float(means.std(ddof=1)) if len(means) > 1 else None,
+        "rolling_mean": float(mean[-1]) if len(means) > 0 and not np.isnan(mean[-1]) else None,
+        "rolling_sd": float(np.sqrt(var[-1])) if len(means) > 0 and not np.isnan(var[-1]) else None,
+        "band": {p: float(bands[i, -1]) for i, p in enumerate(PERCENTILES)} if len(means) > 0 and not np.isnan(bands[0, -1]) else None,
+        "change_points": changes,
+    }
+
+
+def belief_prompts(store:columnar.ColumnStore):
+    return [p for p, c in store.columns.items() if c.kind == "belief"]
@@ -0,0 +1,164 @@
+import os
+import sys
+
+import hashlib
+import pickle
+from collections import namedtuple
+from pathlib import Path
+
+from journal import schemas
+
+"""
+Compiled prompt/quote catalog cache
+
+prompts.toml is parsed and validated once, then stored as a pickle in CACHE_DIR; quotes.toml is compiled into an indexed journal.quotes store
+next to it. The cache records the size, mtime and sha256 of each source file and is rebuilt automatically when a TOML file changes.
+Recompiling also pre-renders the prompt description banners into the journal.banners cache.
+"""
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(Path.home(), ".cache")), "journal")
+
+CATALOG_CACHE_VERSION = 2
+
+Catalog = namedtuple("Catalog", ["prompts", "quotes"])
+
+
+def file_hash(path:str):
+    """
+    sha256 hex digest of a file's contents
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as ifile:
+        for chunk in iter(lambda: ifile.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_signature(path:str):
+    """
+    Size, mtime and content hash of a source file, as recorded in a cache header
+    """
+    st = os.stat(path)
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": file_hash(path)
+    }
+
+
+def is_fresh(path:str, signature:dict):
+    """
+    True if 'path' still matches a recorded signature. The hash is only computed when the size/mtime have changed.
+    """
+    if signature is None:
+        return False
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    if st.st_size == signature["size"] and st.st_mtime_ns == signature["mtime_ns"]:
+        return True
+    return st.st_size == signature["size"] and file_hash(path) == signature["sha256"]
+
+
+def cache_path(name:str, sources:list, cache_dir:str=CACHE_DIR):
+    """
+    Location of the cache file 'name' for a given set of source files
+    """
+    key = hashlib.sha1("\0".join(os.path.abspath(s) for s in sources).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, "{0}_{1}.pickle".format(name, key))
+
+
+def read_cache(path:str, sources:list):
+    """
+    Load a cache file written by write_cache. Returns None if it is missing, unreadable, from another version or stale.
+    """
+    try:
+        with open(path, 'rb') as ifile:
+            cached = pickle.load(ifile)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if type(cached) is not dict or cached.get("version") != CATALOG_CACHE_VERSION:
+        return None
+    signatures = cached.get("sources", {})
+    if not all(is_fresh(s, signatures.get(os.path.abspath(s))) for s in sources):
+        return None
+    return cached
+
+
+def source_signatures(sources:list):
+    """
+    Signatures of the source files, taken before they are parsed so that a concurrent edit invalidates the cache
+    """
+    return {os.path.abspath(s): file_signature(s) for s in sources}
+
+
+def write_cache(path:str, signatures:dict, payload:dict):
+    """
+    Atomically write 'payload' with the signatures of its source files. Failure to write the cache is not fatal.
+    """
+    cached = dict(payload, version=CATALOG_CACHE_VERSION, sources=signatures)
+    tmp = "{0}.{1}.tmp".format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'wb') as ofile:
+            pickle.dump(cached, ofile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError as e:
+        sys.stderr.write("journal.catalog: could not write cache '{0}' ({1})\n".format(path, e))
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def compile_prompts(prompts_toml:str):
+    """
+    Parse and validate prompts.toml
+    """
+    import tomllib
+
+    with open(prompts_toml, 'rb') as ifile: # Open journal prompts
+        prompts = tomllib.load(ifile)
+    schemas.validate_catalog(prompts)
+    return prompts
+
+
+def compile_quotes(quotes_toml:str):
+    """
+    Parse quotes.toml into a list of (author, quote) tuples
+    """
+    import tomllib
+
+    with open(quotes_toml, 'rb') as ifile: # Open quotes file
+        quotes = tomllib.load(ifile)
+    return [(q["author"], q["quote"]) for n, q in quotes["quotes"].items()]
+
+
+def compile_catalog(prompts_toml:str, quotes_toml:str):
+    """
+    Parse and validate the TOML sources. Quotes are reorganized into a list of (author, quote) tuples.
+    """
+    return Catalog(compile_prompts(prompts_toml), compile_quotes(quotes_toml))
+
+
+def load_catalog(prompts_toml:str, quotes_toml:str, cache_dir:str=CACHE_DIR, use_cache:bool=True):
+    """
+    Return the validated Catalog(prompts, quotes), from the compiled cache when the TOML sources are unchanged.
+
+    With the cache, 'quotes' is a memory-mapped journal.quotes.QuoteStore (a sequence of (author, quote)) rather than a list.
+    """
+    if use_cache is False:
+        return compile_catalog(prompts_toml, quotes_toml)
+    from journal import quotes
+
+    sources = [prompts_toml]
+    path = cache_path("catalog", sources, cache_dir=cache_dir)
+    cached = read_cache(path, sources)
+    if cached is not None:
+        return Catalog(cached["prompts"], quotes.open_store(quotes_toml, cache_dir))
+    signatures = source_signatures(sources)
+    prompts = compile_prompts(prompts_toml)
+    write_cache(path, signatures, {"prompts": prompts})
+    from journal import banners
+    banners.preload(banners.render_all(p["description"] for table in prompts.values() for p in table.values()))
+    banners.save()
+    return Catalog(prompts, quotes.open_store(quotes_toml, cache_dir))
@@ -0,0 +1,343 @@
+import os
+import sys
+
+import bisect
+import datetime
+from array import array
+
+from journal import history, ingest, manifest
+
+"""
+Columnar longitudinal answer store
+
+All journal_metadata_*.yaml files are folded into one column per prompt, indexed by date:
+
+  bool   : two bitsets (answered, true), one bit per day
+  belief : float scores packed in an array('d') with per-day offsets (CSR layout), reasons kept alongside
+  text   : one str per day (text, singleline and choice prompts)
+  list   : one list per day (multiline and multichoice prompts)
+
+The store is pickled under JOURNAL_DIR/.journal and updated incrementally when new days are written.
+"""
+
+COLUMN_STORE_VERSION = 2
+COLUMN_STORE_FILE = "columns.pickle"
+
+PROMPT_KINDS = {
+    "boolean": "bool",
+    "belief": "belief",
+    "text": "text",
+    "singleline": "text",
+    "choice": "text",
+    "multiline": "list",
+    "multichoice": "list",
+}
+
+
+def catalog_kinds(prompts:dict):
+    """
+    {prompt text: column kind} and {prompt name: prompt text} for a prompts.toml catalog
+    """
+    kinds = {}
+    names = {}
+    for category, table in prompts.items():
+        for key, prompt_data in table.items():
+            kinds[prompt_data["prompt"]] = PROMPT_KINDS[prompt_data["prompt_type"]]
+            names[key] = prompt_data["prompt"]
+            names[prompt_data["name"]] = prompt_data["prompt"]
+    return kinds, names
+
+
+def resolve_prompt(prompt:str, texts, names:dict):
+    """
+    The prompt text (one of 'texts') for a prompt given as its exact text, its prompts.toml name ('names': {name: text}), or a unique
+    case-insensitive substring of either
+    """
+    if prompt in texts:
+        return prompt
+    elif prompt in names and names[prompt] in texts:
+        return names[prompt]
+    matches = [p for p in texts if prompt.lower() in p.lower()]
+    matches += [p for n, p in names.items() if prompt.lower() in n.lower() and p in texts and p not in matches]
+    if len(matches) == 1:
+        return matches[0]
+    elif len(matches) == 0:
+        raise KeyError("journal.columnar: no prompt matches '{0}'".format(prompt))
+    raise KeyError("journal.columnar: '{0}' is ambiguous. Matches: {1}".format(prompt, matches))
+
+
+def infer_kind(value):
+    """
+    Column kind for an answer that is not in the catalog
+    """
+    return PROMPT_KINDS[ingest.infer_type(value)]
+
+
+def row_mask(lo:int, hi:int):
+    """
+    Bitmask selecting rows lo <= i < hi
+    """
+    return ((1 << hi) - 1) ^ ((1 << lo) - 1)
+
+
+class Column:
+    """
+    Base column: 'present' has bit i set if the prompt was answered on row i
+    """
+    kind = None
+
+    def __init__(self, n:int=0):
+        self.n = 0
+        self.present = 0
+        for i in range(n):
+            self.append(None)
+
+    def append(self, value):
+        if value is not None:
+            self.present |= 1 << self.n
+        self.n += 1
+
+    def days(self, lo:int, hi:int):
+        return (self.present & row_mask(lo, hi)).bit_count()
+
+    def aggregate(self, lo:int, hi:int):
+        return {"days": self.days(lo, hi)}
+
+
+class BoolColumn(Column):
+    kind = "bool"
+
+    def __init__(self, n:int=0):
+        self.values = 0
+        super().__init__(n)
+
+    def append(self, value):
+        if value is True:
+            self.values |= 1 << self.n
+        super().append(value)
+
+    def value(self, i:int):
+        if not (self.present >> i) & 1:
+            return None
+        return bool((self.values >> i) & 1)
+
+    def aggregate(self, lo:int, hi:int):
+        mask = row_mask(lo, hi)
+        answered = (self.present & mask).bit_count()
+        true = (self.values & mask).bit_count()
+        return {
+            "days": answered,
+            "true": true,
+            "false": answered - true,
+            "rate": true / answered if answered > 0 else None
+        }
+
+    def rows_where(self, value:bool, lo:int, hi:int):
+        """
+        Row numbers in [lo, hi) where the answer was 'value'
+        """
+        bits = self.values if value is True else self.present & ~self.values
+        bits &= row_mask(lo, hi)
+        rows = []
+        while bits:
+            low = bits & -bits
+            rows.append(low.bit_length() - 1)
+            bits ^= low
+        return rows
+
+
+class BeliefColumn(Column):
+    kind = "belief"
+
+    def __init__(self, n:int=0):
+        self.offsets = array('q', [0])
+        self.scores = array('d')
+        self.reasons = []
+        super().__init__(n)
+
+    def append(self, value):
+        if value is not None:
+            for score, reason in value:
+                self.scores.append(float(score))
+                self.reasons.append(reason)
+        self.offsets.append(len(self.scores))
+        super().append(value)
+
+    def value(self, i:int):
+        if not (self.present >> i) & 1:
+            return None
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return [[s, r] for s, r in zip(self.scores[a:b], self.reasons[a:b])]
+
+    def aggregate(self, lo:int, hi:int):
+        scores = self.scores[self.offsets[lo]:self.offsets[hi]]
+        n = len(scores)
+        return {
+            "days": self.days(lo, hi),
+            "n": n,
+            "mean": sum(scores) / n if n > 0 else None,
+            "min": min(scores) if n > 0 else None,
+            "max": max(scores) if n > 0 else None
+        }
+
+
+class ObjectColumn(Column):
+    kind = "text"
+
+    def __init__(self, n:int=0):
+        self.values = []
+        super().__init__(n)
+
+    def append(self, value):
+        self.values.append(value)
+        super().append(value)
+
+    def value(self, i:int):
+        return self.values[i]
+
+
+class ListColumn(ObjectColumn):
+    kind = "list"
+
+
+COLUMN_TYPES = {c.kind: c for c in (BoolColumn, BeliefColumn, ObjectColumn, ListColumn)}
+
+
+def merge_answers(answers:list):
+    """
+    {prompt: value} for one day. A prompt repeated within a day has its list answers concatenated; otherwise the last answer wins.
+    """
+    merged = {}
+    for prompt, value in answers:
+        if prompt in merged and type(merged[prompt]) is list and type(value) is list:
+            merged[prompt] = merged[prompt] + value
+        else:
+            merged[prompt] = value
+    return merged
+
+
+class ColumnStore:
+    """
+    Query API over the whole journal history:
+
+        store = ColumnStore.open(JOURNAL_DIR, prompts)
+        store.query("Are you cooking today?", start=datetime.date(2025, 1, 1), end=datetime.date(2025, 12, 31))
+        {'days': 212, 'true': 140, 'false': 72, 'rate': 0.66}
+    """
+    def __init__(self, kinds:dict=None, names:dict=None):
+        self.dates = array('l') # date.toordinal() of each row, ascending
+        self.columns = {}
+        self.sources = {}
+        self.kinds = kinds if kinds is not None else {}
+        self.names = names if names is not None else {}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def add_day(self, date:datetime.date, answers:list):
+        """
+        Append one day (a row) to every column. Days must be added in date order.
+        """
+        ordinal = date.toordinal()
+        if len(self.dates) > 0 and ordinal <= self.dates[-1]:
+            raise ValueError("journal.columnar.ColumnStore.add_day: days must be added in increasing date order ({0})".format(date))
+        n = len(self.dates)
+        merged = merge_answers(answers)
+        for prompt, value in merged.items():
+            if prompt not in self.columns:
+                kind = self.kinds.get(prompt) or infer_kind(value)
+                self.columns[prompt] = COLUMN_TYPES[kind](n)
+        for prompt, column in self.columns.items():
+            column.append(merged.get(prompt))
+        self.dates.append(ordinal)
+
+    def rows(self, start:datetime.date=None, end:datetime.date=None):
+        """
+        Row range [lo, hi) covering start..end (inclusive)
+        """
+        lo = 0 if start is None else bisect.bisect_left(self.dates, start.toordinal())
+        hi = len(self.dates) if end is None else bisect.bisect_right(self.dates, end.toordinal())
+        return lo, max(lo, hi)
+
+    def date(self, i:int):
+        return datetime.date.fromordinal(self.dates[i])
+
+    def resolve(self, prompt:str):
+        """
+        Column for a prompt given as its exact text, its prompts.toml name, or a unique case-insensitive substring
+        """
+        return resolve_prompt(prompt, self.columns, self.names)
+
+    def query(self, prompt:str, start:datetime.date=None, end:datetime.date=None):
+        """
+        Aggregate a prompt's answers between start and end (inclusive)
+        """
+        column = self.columns[self.resolve(prompt)]
+        lo, hi = self.rows(start, end)
+        return column.aggregate(lo, hi)
+
+    def values(self, prompt:str, start:datetime.date=None, end:datetime.date=None):
+        """
+        (date, answer) for every day a prompt was answered between start and end
+        """
+        column = self.columns[self.resolve(prompt)]
+        lo, hi = self.rows(start, end)
+        return [(self.date(i), column.value(i)) for i in range(lo, hi) if (column.present >> i) & 1]
+
+    def where(self, prompt:str, value:bool, start:datetime.date=None, end:datetime.date=None):
+        """
+        Dates on which a boolean prompt was answered 'value'
+        """
+        column = self.columns[self.resolve(prompt)]
+        if column.kind != "bool":
+            raise TypeError("journal.columnar.ColumnStore.where: '{0}' is not a boolean prompt".format(prompt))
+        lo, hi = self.rows(start, end)
+        return [self.date(i) for i in column.rows_where(value, lo, hi)]
+
+    """
+    Building and persistence
+    """
+
+    def update(self, journal_dir:str):
+        """
+        Bring the store up to date with the day files. New days after the last row are appended; any other change rebuilds the columns.
+        Returns the number of days (re)read.
+        """
+        days, stats = manifest.digests(journal_dir) # Content digests: a day is only re-read when its contents changed
+        if stats == self.sources:
+            return 0
+        changed = any(stats.get(f) != s for f, s in self.sources.items())
+        new_days = [d for d in days if os.path.basename(d.path) not in self.sources]
+        if changed or (len(self.dates) > 0 and len(new_days) > 0 and new_days[0].date.toordinal() <= self.dates[-1]):
+            self.dates = array('l')
+            self.columns = {}
+            self.sources = {}
+            new_days = days
+        for day, answers in ingest.iter_days(new_days):
+            self.add_day(day.date, answers)
+            self.sources[os.path.basename(day.path)] = stats[os.path.basename(day.path)]
+        return len(new_days)
+
+    def save(self, path:str):
+        history.write_index(path, COLUMN_STORE_VERSION, {
+            "dates": self.dates,
+            "columns": self.columns,
+            "sources": self.sources,
+        })
+
+    @classmethod
+    def open(cls, journal_dir:str, prompts:dict=None):
+        """
+        Load the store for 'journal_dir', update it with any new or changed days and save it back
+        """
+        kinds, names = catalog_kinds(prompts) if prompts is not None else ({}, {})
+        store = cls(kinds=kinds, names=names)
+        path = os.path.join(history.index_dir(journal_dir), COLUMN_STORE_FILE)
+        index = history.read_index(path, COLUMN_STORE_VERSION)
+        if index is not None:
+            store.dates = index["dates"]
+            store.columns = index["columns"]
+            store.sources = index["sources"]
+        if store.update(journal_dir) > 0:
+            store.save(path)
+        return store
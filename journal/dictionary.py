@@ -0,0 +1,366 @@
+import os
+
+import io
+from collections import namedtuple
+
+from journal.lazy import lazy_import
+
+yaml = lazy_import("yaml")
+
+from journal import history
+
+ingest = lazy_import("journal.ingest")
+archive = lazy_import("journal.archive")
+
+"""
+Stable prompt IDs and the dictionary-encoded day format (journal migrate)
+
+JOURNAL_DIR/journal_prompts.yaml is the prompt dictionary of a journal directory. Each prompt ever answered there has an integer id
+that never changes, its key (the prompts.toml table names, "category.name"; None for a prompt only found in old files), its prompt_type,
+its current text and the texts it had before (aliases):
+
+  dictionary: 7                # version, incremented whenever the dictionary changes
+  format: 1
+  days: 2                      # format the sessions write their day files in (journal migrate --to)
+  prompts:
+  - {id: 0, key: bool.functional_week, type: boolean, text: Have you been functional this week?, aliases: []}
+  ...
+
+Once a directory has a dictionary (journal migrate), the day files are written in format 2, which references the prompts by id (until
+'journal migrate --to 1' sets "days: 1"; the dictionary is kept so that the ids and aliases survive a later migration):
+
+  format: 2
+  dictionary: 7                # dictionary version the file was written with
+  answers:
+  - [0, false]
+  - [12, [first line, second line]]
+
+history.load_day() reads both formats and gives the [prompt, answer] pairs with the prompt's current text, so a prompt reworded in
+prompts.toml (same key) keeps its history: the old text becomes an alias and the old days read under the new one. The texts come from
+the dictionary itself, so the prompt keys of the days read in one process are the same string objects and compare by identity.
+"""
+
+DICTIONARY_FILE = "journal_prompts.yaml"
+DICTIONARY_FORMAT = 1
+DAY_FORMAT = 2 # Format of a dictionary-encoded day file. The plain [prompt, answer] list is format 1.
+
+Entry = namedtuple("Entry", ["id", "key", "type", "text", "aliases"])
+
+_cache = {} # path: ((size, mtime_ns), PromptDictionary or None)
+
+
+class PromptDictionary:
+    def __init__(self, version:int=0, entries:list=(), day_format:int=DAY_FORMAT):
+        self.version = version
+        self.day_format = day_format
+        self.entries = [] # Entry by id
+        self.by_key = {}
+        self.by_text = {} # Current texts and aliases: id
+        self.dirty = False
+        for entry in entries:
+            self._set(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _set(self, entry:Entry):
+        if entry.id == len(self.entries):
+            self.entries.append(entry)
+        else:
+            self.entries[entry.id] = entry
+        if entry.key is not None:
+            self.by_key[entry.key] = entry.id
+        for alias in entry.aliases:
+            self.by_text.setdefault(alias, entry.id) # A current text takes precedence over an alias
+        self.by_text[entry.text] = entry.id
+
+    def add(self, key:str, kind:str, text:str):
+        """
+        New entry. Returns its id.
+        """
+        entry = Entry(len(self.entries), key, kind, text, ())
+        self._set(entry)
+        self.dirty = True
+        return entry.id
+
+    def intern(self, text:str, kind:str=None):
+        """
+        The id of a prompt text, added (without a key) if it is not in the dictionary
+        """
+        i = self.by_text.get(text)
+        return i if i is not None else self.add(None, kind, text)
+
+    def sync_catalog(self, prompts:dict):
+        """
+        Add the prompts of a prompts.toml catalog, keyed by "category.name". A prompt whose text changed keeps its id (the old
+        text becomes an alias), and a prompt found in old files without a key gets the catalog key. Returns True if anything changed.
+        """
+        dirty = self.dirty
+        self.dirty = False
+        for category, table in prompts.items():
+            for name, prompt_data in table.items():
+                key = "{0}.{1}".format(category, name)
+                text, kind = prompt_data["prompt"], prompt_data["prompt_type"]
+                i = self.by_key.get(key)
+                if i is None:
+                    i = self.by_text.get(text)
+                    if i is not None and self.entries[i].key is None: # Found in the history before it had a key
+                        self._set(self.entries[i]._replace(key=key, type=kind))
+                        self.dirty = True
+                    else:
+                        self.add(key, kind, text)
+                    continue
+                entry = self.entries[i]
+                if entry.text != text: # Reworded
+                    aliases = tuple(a for a in entry.aliases if a != text) + (entry.text,)
+                    self._set(entry._replace(text=text, type=kind, aliases=aliases))
+                    self.dirty = True
+                elif entry.type != kind:
+                    self._set(entry._replace(type=kind))
+                    self.dirty = True
+        changed = self.dirty
+        self.dirty = dirty or changed
+        return changed
+
+    def canonical(self, text:str):
+        """
+        The current text of a prompt text or alias (the text itself if it is not in the dictionary)
+        """
+        i = self.by_text.get(text)
+        return self.entries[i].text if i is not None else text
+
+    def encode(self, answers:list, keys:list=None):
+        """
+        [[id, answer]] for [prompt, answer] pairs. 'keys' ("category.name" or None, one per pair) take precedence over the texts.
+        Unknown prompts are added.
+        """
+        encoded = []
+        for n, (prompt, value) in enumerate(answers):
+            i = self.by_key.get(keys[n]) if keys is not None and keys[n] is not None else None
+            encoded.append([i if i is not None else self.intern(prompt), value])
+        return encoded
+
+    def decode(self, records:list, path:str=None):
+        """
+        [[prompt, answer]] with the current prompt texts for [[id, answer]] records
+        """
+        entries = self.entries
+        n = len(entries)
+        answers = []
+        for record in records:
+            if type(record) is not list or len(record) != 2 or type(record[0]) is not int or not 0 <= record[0] < n:
+                raise ValueError("journal.dictionary.decode: '{0}' has a record that is not a [prompt id, answer] pair of dictionary version {1}: {2!r}".format(
+                    path, self.version, record))
+            answers.append([entries[record[0]].text, record[1]])
+        return answers
+
+    def day_data(self, records:list):
+        """
+        The contents of a format 2 day file for encoded records. The dictionary must be saved (encode() may have added prompts).
+        """
+        if self.dirty:
+            raise ValueError("journal.dictionary.day_data: save the dictionary before writing day files that reference it")
+        return {"format": DAY_FORMAT, "dictionary": self.version, "answers": records}
+
+    def to_data(self):
+        return {"dictionary": self.version, "format": DICTIONARY_FORMAT, "days": self.day_format,
+                "prompts": [{"id": e.id, "key": e.key, "type": e.type, "text": e.text, "aliases": list(e.aliases)} for e in self.entries]}
+
+    @classmethod
+    def from_data(cls, data, path:str=None):
+        if type(data) is not dict or data.get("format") != DICTIONARY_FORMAT or type(data.get("prompts")) is not list:
+            raise ValueError("journal.dictionary: '{0}' is not a format {1} prompt dictionary".format(path, DICTIONARY_FORMAT))
+        entries = []
+        for n, p in enumerate(data["prompts"]):
+            if type(p) is not dict or p.get("id") != n or type(p.get("text")) is not str:
+                raise ValueError("journal.dictionary: entry {0} of '{1}' is invalid (ids must be 0, 1, 2...)".format(n, path))
+            entries.append(Entry(n, p.get("key"), p.get("type"), p["text"], tuple(p.get("aliases") or ())))
+        if data.get("days", DAY_FORMAT) not in (1, DAY_FORMAT):
+            raise ValueError("journal.dictionary: '{0}' has an unknown day file format {1}".format(path, data["days"]))
+        return cls(data["dictionary"], entries, data.get("days", DAY_FORMAT))
+
+    def save(self, journal_dir:str):
+        """
+        Write the dictionary (atomically, with a new version) if it changed
+        """
+        if self.dirty is False:
+            return False
+        self.version += 1
+        path = dictionary_path(journal_dir)
+        tmp = "{0}.{1}.tmp".format(path, os.getpid())
+        with open(tmp, 'w') as ofile:
+            yaml.dump(self.to_data(), ofile, Dumper=history.yaml_dumper(), sort_keys=False, allow_unicode=True, default_flow_style=None, width=1 << 16)
+            ofile.flush()
+            os.fsync(ofile.fileno())
+        os.replace(tmp, path)
+        self.dirty = False
+        _cache[path] = (history.file_stat(path), self)
+        return True
+
+
+def dictionary_path(journal_dir:str):
+    return os.path.join(journal_dir, DICTIONARY_FILE)
+
+
+def load(journal_dir:str):
+    """
+    The prompt dictionary of 'journal_dir' (None if it has none), cached until the file changes
+    """
+    path = dictionary_path(journal_dir)
+    try:
+        stat = history.file_stat(path)
+    except FileNotFoundError:
+        stat = None
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == stat:
+        return cached[1]
+    if stat is None:
+        dictionary = None
+    else:
+        with open(path, 'r') as ifile:
+            dictionary = PromptDictionary.from_data(yaml.load(ifile, Loader=history.yaml_loader()), path)
+    _cache[path] = (stat, dictionary)
+    return dictionary
+
+
+def decode_day(data, journal_dir:str, path:str=None):
+    """
+    The [prompt, answer] pairs of a format 2 day file's contents
+    """
+    if data.get("format") != DAY_FORMAT or type(data.get("answers")) is not list:
+        raise ValueError("journal.dictionary.decode_day: '{0}' is not a format {1} day file".format(path, DAY_FORMAT))
+    dictionary = load(journal_dir)
+    if dictionary is None:
+        raise ValueError("journal.dictionary.decode_day: '{0}' needs the prompt dictionary '{1}', which is missing".format(path, dictionary_path(journal_dir)))
+    elif type(data.get("dictionary")) is not int or data["dictionary"] > dictionary.version:
+        raise ValueError("journal.dictionary.decode_day: '{0}' was written with dictionary version {1}, newer than '{2}' (version {3})".format(
+            path, data.get("dictionary"), dictionary_path(journal_dir), dictionary.version))
+    return dictionary.decode(data["answers"], path)
+
+
+def canonical_answers(answers:list, journal_dir:str):
+    """
+    [prompt, answer] pairs (format 1) with the current texts of reworded prompts, when 'journal_dir' has a dictionary
+    """
+    dictionary = load(journal_dir)
+    if dictionary is None:
+        return answers
+    return [[dictionary.canonical(a[0]), a[1]] if type(a) is list and len(a) == 2 and type(a[0]) is str else a for a in answers]
+
+
+def dump_day(data, ofile):
+    """
+    Write a day file: format 1 (a list of [prompt, answer] pairs) exactly as before, format 2 with the pairs in flow style
+    """
+    if type(data) is dict:
+        yaml.dump(data, ofile, Dumper=history.yaml_dumper(), sort_keys=False, default_flow_style=None)
+    else:
+        yaml.dump(data, ofile, Dumper=history.yaml_dumper(), sort_keys=False)
+
+
+def for_session(journal_dir:str, prompts:dict):
+    """
+    The dictionary to write a session's day file with, updated with the catalog and saved: None (format 1) unless 'journal_dir'
+    has been migrated to format 2. A directory migrated back to format 1 keeps its dictionary up to date for the aliases.
+    """
+    dictionary = load(journal_dir)
+    if dictionary is not None:
+        dictionary.sync_catalog(prompts)
+        dictionary.save(journal_dir)
+    return dictionary if dictionary is not None and dictionary.day_format == DAY_FORMAT else None
+
+
+def day_format(data:bytes):
+    """
+    Format of a day file from its first bytes (2 for a dictionary-encoded file, 1 otherwise)
+    """
+    return DAY_FORMAT if data.startswith(b"format: 2\n") else 1
+
+
+def write_day(path:str, data:bytes, mtime_ns:int=None):
+    """
+    Atomically (re)write a day file from its bytes (dump_bytes), optionally with the given mtime
+    """
+    tmp = "{0}.{1}.tmp".format(path, os.getpid())
+    with open(tmp, 'wb') as ofile:
+        ofile.write(data)
+        ofile.flush()
+        os.fsync(ofile.fileno())
+    if mtime_ns is not None:
+        os.utime(tmp, ns=(mtime_ns, mtime_ns))
+    os.replace(tmp, path)
+
+
+"""
+Migration
+"""
+
+def migrate(journal_dir:str, prompts:dict, to:int=DAY_FORMAT, processes:int=None, dry_run:bool=False):
+    """
+    Rewrite the history of 'journal_dir' (live day files and archive segments) in format 'to' (2: dictionary-encoded, 1: [prompt,
+    answer] pairs with the current prompt texts). The dictionary is built from the catalog and every prompt in the history, and saved
+    before any file that references it is written. Files keep their mtimes. Returns (files rewritten, files already in the format,
+    bytes before, bytes after) for the rewritten files.
+    """
+    if to not in (1, DAY_FORMAT):
+        raise ValueError("journal.dictionary.migrate: unknown day file format {0} (1 or {1})".format(to, DAY_FORMAT))
+    days = history.list_days(journal_dir)
+    loaded = load(journal_dir)
+    if loaded is None and to == 1:
+        return 0, len(days), 0, 0 # Never migrated
+    dictionary = PromptDictionary(loaded.version, loaded.entries, loaded.day_format) if loaded is not None else PromptDictionary() # A copy: the cached one is only replaced by save()
+    dictionary.dirty = loaded is None or loaded.day_format != to
+    dictionary.day_format = to # What the sessions write from now on
+    dictionary.sync_catalog(prompts)
+    types = ingest.catalog_types(prompts)
+    segments = archive.list_segments(journal_dir)
+    archived = [archive.archived_days(journal_dir, *archive.segment_range(os.path.basename(path))) for path in segments]
+    if to == DAY_FORMAT: # First pass: an id for every prompt text in the history
+        for day, answers in ingest.iter_days([d for d in days if d.segment is None] + [d for ds in archived for d in ds], processes=processes):
+            for prompt, value in answers:
+                dictionary.intern(prompt, types.get(prompt) or ingest.infer_type(value))
+    if not dry_run:
+        dictionary.save(journal_dir)
+    elif dictionary.dirty: # As save() would
+        dictionary.version += 1
+        dictionary.dirty = False
+
+    def encoded(answers):
+        return dictionary.day_data(dictionary.encode(answers)) if to == DAY_FORMAT else answers
+
+    rewritten = skipped = before = after = 0
+    for day, answers in ingest.iter_days([d for d in days if d.segment is None], processes=processes):
+        data = history.day_bytes(day)
+        if day_format(data) == to:
+            skipped += 1
+            continue
+        new = dump_bytes(encoded(answers))
+        if not dry_run:
+            write_day(day.path, new, history.file_stat(day.path)[1])
+        rewritten += 1
+        before += len(data)
+        after += len(new)
+    for path, segment_days in zip(segments, archived):
+        entries = archive.open_segment(path).entries
+        contents = []
+        changed = False
+        for day in segment_days:
+            data = history.day_bytes(day)
+            new = data if day_format(data) == to else dump_bytes(encoded(history.load_day(day)))
+            contents.append((day.date, new, entries[day.date.toordinal()].mtime_ns))
+            if new is data:
+                skipped += 1
+            else:
+                changed = True
+                rewritten += 1
+                before += len(data)
+                after += len(new)
+        if not dry_run and changed:
+            archive.write_segment(path, contents)
+    return rewritten, skipped, before, after
+
+
+def dump_bytes(data):
+    stream = io.StringIO()
+    dump_day(data, stream)
+    return stream.getvalue().encode("utf-8")
@@ -0,0 +1,196 @@
+import os
+import sys
+
+import csv
+import json
+import datetime
+
+from journal import history, ingest, columnar
+
+"""
+Streaming export of the journal history (journal export)
+
+The day files are streamed through journal.ingest (only the files in the date range are opened, and the workers drop the answers to
+unselected prompts), turned into rows one day at a time and written as they come, so memory stays bounded however long the history is.
+
+  long : one row per answer item, (date, prompt, type, item, value, score). A multiline answer gives one row per line and a belief list
+         one row per [score, reason] (value is the reason). Every answer in the history is exported.
+  wide : one row per day and one column per prompt, named by its prompts.toml name. Only the catalog (or --prompt) prompts are exported.
+
+Formats: CSV and JSON lines, and Parquet or Arrow IPC (typed columns, written in record batches) when pyarrow is installed.
+"""
+
+LONG_COLUMNS = ("date", "prompt", "type", "item", "value", "score")
+FORMATS = ("csv", "jsonl", "parquet", "arrow")
+LAYOUTS = ("long", "wide")
+BATCH_ROWS = 4096 # Rows per Arrow record batch
+
+
+def resolve_prompts(selectors:list, prompts:dict):
+    """
+    Prompt texts for --prompt selectors (text, prompts.toml name or unique substring), in the order given
+    """
+    kinds, names = columnar.catalog_kinds(prompts)
+    texts = []
+    for selector in selectors:
+        text = columnar.resolve_prompt(selector, kinds, names)
+        if text not in texts:
+            texts.append(text)
+    return texts
+
+
+def long_rows(records):
+    """
+    (date, prompt, type, item, value, score) for each item of each ingest.Record
+    """
+    for date, prompt, kind, value in records:
+        if type(value) is list:
+            for i, item in enumerate(value):
+                if kind == "belief" and type(item) is list and len(item) == 2:
+                    yield (date, prompt, kind, i, item[1], item[0])
+                else:
+                    yield (date, prompt, kind, i, item, None)
+        else:
+            yield (date, prompt, kind, 0, value, None)
+
+
+def wide_rows(days, columns:list, processes:int=None):
+    """
+    (date, answer to each of 'columns') for each Day. A prompt asked twice in a day is merged as by the columnar store.
+    """
+    for day, answers in ingest.iter_days(days, processes=processes, only=set(columns)):
+        merged = columnar.merge_answers(answers)
+        yield (day.date,) + tuple(merged.get(prompt) for prompt in columns)
+
+
+def cell(value):
+    """
+    CSV text for a value: booleans as true/false, lists and mappings as JSON, None as an empty cell
+    """
+    if value is None:
+        return ""
+    elif type(value) is bool:
+        return "true" if value else "false"
+    elif type(value) in (list, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def write_csv(rows, header:list, ofile):
+    writer = csv.writer(ofile)
+    writer.writerow(header)
+    n = 0
+    for row in rows:
+        writer.writerow([cell(v) for v in row])
+        n += 1
+    return n
+
+
+def write_jsonl(rows, header:list, ofile):
+    n = 0
+    for row in rows:
+        record = dict(zip(header, row))
+        record["date"] = str(record["date"])
+        ofile.write(json.dumps(record, ensure_ascii=False) + "\n")
+        n += 1
+    return n
+
+
+def arrow_types(pa, kinds:list):
+    """
+    Arrow type of each wide column, from its prompt_type
+    """
+    belief = pa.list_(pa.struct([("score", pa.float64()), ("reason", pa.string())]))
+    types = []
+    for kind in kinds:
+        if kind == "boolean":
+            types.append(pa.bool_())
+        elif kind == "belief":
+            types.append(belief)
+        elif kind in ("multiline", "multichoice"):
+            types.append(pa.list_(pa.string()))
+        else:
+            types.append(pa.string())
+    return types
+
+
+def write_arrow(rows, header:list, types:list, path:str, fmt:str):
+    """
+    Write the rows to a Parquet or Arrow IPC file, BATCH_ROWS at a time. 'types' are the Arrow types of the non-date columns.
+    """
+    pa = arrow()
+    schema = pa.schema([pa.field("date", pa.date32())] + [pa.field(name, t) for name, t in zip(header[1:], types)])
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, schema)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    n = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_ROWS:
+                writer.write_batch(record_batch(pa, schema, batch))
+                n += len(batch)
+                batch = []
+        if len(batch) > 0:
+            writer.write_batch(record_batch(pa, schema, batch))
+            n += len(batch)
+    finally:
+        writer.close()
+    return n
+
+
+def record_batch(pa, schema, batch:list):
+    columns = list(zip(*batch))
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_list(field.type) and pa.types.is_struct(field.type.value_type): # Belief lists
+            values = [None if v is None else [{"score": s, "reason": r} for s, r in v] for v in values]
+        elif field.type == pa.string():
+            values = [v if v is None or type(v) is str else cell(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def arrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError("journal.export: Parquet/Arrow output requires pyarrow. Install it with: pip install 'journal.py[export]'") from e
+    return pyarrow
+
+
+def export(journal_dir:str, output, fmt:str="csv", layout:str="long", prompts:dict=None, only:list=None,
+           start:datetime.date=None, end:datetime.date=None, processes:int=None):
+    """
+    Export the history in 'journal_dir' dated start..end. 'output' is a text file object for csv/jsonl and a path for parquet/arrow.
+    'only' is a list of prompt texts (see resolve_prompts); the wide layout needs it or a 'prompts' catalog for its columns.
+    Returns the number of rows written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError("journal.export: unknown format '{0}' (one of {1})".format(fmt, ", ".join(FORMATS)))
+    elif layout not in LAYOUTS:
+        raise ValueError("journal.export: unknown layout '{0}' (one of {1})".format(layout, ", ".join(LAYOUTS)))
+    if fmt in ("parquet", "arrow"):
+        arrow() # Fail before any file is read
+    types = ingest.catalog_types(prompts) if prompts is not None else {}
+    if layout == "long":
+        rows = long_rows(ingest.iter_records(journal_dir, start, end, prompts=prompts, processes=processes, only=set(only) if only is not None else None))
+        header = list(LONG_COLUMNS)
+        pa_types = None if fmt in ("csv", "jsonl") else [arrow().string(), arrow().string(), arrow().int32(), arrow().string(), arrow().float64()]
+    else:
+        if only is None and prompts is None:
+            raise ValueError("journal.export: the wide layout needs a prompts catalog or a list of prompts")
+        columns = list(only) if only is not None else list(types)
+        names = {p["prompt"]: p["name"] for table in (prompts or {}).values() for p in table.values()}
+        header = ["date"] + [names.get(prompt, prompt) for prompt in columns]
+        rows = wide_rows(history.list_days(journal_dir, start=start, end=end), columns, processes=processes)
+        pa_types = None if fmt in ("csv", "jsonl") else arrow_types(arrow(), [types.get(prompt, "text") for prompt in columns])
+    if fmt == "csv":
+        return write_csv(rows, header, output)
+    elif fmt == "jsonl":
+        return write_jsonl(rows, header, output)
+    return write_arrow(rows, header, pa_types, output, fmt)
@@ -0,0 +1,191 @@
+import os
+import sys
+
+import json
+import sqlite3
+import datetime
+
+from journal import schemas
+
+"""
+SQLite-backed goal store
+
+Goals are inserted, re-selected and retired one at a time as the session goes, so nothing is lost if it is interrupted, and the
+store never rewrites its whole contents. Retired goals stay in the table and every change is recorded in goal_history.
+"""
+
+GOAL_FIELDS = ("prompt_type", "name", "description", "priority", "effort", "date")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS goals (
+    id INTEGER PRIMARY KEY,
+    prompt_type TEXT NOT NULL DEFAULT 'goal',
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    effort INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    retired TEXT
+);
+CREATE INDEX IF NOT EXISTS goals_name ON goals (name);
+CREATE INDEX IF NOT EXISTS goals_date ON goals (date);
+CREATE INDEX IF NOT EXISTS goals_priority ON goals (priority);
+CREATE INDEX IF NOT EXISTS goals_effort ON goals (effort);
+CREATE INDEX IF NOT EXISTS goals_active ON goals (retired, priority);
+
+CREATE TABLE IF NOT EXISTS goal_history (
+    id INTEGER PRIMARY KEY,
+    goal_id INTEGER NOT NULL REFERENCES goals (id),
+    event TEXT NOT NULL,
+    at TEXT NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS goal_history_goal ON goal_history (goal_id, event);
+"""
+
+
+def now():
+    return str(datetime.datetime.today())
+
+
+class GoalStore:
+    """
+    Goals as dictionaries with the goals.json fields plus their 'id':
+
+        store = GoalStore(GOALS_DB)
+        goal_id = store.insert({"prompt_type": "goal", "name": ..., "description": ..., "priority": 3, "effort": 5, "date": ...})
+        store.active()
+        store.retire(goal_id)
+    """
+    def __init__(self, path:str):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False) # journal.preload opens the store on its worker thread
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM goals").fetchone()[0]
+
+    def _log(self, goal_id:int, event:str, data:dict=None):
+        self.conn.execute("INSERT INTO goal_history (goal_id, event, at, data) VALUES (?, ?, ?, ?)",
+                          (goal_id, event, now(), json.dumps(data) if data is not None else None))
+
+    @staticmethod
+    def _goal(row):
+        goal = {f: row[f] for f in GOAL_FIELDS}
+        goal["id"] = row["id"]
+        return goal
+
+    def insert(self, goal:dict, event:str="insert"):
+        """
+        Validate and insert one goal. Returns its id.
+        """
+        schemas.validate([goal], "goal")
+        with self.conn:
+            cur = self.conn.execute("INSERT INTO goals (prompt_type, name, description, priority, effort, date) VALUES (?, ?, ?, ?, ?, ?)",
+                                    tuple(goal[f] for f in GOAL_FIELDS))
+            self._log(cur.lastrowid, event)
+        return cur.lastrowid
+
+    def update(self, goal_id:int, **fields):
+        """
+        Change some of a goal's fields (name, description, priority, effort). The previous values are kept in the history.
+        """
+        unknown = set(fields) - set(GOAL_FIELDS)
+        if len(unknown) > 0:
+            raise ValueError("journal.goals.GoalStore.update: unknown goal fields {0}".format(sorted(unknown)))
+        goal = dict(self.get(goal_id), **fields)
+        goal.pop("id")
+        schemas.validate([goal], "goal")
+        with self.conn:
+            previous = self.get(goal_id)
+            self.conn.execute("UPDATE goals SET {0} WHERE id = ?".format(", ".join("{0} = ?".format(f) for f in fields)),
+                              tuple(fields.values()) + (goal_id,))
+            self._log(goal_id, "update", {f: previous[f] for f in fields})
+
+    def retire(self, goal_ids:list):
+        """
+        Mark goals as no longer pursued. They stay in the store with their history.
+        """
+        at = now()
+        with self.conn:
+            for goal_id in goal_ids:
+                self.conn.execute("UPDATE goals SET retired = ? WHERE id = ? AND retired IS NULL", (at, goal_id))
+                self._log(goal_id, "retire")
+
+    def select(self, goal_ids:list):
+        """
+        Record that goals were re-selected to continue in a session
+        """
+        with self.conn:
+            for goal_id in goal_ids:
+                self._log(goal_id, "select")
+
+    def get(self, goal_id:int):
+        row = self.conn.execute("SELECT * FROM goals WHERE id = ?", (goal_id,)).fetchone()
+        if row is None:
+            raise KeyError("journal.goals.GoalStore.get: no goal with id {0}".format(goal_id))
+        return self._goal(row)
+
+    def active(self):
+        """
+        Goals that have not been retired, by priority (highest first) then date
+        """
+        rows = self.conn.execute("SELECT * FROM goals WHERE retired IS NULL ORDER BY priority DESC, date")
+        return [self._goal(r) for r in rows]
+
+    def find(self, name:str):
+        """
+        All goals, active or retired, with a given name
+        """
+        return [self._goal(r) for r in self.conn.execute("SELECT * FROM goals WHERE name = ? ORDER BY date", (name,))]
+
+    def selection_counts(self):
+        """
+        {goal id: number of sessions it was re-selected in}, for the active goals
+        """
+        rows = self.conn.execute("SELECT h.goal_id, COUNT(*) FROM goal_history h JOIN goals g ON g.id = h.goal_id "
+                                 "WHERE h.event = 'select' AND g.retired IS NULL GROUP BY h.goal_id")
+        return {goal_id: n for goal_id, n in rows}
+
+    def history(self, goal_id:int):
+        """
+        [(event, at, data)] for a goal, oldest first
+        """
+        rows = self.conn.execute("SELECT event, at, data FROM goal_history WHERE goal_id = ? ORDER BY id", (goal_id,))
+        return [(r["event"], r["at"], json.loads(r["data"]) if r["data"] is not None else None) for r in rows]
+
+    def import_json(self, path:str):
+        """
+        Import the goals of a goals.json file, skipping goals already in the store (same name and date). Returns the number imported.
+        """
+        with open(path, 'r') as ifile:
+            text = ifile.read()
+        goals = json.loads(text) if text.strip() != "" else []
+        if goals is None:
+            goals = []
+        schemas.validate(goals, "goal")
+        n = 0
+        for goal in goals:
+            exists = self.conn.execute("SELECT 1 FROM goals WHERE name = ? AND date = ?", (goal["name"], goal["date"])).fetchone()
+            if exists is None:
+                self.insert({f: goal[f] for f in GOAL_FIELDS}, event="import")
+                n += 1
+        return n
+
+
+def open_store(db_path:str, goals_json:str=None):
+    """
+    Open the goal store, importing 'goals_json' the first time (when the store is empty)
+    """
+    store = GoalStore(db_path)
+    if len(store) == 0 and goals_json is not None and os.path.exists(goals_json):
+        n = store.import_json(goals_json)
+        sys.stderr.write("\n\nImported {0} goals from '{1}' into '{2}'...\n\n".format(n, goals_json, db_path))
+    return store
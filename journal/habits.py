@@ -0,0 +1,313 @@
+import os
+
+import datetime
+from collections import namedtuple
+
+from journal import history, ingest, manifest, columnar
+
+"""
+Habit streaks of the boolean prompts (journal stats habits)
+
+Each boolean prompt is a daily habit, kept as two bitsets (Python ints) indexed by day number, day - origin where origin is the first
+day of the history. Unlike the rows of journal.columnar, every calendar day has a bit, so a day without a file counts as missed:
+
+  answered : bit d set if the prompt was answered on day d
+  done     : bit d set if the answer was true
+
+Streaks, completion rates and heatmaps are computed with shifts, masks and popcounts over whole bitsets:
+
+  current streak : the trailing run of done days ending on the as-of day (or the day before, while the day is not answered yet),
+                   from the highest missed day below it
+  longest streak : runs of 2, 4, 8... done days by shift-and doubling, then a binary descent to the exact length
+  rate           : popcount(done & window) / days in the window
+
+The store is pickled under JOURNAL_DIR/.journal and updated incrementally: a new, changed or removed day file only sets or clears its
+own bits (a day before the origin shifts the bitsets), and make_prompts folds each session's answers into an existing store.
+"""
+
+HABITS_VERSION = 1
+HABITS_FILE = "habits.pickle"
+
+RATE_WINDOWS = (7, 30, 365)
+HEATMAP_CELLS = {(False, False): " ", (True, False): "·", (True, True): "█"} # (answered, done)
+
+Streak = namedtuple("Streak", ["length", "start", "end"])
+
+
+def mask(lo:int, hi:int):
+    """
+    Bitmask selecting days lo <= d < hi
+    """
+    return ((1 << hi) - 1) ^ ((1 << lo) - 1) if hi > lo else 0
+
+
+def runs(bits:int):
+    """
+    [r0, r1, r2, ...] where bit d of r_j is set if days d .. d + 2**j - 1 are all set in 'bits', up to the last non-zero r_j
+    """
+    powers = [bits]
+    while True:
+        shifted = powers[-1] & (powers[-1] >> (1 << (len(powers) - 1)))
+        if shifted == 0:
+            return powers
+        powers.append(shifted)
+
+
+def longest_run(bits:int):
+    """
+    (length, first day) of the longest run of set bits (the earliest, if several are as long). (0, None) if no bit is set.
+    """
+    if bits == 0:
+        return 0, None
+    powers = runs(bits)
+    length = 1 << (len(powers) - 1)
+    starts = powers[-1]
+    for j in range(len(powers) - 2, -1, -1): # Extend the runs found so far by 2**j where the next 2**j days are all set
+        extended = starts & (powers[j] >> length)
+        if extended:
+            starts = extended
+            length += 1 << j
+    return length, (starts & -starts).bit_length() - 1
+
+
+def trailing_run(bits:int, end:int):
+    """
+    Length of the run of set bits ending on day 'end' (inclusive)
+    """
+    if end < 0:
+        return 0
+    missed = ~bits & mask(0, end + 1)
+    return end + 1 if missed == 0 else end - (missed.bit_length() - 1)
+
+
+class Habit:
+    """
+    Answered and done bitsets of one boolean prompt
+    """
+    __slots__ = ("answered", "done")
+
+    def __init__(self):
+        self.answered = 0
+        self.done = 0
+
+    def __getstate__(self):
+        return (self.answered, self.done)
+
+    def __setstate__(self, state):
+        self.answered, self.done = state
+
+    def set(self, d:int, value):
+        """
+        Record day d's answer (None clears the day)
+        """
+        bit = 1 << d
+        self.answered &= ~bit
+        self.done &= ~bit
+        if value is not None:
+            self.answered |= bit
+            if value is True:
+                self.done |= bit
+
+    def shift(self, n:int):
+        self.answered <<= n
+        self.done <<= n
+
+
+class HabitStore:
+    """
+    Habit statistics over the whole journal history:
+
+        store = HabitStore.open(JOURNAL_DIR, prompts)
+        store.streaks("Are you cooking today?", datetime.date.today())
+        {'current': Streak(length=4, ...), 'longest': Streak(length=19, ...)}
+    """
+    def __init__(self, kinds:dict=None, names:dict=None):
+        self.origin = None # date.toordinal() of day 0
+        self.habits = {}
+        self.sources = {} # {day filename: (date ordinal, digest, [boolean prompts answered that day])}
+        self.kinds = kinds if kinds is not None else {}
+        self.names = names if names is not None else {}
+
+    def day(self, date:datetime.date):
+        return date.toordinal() - self.origin
+
+    def date(self, d:int):
+        return datetime.date.fromordinal(self.origin + d)
+
+    def resolve(self, prompt:str):
+        """
+        Habit for a prompt given as its exact text, its prompts.toml name, or a unique case-insensitive substring
+        """
+        return columnar.resolve_prompt(prompt, self.habits, self.names)
+
+    """
+    Updates
+    """
+
+    def clear_day(self, ordinal:int, prompts:list):
+        for prompt in prompts:
+            self.habits[prompt].set(ordinal - self.origin, None)
+
+    def add_day(self, date:datetime.date, answers:list):
+        """
+        Set the bits of one day from its [prompt, answer] pairs. Returns the boolean prompts answered.
+        """
+        ordinal = date.toordinal()
+        if self.origin is None:
+            self.origin = ordinal
+        elif ordinal < self.origin: # A day before the history: move day 0
+            for habit in self.habits.values():
+                habit.shift(self.origin - ordinal)
+            self.origin = ordinal
+        merged = columnar.merge_answers(answers)
+        answered = []
+        for prompt, value in merged.items():
+            if (self.kinds.get(prompt) or columnar.infer_kind(value)) != "bool" or type(value) is not bool:
+                continue
+            if prompt not in self.habits:
+                self.habits[prompt] = Habit()
+            self.habits[prompt].set(ordinal - self.origin, value)
+            answered.append(prompt)
+        return answered
+
+    def record(self, name:str, date:datetime.date, answers:list, digest:str):
+        """
+        Replace the day file 'name' (dated 'date') with its current answers
+        """
+        if name in self.sources:
+            self.clear_day(self.sources[name][0], self.sources[name][2])
+        self.sources[name] = (date.toordinal(), digest, self.add_day(date, answers))
+
+    def update(self, journal_dir:str):
+        """
+        Bring the store up to date with the day files: only the days whose contents changed are read. Returns the number of days read or removed.
+        """
+        days, stats = manifest.digests(journal_dir)
+        stale = [d for d in days if self.sources.get(os.path.basename(d.path), (None, None))[1] != stats[os.path.basename(d.path)]]
+        removed = set(self.sources) - set(stats)
+        for name in removed:
+            ordinal, digest, prompts = self.sources.pop(name)
+            self.clear_day(ordinal, prompts)
+        for day, answers in ingest.iter_days(stale):
+            name = os.path.basename(day.path)
+            self.record(name, day.date, answers, stats[name])
+        return len(stale) + len(removed)
+
+    def save(self, path:str):
+        history.write_index(path, HABITS_VERSION, {
+            "origin": self.origin,
+            "habits": self.habits,
+            "sources": self.sources,
+        })
+
+    @classmethod
+    def load(cls, journal_dir:str, prompts:dict=None):
+        """
+        The saved store for 'journal_dir' as is, or None if there is none
+        """
+        kinds, names = columnar.catalog_kinds(prompts) if prompts is not None else ({}, {})
+        index = history.read_index(store_path(journal_dir), HABITS_VERSION)
+        if index is None:
+            return None
+        store = cls(kinds=kinds, names=names)
+        store.origin = index["origin"]
+        store.habits = index["habits"]
+        store.sources = index["sources"]
+        return store
+
+    @classmethod
+    def open(cls, journal_dir:str, prompts:dict=None):
+        """
+        Load the store for 'journal_dir', update it with any new, changed or removed days and save it back
+        """
+        store = cls.load(journal_dir, prompts)
+        if store is None:
+            kinds, names = columnar.catalog_kinds(prompts) if prompts is not None else ({}, {})
+            store = cls(kinds=kinds, names=names)
+        if store.update(journal_dir) > 0:
+            store.save(store_path(journal_dir))
+        return store
+
+    """
+    Statistics
+    """
+
+    def span(self, start:datetime.date=None, end:datetime.date=None):
+        """
+        Day range [lo, hi) covering start..end (inclusive), clipped to the history (end defaults to today)
+        """
+        end = end if end is not None else datetime.date.today()
+        lo = 0 if start is None else max(0, self.day(start))
+        return lo, max(lo, self.day(end) + 1)
+
+    def streaks(self, prompt:str, start:datetime.date=None, end:datetime.date=None):
+        """
+        Current streak (as of 'end', default today) and longest streak between start and end of a habit
+        """
+        habit = self.habits[self.resolve(prompt)]
+        lo, hi = self.span(start, end)
+        done = habit.done & mask(lo, hi)
+        last = hi - 1
+        if last >= lo and not (habit.answered >> last) & 1: # Not answered yet: the streak is still alive through the day before
+            last -= 1
+        current = trailing_run(done, last)
+        length, first = longest_run(done)
+        return {
+            "current": Streak(current, self.date(last - current + 1) if current > 0 else None, self.date(last) if current > 0 else None),
+            "longest": Streak(length, self.date(first) if length > 0 else None, self.date(first + length - 1) if length > 0 else None)
+        }
+
+    def rate(self, prompt:str, days:int=None, start:datetime.date=None, end:datetime.date=None):
+        """
+        {'days', 'answered', 'done', 'rate'} over the last 'days' days up to 'end' (or over start..end), a missing day counting as not done
+        """
+        habit = self.habits[self.resolve(prompt)]
+        lo, hi = self.span(start, end)
+        if days is not None:
+            lo = max(lo, hi - days)
+        window = mask(lo, hi)
+        done = (habit.done & window).bit_count()
+        return {
+            "days": hi - lo,
+            "answered": (habit.answered & window).bit_count(),
+            "done": done,
+            "rate": done / (hi - lo) if hi > lo else None
+        }
+
+    def heatmap(self, prompt:str, weeks:int=52, end:datetime.date=None):
+        """
+        Calendar heatmap of the last 'weeks' weeks up to 'end': (first Monday, [7 rows of cells, Monday to Sunday])
+        """
+        habit = self.habits[self.resolve(prompt)]
+        lo, hi = self.span(None, end)
+        last = hi - 1
+        first = last - self.date(last).weekday() - 7 * (weeks - 1) # A Monday
+        n = 7 * weeks
+
+        def cells(bits):
+            bits &= mask(0, last + 1)
+            bits = bits >> first if first >= 0 else bits << -first # Bit i: day first + i
+            return format(bits, "0{0}b".format(n))[::-1] # Oldest day first
+
+        grid = [HEATMAP_CELLS[(a == "1", b == "1")] if i <= last - first else " " for i, (a, b) in enumerate(zip(cells(habit.answered), cells(habit.done)))]
+        return self.date(first), ["".join(grid[weekday::7]) for weekday in range(7)]
+
+
+def store_path(journal_dir:str):
+    return os.path.join(history.index_dir(journal_dir), HABITS_FILE)
+
+
+def record_session(journal_metadata_file:str, date:datetime.date, answers:list, prompts:dict=None):
+    """
+    Fold a session's answers, just written to 'journal_metadata_file', into the saved store of its directory. A directory without a
+    store is left alone: the first 'journal stats habits' builds it.
+    """
+    journal_dir = os.path.dirname(journal_metadata_file)
+    store = HabitStore.load(journal_dir, prompts)
+    if store is None:
+        return None
+    with open(journal_metadata_file, 'rb') as ifile:
+        digest = manifest.digest(ifile.read())
+    store.record(os.path.basename(journal_metadata_file), date, answers, digest)
+    store.save(store_path(journal_dir))
+    return store
@@ -5,29 +5,15 @@ import datetime
 import re
 
 
+from journal.lazy import lazy_import
 
-import inquirer
+inquirer = lazy_import("inquirer")
+jsonschema = lazy_import("jsonschema")
 
-from pygments import highlight
-from pygments.formatters import Terminal256Formatter
+from journal import schemas, banners, tracing, records
 
-from pygments.lexers import TextLexer
-from pygments.lexer import Lexer
-from pygments.style import Style
-
-from pygments.token import Token
-
-
-
-from prompt_toolkit import PromptSession
-from prompt_toolkit.key_binding import KeyBindings
-
-from jsonschema import validate
-from jsonschema.exceptions import ValidationError
-
-
-
-from journal import prompts, schemas
+render = lazy_import("journal.render")
+sources = lazy_import("journal.sources")
 
 """
 constants/globals
@@ -37,208 +23,178 @@ RESET = "\033[0m"
 
 question_mark = f"[{YELLOW}?{RESET}] "
 
-kb = KeyBindings()
+_session = None
 
 
-class JournalPromptStyle(Style):
-    default_style = ""
-    styles = {
-        Token.Text: "bg:#002200 #00ff00",
-    }
+def get_session():
+    """
+    Build the prompt_toolkit multiline session on first use. prompt_toolkit is only imported when a text prompt needs it.
+    """
+    global _session
+    if _session is None:
+        from prompt_toolkit import PromptSession
+        from prompt_toolkit.key_binding import KeyBindings
 
+        kb = KeyBindings()
+
+        # Use Ctrl+n to exit text entry
+        @kb.add('c-n')
+        def _(event):
+            event.app.exit(result=event.app.current_buffer.text)
+
+        _session = PromptSession(multiline=True, key_bindings=kb)
+    return _session
 
-class PlainGreenLexer(Lexer):
-    def get_tokens_unprocessed(self, text):
-        yield 0, Token.Text, text
-    
-# Use Ctrl+n to exit text entry
-@kb.add('c-n')
-def _(event):
-    event.app.exit(result=event.app.current_buffer.text)
 
-session = PromptSession(multiline=True, key_bindings=kb)
+def __getattr__(name):
+    """
+    Lazy module attributes: the pygments classes and the prompt_toolkit session/key bindings are built on first access
+    """
+    if name in ("JournalPromptStyle", "PlainGreenLexer"):
+        return getattr(render, name)
+    elif name == "session":
+        return get_session()
+    elif name == "kb":
+        return get_session().key_bindings
+    raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
 
 
 """
 Helper functions
+
+Each prompt_* function takes an answer 'source' (journal.sources); by default the answers are typed at the terminal.
 """
 
-def prompt_boolean(prompt_data):
+def answer_source(source):
+    return source if source is not None else sources.interactive
 
-    try:
-        validate(prompt_data, schemas.boolean_schema)
-    except ValidationError as e:
-        raise e
 
-        
+def prompt_record(prompt_data, prompt_type:str, validate:bool):
+    """
+    The journal.records record for a prompt data dict (or the record itself). With validate, the prompt is checked against its JSON
+    schema and its journal.prompts pydantic model first.
+    """
+    name = prompt_data.get("name") if type(prompt_data) is dict else getattr(prompt_data, "name", None)
+    with tracing.span(prompt_type, name, "validation"):
+        if validate is True and type(prompt_data) is dict:
+            schemas.validate(prompt_data, prompt_type)
+        prompt = records.record(prompt_data, prompt_type)
+        if validate is True:
+            records.to_pydantic(prompt)
+    return prompt
 
-    prompt = prompts.BooleanPrompt(**prompt_data)
-    prompt_obj = prompts.adapter.validate_python(prompt)
 
+def prompt_boolean(prompt_data, validate:bool=True, source=None):
+    source = answer_source(source)
 
-    desc = "{0}\n{0}\n{1}\n{0}\n{0}".format(" "*len(prompt.description), prompt.description)
-    highlighted = highlight(desc, PlainGreenLexer(), Terminal256Formatter(style=JournalPromptStyle))
-    
-    
-    sys.stderr.write(highlighted)
-
-    answers = inquirer.prompt([
-        inquirer.Confirm(
-            name=prompt.name,
-            message=prompt.prompt,
-            default=False
-        )
-    ])
-    user_input = answers[prompt.name]
+    prompt = prompt_record(prompt_data, "boolean", validate)
+
+
+    if source.interactive:
+        with tracing.span("boolean", prompt.name, "render"):
+            sys.stderr.write(banners.banner(prompt.description))
+
+    with tracing.span("boolean", prompt.name, "user"):
+        user_input = source.boolean(prompt)
     #sys.stderr.write(">'{0}'<\n".format(user_input))
     if type(user_input) is not bool:
-        sys.stderr.write(">'{0}'<\n".format(user_input))
+        if source.interactive:
+            sys.stderr.write(">'{0}'<\n".format(user_input))
         raise ValueError("journal.prompt_boolean expects user input to be a boolean (y/n)")
     return user_input
     #print(prompt_obj.prompt.model_dump_json(indent=2))
 
-def prompt_choice(prompt_data):
-    try:
-        validate(prompt_data, schemas.choice_schema)
-    except ValidationError as e:
-        raise e
+def prompt_choice(prompt_data, validate:bool=True, source=None):
+    source = answer_source(source)
 
-    prompt = prompts.ChoicePrompt(**prompt_data)
+    prompt = prompt_record(prompt_data, "choice", validate)
 
     
-    desc = "{0}\n{0}\n{1}\n{0}\n{0}".format(" "*len(prompt.description), prompt.description)
-    highlighted = highlight(desc, PlainGreenLexer(), Terminal256Formatter(style=JournalPromptStyle))
-    
-    
-    sys.stderr.write(highlighted)
+    if source.interactive:
+        with tracing.span("choice", prompt.name, "render"):
+            sys.stderr.write(banners.banner(prompt.description))
 
 
     
-    answers = inquirer.prompt([
-        inquirer.List(
-            name=prompt.name,
-            message=prompt.prompt,
-            choices=prompt.choices,
-            default=prompt.default
-        )])
     try:
-        user_input = answers[prompt.name]
-        prompt.validate_selection(user_input)
-    except ValidationError as e:
+        with tracing.span("choice", prompt.name, "user"):
+            user_input = source.choice(prompt)
+        with tracing.span("choice", prompt.name, "validation"):
+            prompt.validate_selection(user_input)
+    except jsonschema.ValidationError as e:
         raise e
     return user_input
     
 
-def prompt_multichoice(prompt_data):
+def prompt_multichoice(prompt_data, validate:bool=True, source=None):
+    source = answer_source(source)
 
-    try:
-        validate(prompt_data, schemas.multichoice_schema)
-    except ValidationError as e:
-        raise e
-
-    prompt = prompts.MultiChoicePrompt(**prompt_data)
-
-    desc = "{0}\n{0}\n{1}\n{0}\n{0}".format(" "*len(prompt.description), prompt.description)
-    highlighted = highlight(desc, PlainGreenLexer(), Terminal256Formatter(style=JournalPromptStyle))
-    
-    
-    sys.stderr.write(highlighted)
+    prompt = prompt_record(prompt_data, "multichoice", validate)
 
-    answers = inquirer.prompt([
-        inquirer.Checkbox(
-            name=prompt.name,
-            message=prompt.prompt,
-            choices=prompt.choices,
-            default=prompt.default
-        )
-    ])
+    if source.interactive:
+        with tracing.span("multichoice", prompt.name, "render"):
+            sys.stderr.write(banners.banner(prompt.description))
 
     try:
-        user_input = answers[prompt.name]
-        prompt.validate_selections(user_input)
+        with tracing.span("multichoice", prompt.name, "user"):
+            user_input = source.multichoice(prompt)
+        with tracing.span("multichoice", prompt.name, "validation"):
+            prompt.validate_selections(user_input)
         # print("Selections:")
         # print(user_input)
-    except ValidationError as e:
+    except jsonschema.ValidationError as e:
         raise e
     return user_input
 
 
-def prompt_text(prompt_data):
-
-    try:
-        validate(prompt_data, schemas.text_schema)
-    except ValidationError as e:
-        raise e
+def prompt_text(prompt_data, validate:bool=True, source=None):
+    source = answer_source(source)
 
+    prompt = prompt_record(prompt_data, "text", validate)
 
-    prompt = prompts.TextPrompt(**prompt_data)
-
-    desc = "{0}\n{0}\n{1}\n{0}\n{0}".format(" "*len(prompt.description), prompt.description)
-    highlighted = highlight(desc, PlainGreenLexer(), Terminal256Formatter(style=JournalPromptStyle))
-    
-    
-    sys.stderr.write(highlighted)
+    if source.interactive:
+        with tracing.span("text", prompt.name, "render"):
+            sys.stderr.write(banners.banner(prompt.description))
 
-    user_input = text_input(prompt.prompt)
+    with tracing.span("text", prompt.name, "user"):
+        user_input = source.text(prompt)
     if type(user_input) is not str:
         raise TypeError("journal.prompt_text expects a str from user input.")
     return user_input
 
 
-def prompt_singleline(prompt_data):
-
-    try:
-        validate(prompt_data, schemas.singleline_schema)
-    except ValidationError as e:
-        raise e
+def prompt_singleline(prompt_data, validate:bool=True, source=None):
+    source = answer_source(source)
 
+    prompt = prompt_record(prompt_data, "singleline", validate)
 
-    
-    prompt = prompts.SingleLinePrompt(**prompt_data)
+    if source.interactive:
+        with tracing.span("singleline", prompt.name, "render"):
+            sys.stderr.write(banners.banner(prompt.description))
 
-    desc = "{0}\n{0}\n{1}\n{0}\n{0}".format(" "*len(prompt.description), prompt.description)
-    highlighted = highlight(desc, PlainGreenLexer(), Terminal256Formatter(style=JournalPromptStyle))
-    
-    
-    sys.stderr.write(highlighted)
-
-    sys.stderr.write(question_mark + prompt.prompt + "\n")
-    user_input = input(">")
+    with tracing.span("singleline", prompt.name, "user"):
+        user_input = source.singleline(prompt)
     # print("User input:")
     # print("   >'{0}'<".format(user_input))
-    while user_input == "":
-        sys.stderr.write("journal.py needs a non-trivial single-line input\n")
-        user_input = input()
-        
+    if type(user_input) is not str:
+        raise TypeError("journal.prompt_singleline expects a str from user input.")
     # if user_input == "":
     #     raise ValueError("journal.prompt_singleline expects a non-trivial single-line input")
     return user_input
 
-def prompt_multiline(prompt_data):
-    try:
-        validate(prompt_data, schemas.multiline_schema)
-    except ValidationError as e:
-        raise e
+def prompt_multiline(prompt_data, validate:bool=True, source=None):
+    source = answer_source(source)
 
+    prompt = prompt_record(prompt_data, "multiline", validate)
 
-    
-    prompt = prompts.MultiLinePrompt(**prompt_data)
+    if source.interactive:
+        with tracing.span("multiline", prompt.name, "render"):
+            sys.stderr.write(banners.banner(prompt.description))
 
-    desc = "{0}\n{0}\n{1}\n{0}\n{0}".format(" "*len(prompt.description), prompt.description)
-    highlighted = highlight(desc, PlainGreenLexer(), Terminal256Formatter(style=JournalPromptStyle))
-    
-    
-    sys.stderr.write(highlighted)
-
-    sys.stderr.write(question_mark + prompt.prompt + "\n\n")
-    sys.stderr.write("List your answers below (Empty response terminates):\n")
-    lines = []
-    while True:
-        line = input(">")
-        if line == "":
-            break
-        else:
-            lines.append(line)
+    with tracing.span("multiline", prompt.name, "user"):
+        lines = source.multiline(prompt)
+    if type(lines) is not list or not all(type(line) is str for line in lines):
+        raise TypeError("journal.prompt_multiline expects a list of str from user input.")
     return lines
 
 def get_goal(prompt, goal_prompt_description, desc_prompt_label, priority_label, effort_label):
@@ -246,10 +202,7 @@ def get_goal(prompt, goal_prompt_description, desc_prompt_label, priority_label,
     This function prompts the user, with given labels, for a goal name, description, a priority, and a effort score (in # of days)
     """
 
-    desc = "{0}\n{0}\n{1}\n{0}\n{0}".format(" "*len(goal_prompt_description), goal_prompt_description)
-    highlighted = highlight(desc, PlainGreenLexer(), Terminal256Formatter(style=JournalPromptStyle))
-    
-    sys.stderr.write(highlighted)
+    sys.stderr.write(banners.banner(goal_prompt_description))
     sys.stderr.write(question_mark + prompt + "\n\n")
     goal_short_desc = input(">") # GET goal name
 
@@ -308,78 +261,73 @@ def get_belief(scale_label, reason_label):
         
     return (belief_score, reason)
 
-def prompt_belief(prompt_data):
-
-    try:
-        validate(prompt_data, schemas.belief_schema)
-    except ValidationError as e:
-        raise e
+def check_belief(belief_score, reason):
+    if type(belief_score) not in (int, float) or type(reason) is not str:
+        raise ValueError("\n\njournal.py: Invalid score/rating. Input should be a number on a scale of 0-10\n\n")
+    if (belief_score < 0 or belief_score > 10):
+        raise ValueError("journal.prompt_belief expects a belief score in the range (0 <=> 10)")
 
 
+def prompt_belief(prompt_data, validate:bool=True, source=None):
+    source = answer_source(source)
 
-    prompt = prompts.BeliefPrompt(**prompt_data)
+    prompt = prompt_record(prompt_data, "belief", validate)
 
-    desc = "{0}\n{0}\n{1}\n{0}\n{0}".format(" "*len(prompt.description), prompt.description)
-    highlighted = highlight(desc, PlainGreenLexer(), Terminal256Formatter(style=JournalPromptStyle))
-    
-    
-    sys.stderr.write(highlighted)
-    
-    sys.stderr.write(question_mark + prompt.prompt + "\n\n")
+    if source.interactive:
+        with tracing.span("belief", prompt.name, "render"):
+            sys.stderr.write(banners.banner(prompt.description))
 
     
-    belief_score, reason = get_belief(prompt.scale_label, prompt.reason_label)
+    with tracing.span("belief", prompt.name, "user"):
+        belief_score, reason = source.belief(prompt, prompt.scale_label, prompt.reason_label)
+    if source.interactive is False:
+        check_belief(belief_score, reason)
     # print("HERE IS A BELIEF")
     # print(belief_score, reason)
     return (belief_score, reason)
 
 
-def prompt_belief_list(prompt_data, scale_label:str=None, reason_label:str=None):
+def prompt_belief_list(prompt_data, scale_label:str=None, reason_label:str=None, validate:bool=True, source=None):
+    source = answer_source(source)
+
     if scale_label is not None and reason_label is not None:
         alt_labels = True
     else:
         alt_labels = False
         
-    try:
-        validate(prompt_data, schemas.belief_schema)
-    except ValidationError as e:
-        raise e
-    
-    prompt = prompts.BeliefPrompt(**prompt_data)
+    prompt = prompt_record(prompt_data, "belief", validate)
 
-    sys.stderr.write(question_mark + prompt.prompt + "\n\n")
-
-    
-    beliefs = []
-    while True:
-        try:
-            if alt_labels == True:
-                belief_score, reason = get_belief(scale_label, reason_label)
-            else:
-                belief_score, reason = get_belief(prompt.scale_label, prompt.reason_label)
-            if belief_score is None and reason is None:
-                break
-            else:
-                beliefs.append([belief_score, reason])
-        except ValueError as e:
-            raise e
-            if len(e.args) == 1 and "journal.py" in e.args[0]:
-                break
-            else:
-                sys.stderr.write("Unknown error occurred. Try restating reason for belief")
-                raise e
+    with tracing.span("belief", prompt.name, "user"):
+        if alt_labels == True:
+            beliefs = source.belief_list(prompt, scale_label, reason_label)
+        else:
+            beliefs = source.belief_list(prompt, prompt.scale_label, prompt.reason_label)
+    if source.interactive is False:
+        if type(beliefs) is not list or not all(type(b) is list and len(b) == 2 for b in beliefs):
+            raise TypeError("journal.prompt_belief_list expects a list of [score, reason] pairs.")
+        for belief_score, reason in beliefs:
+            check_belief(belief_score, reason)
 
     return beliefs
     
 
 def text_input(prompt):
     sys.stderr.write(question_mark + prompt + "\n")
-    text = session.prompt("Enter text (Ctrl+n to submit):\n")
+    text = get_session().prompt("Enter text (Ctrl+n to submit):\n")
     #print("Your text: \n{0}".format(text))
     return text
 
 
-def create_goal_list(goals):
+def create_goal_list(goals, store=None, focus:list=None, source=None):
+    """
+    Re-select existing goals and prompt for new ones. Returns the new goals followed by the re-selected ones.
+
+    'focus' lists the names of the goals to pre-select (e.g. the journal.scheduler daily focus set).
+
+    With a journal.goals.GoalStore, the goals are assumed to come from the store (already validated): re-selections, retirements and
+    each new goal are written to the store as they happen.
+    """
+    source = answer_source(source)
     no_goals = False
 
     if type(goals) is not list:
@@ -409,11 +357,13 @@ def create_goal_list(goals):
         "desc_prompt_label": "Describe the goal. Be verbose for me.",
     }
     try:
-        if no_goals is False:
-            validate(goals, schemas.goal_schema)
+        with tracing.span("goals", "validate", "validation"):
+            if no_goals is False and store is None:
+                schemas.validate(goals, "goal")
+            schemas.validate(new_goals_prompt_data, "goal_prompt")
+        if no_goals is False and store is None and source.interactive:
             sys.stderr.write("\n\nExisting goals read and validated successfully...\n\n")
-        validate(new_goals_prompt_data, schemas.goal_prompt_schema)
-    except ValidationError as e:
+    except jsonschema.ValidationError as e:
         raise e
 
 
@@ -425,70 +375,61 @@ def create_goal_list(goals):
 
     if no_goals is False:
         existing_goals_prompt_data["choices"] = list(map(lambda g: g["name"], goals))
-        prompt = prompts.GoalPrompt(**existing_goals_prompt_data)
+        if focus is not None:
+            existing_goals_prompt_data["default"] = focus
+        prompt = records.record(existing_goals_prompt_data, "goal")
 
     
-        desc = "{0}\n{0}\n{1}\n{0}\n{0}".format(" "*len(prompt.description), prompt.description)
-        highlighted = highlight(desc, PlainGreenLexer(), Terminal256Formatter(style=JournalPromptStyle))
-        sys.stderr.write(highlighted)
+        if source.interactive:
+            with tracing.span("goals", "existing_goals", "render"):
+                sys.stderr.write(banners.banner(prompt.description))
 
     
-        answers = inquirer.prompt([
-            inquirer.Checkbox(
-                name=prompt.name,
-                message=prompt.prompt,
-                choices=prompt.choices,
-                default=prompt.default
-            )
-        ])
         try:
-            existing_goal_names = answers[prompt.name]
-            prompt.validate_selections(existing_goal_names)
+            with tracing.span("goals", "existing_goals", "user"):
+                existing_goal_names = source.goal_selection(prompt)
+            with tracing.span("goals", "existing_goals", "validation"):
+                prompt.validate_selections(existing_goal_names)
             # print("Selections:")
             # print(user_input)
-        except ValidationError as e:
+        except jsonschema.ValidationError as e:
             raise e
-        sys.stderr.write("\n\nRe-selected goals: {0}\n\n".format(existing_goal_names))
+        if source.interactive:
+            sys.stderr.write("\n\nRe-selected goals: {0}\n\n".format(existing_goal_names))
 
+        existing_goal_names = set(existing_goal_names)
         existing_goals_list = [g for g in goals if g["name"] in existing_goal_names]
-        sys.stderr.write("\n\nFinished assessing existing goals...\n\n\n")
+        if store is not None:
+            with tracing.span("goals", "existing_goals", "io"):
+                store.select([g["id"] for g in existing_goals_list])
+                store.retire([g["id"] for g in goals if g["name"] not in existing_goal_names])
+        if source.interactive:
+            sys.stderr.write("\n\nFinished assessing existing goals...\n\n\n")
 
     """
     New goals
     """
     #print(new_goals_prompt_data)
-    prompt = prompts.GoalPrompt(**new_goals_prompt_data)
-
-    name = new_goals_prompt_data["name"]
-    description = new_goals_prompt_data["description"]
-    prompt = new_goals_prompt_data["prompt"]
-    priority_label = new_goals_prompt_data["priority_label"]
-    effort_label = new_goals_prompt_data["effort_label"]
-    desc_prompt_label = new_goals_prompt_data["desc_prompt_label"]
+    prompt = records.record(new_goals_prompt_data, "goal")
 
     """
     Hoisted code to get additional goal descriptions, priorities, efforts.
     """
-    while True:
-        try:
-            name, goal_desc, priority, effort = get_goal(prompt, description, desc_prompt_label, priority_label, effort_label)
-            if goal_desc is None and priority is None and effort is None:
-                break
-            else:
-                new_goals_list.append({
-                    "prompt_type": "goal",
-                    "name": name,
-                    "description": goal_desc,
-                    "priority": priority,
-                    "effort": effort,
-                    "date": today
-                })
-        except ValueError as e:
-            raise e
-            if len(e.args) == 1 and "journal.py" in e.args[0]:
-                break
-            else:
-                sys.stderr.write("Unknown error occurred.")
-                raise e
+    for name, goal_desc, priority, effort in tracing.timed(source.new_goals(prompt), "goals", "new_goal", "user"):
+        goal = {
+            "prompt_type": "goal",
+            "name": name,
+            "description": goal_desc,
+            "priority": priority,
+            "effort": effort,
+            "date": today
+        }
+        if store is not None:
+            with tracing.span("goals", "new_goal", "io"):
+                goal["id"] = store.insert(goal)
+        elif source.interactive is False:
+            with tracing.span("goals", "new_goal", "validation"):
+                schemas.validate([goal], "goal")
+        new_goals_list.append(goal)
     final_goals_list = new_goals_list + existing_goals_list
     return final_goals_list
@@ -0,0 +1,165 @@
+import os
+import sys
+
+import re
+import datetime
+import pickle
+from collections import namedtuple
+
+from journal.lazy import lazy_import
+
+yaml = lazy_import("yaml")
+archive = lazy_import("journal.archive")
+dictionary = lazy_import("journal.dictionary")
+
+"""
+Access to the daily journal_metadata_YYYY_MM_DD.yaml files in JOURNAL_DIR, and storage for the indexes derived from them
+
+Days rolled into segments by 'journal archive' (journal.archive) are listed and loaded with the live files. An archived Day keeps the
+path of its original file (used as its key by the indexes) and names its segment in Day.segment.
+
+A day file is either a list of [prompt, answer] pairs (format 1) or, in a directory migrated with 'journal migrate', a mapping that
+references the prompts by id (format 2, journal.dictionary). load_day() reads both as [prompt, answer] pairs with the current prompt texts.
+"""
+
+DAY_FILE_RE = re.compile(r"^journal_metadata_(\d{4})_(\d{2})_(\d{2})\.yaml$")
+
+INDEX_DIRNAME = ".journal"
+
+Day = namedtuple("Day", ["date", "path", "segment"], defaults=[None])
+
+
+def day_filename(date:datetime.date):
+    return "journal_metadata_{0}.yaml".format(str(date).replace("-", "_"))
+
+
+def parse_date(s:str):
+    """
+    Parse a YYYY-MM-DD (or YYYY_MM_DD) command line date
+    """
+    return datetime.date.fromisoformat(s.replace("_", "-"))
+
+
+def list_days(journal_dir:str, start:datetime.date=None, end:datetime.date=None, archived:bool=True):
+    """
+    The daily journal_metadata files in 'journal_dir', sorted by date. start/end (inclusive) are applied to the filenames, so files outside the range are never opened.
+    With 'archived', the days in the archive segments are included (only the segment indexes are read); a live file wins over an archived copy.
+    """
+    days = []
+    try:
+        entries = os.scandir(journal_dir)
+    except FileNotFoundError:
+        return days
+    with entries:
+        for entry in entries:
+            m = DAY_FILE_RE.match(entry.name)
+            if m is None:
+                continue
+            date = datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+            if (start is not None and date < start) or (end is not None and date > end):
+                continue
+            days.append(Day(date, entry.path))
+    if archived:
+        seen = set(d.date for d in days)
+        for d in archive.archived_days(journal_dir, start, end):
+            if d.date not in seen: # A day can only be in one segment unless both a month and its year were archived
+                seen.add(d.date)
+                days.append(d)
+    days.sort()
+    return days
+
+
+def yaml_loader():
+    """
+    The libyaml-accelerated safe loader when PyYAML was built with it, otherwise the pure Python one
+    """
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def yaml_dumper():
+    """
+    The libyaml emitter when available. It writes the same bytes as yaml.Dumper for the journal's lists of [prompt, answer] pairs.
+    """
+    return getattr(yaml, "CDumper", yaml.Dumper)
+
+
+def load_day(day:Day):
+    """
+    The [prompt, answer] pairs of one day. An empty file is an empty day.
+    """
+    if day.segment is not None:
+        answers = yaml.load(day_bytes(day), Loader=yaml_loader())
+    else:
+        with open(day.path, 'r') as ifile:
+            answers = yaml.load(ifile, Loader=yaml_loader())
+    if answers is None:
+        answers = []
+    if type(answers) is dict:
+        return dictionary.decode_day(answers, os.path.dirname(day.path), day.path)
+    elif type(answers) is not list:
+        raise ValueError("journal.history.load_day: '{0}' is not a list of [prompt, answer] pairs".format(day.path))
+    return dictionary.canonical_answers(answers, os.path.dirname(day.path))
+
+
+def day_bytes(day:Day):
+    """
+    The contents of a day file, live or archived
+    """
+    if day.segment is not None:
+        return archive.read_day(day.segment, day.date)
+    with open(day.path, 'rb') as ifile:
+        return ifile.read()
+
+
+def index_dir(journal_dir:str):
+    """
+    Directory for the indexes derived from the journal history
+    """
+    return os.path.join(journal_dir, INDEX_DIRNAME)
+
+
+def read_index(path:str, version:int):
+    """
+    Load a pickled index written by write_index. Returns None if it is missing, unreadable or from another version.
+    """
+    try:
+        with open(path, 'rb') as ifile:
+            index = pickle.load(ifile)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError): # Last two: a class changed shape
+        return None
+    if type(index) is not dict or index.get("version") != version:
+        return None
+    return index
+
+
+def write_index(path:str, version:int, index:dict):
+    """
+    Atomically pickle 'index'. Failure to write an index is reported but not fatal.
+    """
+    tmp = "{0}.{1}.tmp".format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'wb') as ofile:
+            pickle.dump(dict(index, version=version), ofile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError as e:
+        sys.stderr.write("journal.history: could not write index '{0}' ({1})\n".format(path, e))
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def file_stat(path:str):
+    """
+    (size, mtime_ns) used to detect changed day files
+    """
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def day_stat(day:Day):
+    """
+    file_stat of a Day. An archived day gives the size and mtime its file had, so archiving it does not invalidate the indexes.
+    """
+    if day.segment is not None:
+        return archive.day_stat(day)
+    return file_stat(day.path)
@@ -0,0 +1,89 @@
+import os
+import sys
+
+import datetime
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from journal import history
+
+"""
+Bulk ingestion of the journal history
+
+Day files are parsed on a process pool (with the libyaml loader when available) and streamed back in date order as
+normalized (date, prompt, type, value) records. Only a bounded window of files is in flight, so memory stays flat no matter how many days exist.
+"""
+
+CHUNKSIZE = 32 # Day files parsed per task
+SERIAL_THRESHOLD = 64 # Fewer files than this are parsed in-process; the pool would cost more than it saves
+
+Record = namedtuple("Record", ["date", "prompt", "type", "value"])
+
+
+def catalog_types(prompts:dict):
+    """
+    {prompt text: prompt_type} for a prompts.toml catalog
+    """
+    return {p["prompt"]: p["prompt_type"] for table in prompts.values() for p in table.values()}
+
+
+def infer_type(value):
+    """
+    prompt_type for an answer whose prompt is not in the catalog
+    """
+    if type(value) is bool:
+        return "boolean"
+    elif type(value) is list:
+        if len(value) > 0 and all(type(v) is list and len(v) == 2 and type(v[0]) in (int, float) for v in value):
+            return "belief"
+        return "multiline"
+    return "text"
+
+
+def parse_days(days:list, only:set=None):
+    """
+    Worker: [(day, answers)] for a chunk of day files, keeping only the answers to the prompts in 'only' if given
+    """
+    if only is None:
+        return [(day, history.load_day(day)) for day in days]
+    return [(day, [a for a in history.load_day(day) if a[0] in only]) for day in days]
+
+
+def chunks(days:list, size:int):
+    for i in range(0, len(days), size):
+        yield days[i:i + size]
+
+
+def iter_days(days:list, processes:int=None, chunksize:int=CHUNKSIZE, only:set=None):
+    """
+    Yield (day, answers) for each Day, in order. Parsing fans out over 'processes' workers (default: os.cpu_count()).
+    With 'only' (a set of prompt texts) the other answers are dropped by the workers, before they are sent back.
+    """
+    processes = processes if processes is not None else (os.cpu_count() or 1)
+    if processes <= 1 or len(days) < SERIAL_THRESHOLD:
+        for day in days:
+            yield parse_days([day], only)[0]
+        return
+    window = processes * 2 # Chunks in flight
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = []
+        for chunk in chunks(days, chunksize):
+            pending.append(pool.submit(parse_days, chunk, only))
+            if len(pending) >= window:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def iter_records(journal_dir:str, start:datetime.date=None, end:datetime.date=None, prompts:dict=None, processes:int=None, only:set=None):
+    """
+    Stream every answer in the history as a Record(date, prompt, type, value).
+
+    start/end (inclusive) are applied to the filenames. With a prompts.toml catalog, 'type' is the catalog prompt_type; otherwise it is inferred from the answer.
+    'only' restricts the records to a set of prompt texts.
+    """
+    types = catalog_types(prompts) if prompts is not None else {}
+    days = history.list_days(journal_dir, start=start, end=end)
+    for day, answers in iter_days(days, processes=processes, only=only):
+        for prompt, value in answers:
+            yield Record(day.date, prompt, types.get(prompt) or infer_type(value), value)
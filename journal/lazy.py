@@ -0,0 +1,51 @@
+import sys
+import importlib.util
+
+"""
+Deferred imports for the heavy third party dependencies (inquirer, prompt_toolkit, pygments, rich, jsonschema, pydantic, yaml)
+
+A module returned by lazy_import is registered in sys.modules immediately, but its body only executes on the first attribute access.
+"""
+
+
+def lazy_import(name:str):
+    """
+    Return the module 'name' without executing it. The real import happens the first time an attribute is read.
+
+    Parent packages of a dotted name are imported eagerly (that is how importlib locates the submodule), so prefer top-level names for expensive packages.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError("journal.lazy.lazy_import: could not find module '{0}'".format(name), name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def is_loaded(name:str):
+    """
+    True if 'name' has been imported for real (i.e. not just registered as a lazy module)
+    """
+    module = sys.modules.get(name)
+    if module is None:
+        return False
+    return not isinstance(module, importlib.util._LazyModule)
+
+
+def warm(name:str):
+    """
+    Execute the module 'name' now if it is not loaded yet (lazily registered or not imported at all), e.g. on a background thread
+    """
+    module = sys.modules.get(name)
+    if module is None:
+        module = importlib.import_module(name)
+    getattr(module, "__file__", None) # Any attribute access runs a lazy module's body
+    return module
@@ -0,0 +1,325 @@
+import os
+
+import json
+import hashlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from journal import history, ingest
+from journal.lazy import lazy_import
+
+yaml = lazy_import("yaml")
+schemas = lazy_import("journal.schemas")
+archive = lazy_import("journal.archive")
+dictionary = lazy_import("journal.dictionary")
+
+"""
+Checksummed manifest of the journal history (journal fsck)
+
+JOURNAL_DIR/.journal/manifest.pickle records, for each day file (live or archived), goals.json, the prompt dictionary and each archive
+segment:
+
+  name : Entry(path, size, mtime_ns, digest, checked)
+
+'digest' is a BLAKE2b hash of the contents. A file is only read again when its size or mtime changed, and a file whose contents are
+the same after all (touched, copied, restored from a backup) keeps its entry. The derived indexes key their days on the digests
+(digests()), so they only re-read the days whose contents changed.
+
+'checked' is the fingerprint of the catalog the file was last checked against by fsck() (None until it passes), so 'journal fsck'
+only parses the files that changed or were never checked. The checks run on a process pool:
+
+  - the file reads (an archived day's checksum is verified by journal.archive; the days of a segment that changed are all read
+    again) and is not empty or cut short (no final newline)
+  - it parses as YAML and matches the journal_metadata schema ([prompt, answer] pairs)
+  - each answer to a catalog prompt matches the answer schema of its prompt_type (journal.schemas)
+  - a dictionary-encoded day matches the journal_metadata_ids schema and its prompt ids are in the prompt dictionary
+  - goals.json matches the goal schema, and journal_prompts.yaml the prompt_dictionary schema
+  - with full=True, every file is read again and a file whose contents changed without a change of size or mtime is reported
+"""
+
+MANIFEST_VERSION = 1
+MANIFEST_FILE = "manifest.pickle"
+DIGEST_SIZE = 16
+
+Entry = namedtuple("Entry", ["path", "size", "mtime_ns", "digest", "checked"])
+Problem = namedtuple("Problem", ["name", "path", "problem"])
+
+
+def digest(data:bytes):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def catalog_fingerprint(prompts:dict):
+    return digest(json.dumps(prompts, sort_keys=True).encode("utf-8"))
+
+
+class Manifest:
+    def __init__(self):
+        self.entries = {} # day filename: Entry
+        self.files = {} # name: Entry of the other files (goals.json, the archive segments)
+
+    def stale(self, name:str, stat:tuple, table:dict=None):
+        """
+        True if 'name' is not in the manifest or its (size, mtime_ns) changed
+        """
+        entry = (table if table is not None else self.entries).get(name)
+        return entry is None or (entry.size, entry.mtime_ns) != stat
+
+    def record(self, name:str, path:str, stat:tuple, digest:str, table:dict=None):
+        """
+        Record the current state of a file. Returns "added", "changed", "touched" (same contents, new size/mtime) or None (unchanged).
+        A file whose contents did not change stays checked.
+        """
+        table = table if table is not None else self.entries
+        entry = table.get(name)
+        checked = None
+        if entry is None:
+            status = "added"
+        elif entry.digest != digest:
+            status = "changed"
+        else:
+            status = "touched" if (entry.size, entry.mtime_ns) != stat else None
+            checked = entry.checked
+        table[name] = Entry(path, stat[0], stat[1], digest, checked)
+        return status
+
+    def mark(self, name:str, checked:str, table:dict=None):
+        """
+        Set the catalog fingerprint 'name' passed fsck with (None: it did not)
+        """
+        table = table if table is not None else self.entries
+        table[name] = table[name]._replace(checked=checked)
+
+    def update(self, days:list):
+        """
+        Bring the day entries up to date with 'days' (the whole history, history.Day), hashing only the files whose size or mtime
+        changed. Returns {filename: status} for the days added, changed, touched or removed.
+        """
+        changes = {}
+        for day in days:
+            name = os.path.basename(day.path)
+            stat = history.day_stat(day)
+            if self.stale(name, stat):
+                changes[name] = self.record(name, day.path, stat, digest(history.day_bytes(day)))
+        current = set(os.path.basename(day.path) for day in days)
+        for name in [name for name in self.entries if name not in current]:
+            del self.entries[name]
+            changes[name] = "removed"
+        return {name: status for name, status in changes.items() if status is not None}
+
+    def save(self, path:str):
+        history.write_index(path, MANIFEST_VERSION, {"entries": self.entries, "files": self.files})
+
+    @classmethod
+    def load(cls, journal_dir:str):
+        manifest = cls()
+        index = history.read_index(manifest_path(journal_dir), MANIFEST_VERSION)
+        if index is not None:
+            manifest.entries = index["entries"]
+            manifest.files = index["files"]
+        return manifest
+
+    @classmethod
+    def open(cls, journal_dir:str, days:list=None):
+        """
+        Load the manifest for 'journal_dir', update it with the day files (all of them by default) and save it back if anything changed
+        """
+        manifest = cls.load(journal_dir)
+        if len(manifest.update(days if days is not None else history.list_days(journal_dir))) > 0:
+            manifest.save(manifest_path(journal_dir))
+        return manifest
+
+
+def manifest_path(journal_dir:str):
+    return os.path.join(history.index_dir(journal_dir), MANIFEST_FILE)
+
+
+def digests(journal_dir:str):
+    """
+    (days, {day filename: digest}) for the whole history, for the derived indexes to compare with the digests they were built from
+    """
+    days = history.list_days(journal_dir)
+    manifest = Manifest.open(journal_dir, days)
+    return days, {name: entry.digest for name, entry in manifest.entries.items()}
+
+
+"""
+fsck
+"""
+
+def check_answers(answers, kinds:dict):
+    """
+    Problems with the [prompt, answer] pairs of one day: the journal_metadata schema, then the answer schema of each catalog prompt
+    """
+    error = schemas.best_error(answers, "journal_metadata")
+    if error is not None:
+        return ["not a list of [prompt, answer] pairs: {0} (at {1})".format(error.message, "/".join(str(p) for p in error.absolute_path))]
+    by_type = {}
+    for prompt, answer in answers:
+        kind = kinds.get(prompt)
+        if kind is not None:
+            by_type.setdefault(kind, []).append((prompt, answer))
+    problems = []
+    for kind, pairs in sorted(by_type.items()):
+        error = schemas.best_error([answer for prompt, answer in pairs], "{0}_answers".format(kind))
+        if error is not None:
+            problems.append("{0} answer to '{1}': {2}".format(kind, pairs[error.absolute_path[0]][0] if len(error.absolute_path) > 0 else "?", error.message))
+    return problems
+
+
+def check_day(day:history.Day, kinds:dict):
+    """
+    (digest, [problems]) for one day file. The digest is None if the file could not be read.
+    """
+    try:
+        data = history.day_bytes(day)
+    except (OSError, KeyError, ValueError) as e:
+        return None, ["unreadable: {0}".format(e if isinstance(e, OSError) else e.args[0])]
+    if len(data) == 0:
+        return digest(data), ["empty file"]
+    problems = []
+    if not data.endswith(b"\n"):
+        problems.append("truncated: no final newline")
+    try:
+        answers = yaml.load(data, Loader=history.yaml_loader())
+    except yaml.YAMLError as e:
+        return digest(data), problems + ["corrupt YAML: {0}".format(str(e).replace("\n", " "))]
+    if type(answers) is dict: # Dictionary-encoded
+        error = schemas.best_error(answers, "journal_metadata_ids")
+        if error is not None:
+            return digest(data), problems + ["not a list of [prompt id, answer] pairs: {0} (at {1})".format(error.message, "/".join(str(p) for p in error.absolute_path))]
+        try:
+            answers = dictionary.decode_day(answers, os.path.dirname(day.path), day.path)
+        except ValueError as e:
+            return digest(data), problems + [e.args[0]]
+    return digest(data), problems + check_answers(answers if answers is not None else [], kinds)
+
+
+def check_days(days:list, kinds:dict):
+    """
+    Worker: [(day, digest, problems)] for a chunk of days
+    """
+    return [(day,) + check_day(day, kinds) for day in days]
+
+
+def iter_checks(days:list, kinds:dict, processes:int=None, chunksize:int=ingest.CHUNKSIZE):
+    """
+    Yield (day, digest, problems) for each Day, in order, checking them on 'processes' workers (as journal.ingest.iter_days)
+    """
+    processes = processes if processes is not None else (os.cpu_count() or 1)
+    if processes <= 1 or len(days) < ingest.SERIAL_THRESHOLD:
+        for day in days:
+            yield check_days([day], kinds)[0]
+        return
+    window = processes * 2 # Chunks in flight
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = []
+        for chunk in ingest.chunks(days, chunksize):
+            pending.append(pool.submit(check_days, chunk, kinds))
+            if len(pending) >= window:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def check_dictionary(path:str):
+    """
+    (digest, [problems]) for a prompt dictionary (journal_prompts.yaml)
+    """
+    with open(path, 'rb') as ifile:
+        data = ifile.read()
+    try:
+        contents = yaml.load(data, Loader=history.yaml_loader())
+    except yaml.YAMLError as e:
+        return digest(data), ["corrupt YAML: {0}".format(str(e).replace("\n", " "))]
+    error = schemas.best_error(contents, "prompt_dictionary")
+    if error is not None:
+        return digest(data), ["not a prompt dictionary: {0} (at {1})".format(error.message, "/".join(str(p) for p in error.absolute_path))]
+    try:
+        dictionary.PromptDictionary.from_data(contents, path)
+    except ValueError as e:
+        return digest(data), [e.args[0]]
+    return digest(data), []
+
+
+def check_goals(path:str):
+    """
+    (digest, [problems]) for a goals.json file
+    """
+    with open(path, 'rb') as ifile:
+        data = ifile.read()
+    try:
+        goals = json.loads(data)
+    except ValueError as e:
+        return digest(data), ["corrupt JSON: {0}".format(e)]
+    error = schemas.best_error(goals, "goal")
+    return digest(data), [] if error is None else ["not a list of goals: {0}".format(error.message)]
+
+
+def fsck(journal_dir:str, prompts:dict, goals_json:str=None, start=None, end=None, full:bool=False, processes:int=None):
+    """
+    Check the day files dated start..end (and goals.json) that changed since they last passed, or all of them with full=True.
+    The days of an archive segment that changed since the last check are checked again.
+    Returns ([Problem], number of files checked, number of files). The manifest is updated with what was read.
+    """
+    manifest = Manifest.load(journal_dir)
+    fingerprint = catalog_fingerprint(prompts)
+    kinds = ingest.catalog_types(prompts)
+    days = history.list_days(journal_dir)
+    current = set(os.path.basename(d.path) for d in days)
+    for name in [name for name in manifest.entries if name not in current]:
+        del manifest.entries[name]
+    segments = {}
+    for path in archive.list_segments(journal_dir):
+        name = os.path.join(archive.ARCHIVE_DIRNAME, os.path.basename(path))
+        segments[path] = (name, history.file_stat(path))
+    changed_segments = set(path for path, (name, stat) in segments.items() if full or manifest.stale(name, stat, manifest.files))
+    stats = {}
+    todo = []
+    for day in days:
+        if (start is not None and day.date < start) or (end is not None and day.date > end):
+            continue
+        name = os.path.basename(day.path)
+        try:
+            stats[name] = history.day_stat(day)
+        except (OSError, KeyError, ValueError):
+            stats[name] = None
+        entry = manifest.entries.get(name)
+        if full or stats[name] is None or manifest.stale(name, stats[name]) or entry.checked != fingerprint or day.segment in changed_segments:
+            todo.append(day)
+    problems = []
+    bad_segments = set()
+    for day, day_digest, day_problems in iter_checks(todo, kinds, processes):
+        name = os.path.basename(day.path)
+        entry = manifest.entries.get(name)
+        if day_digest is not None and entry is not None and stats[name] == (entry.size, entry.mtime_ns) and day_digest != entry.digest:
+            day_problems.append("contents changed without a change of size or mtime (disk corruption?)")
+        problems.extend(Problem(name, day.path if day.segment is None else "{0}[{1}]".format(day.segment, day.date), problem) for problem in day_problems)
+        if len(day_problems) > 0 and day.segment is not None:
+            bad_segments.add(day.segment)
+        if day_digest is not None and stats[name] is not None:
+            manifest.record(name, day.path, stats[name], day_digest)
+            manifest.mark(name, fingerprint if len(day_problems) == 0 else None)
+    if start is None and end is None: # A segment is checked once all of its days passed (its days have their own checksums, no digest)
+        for path in changed_segments - bad_segments:
+            name, stat = segments[path]
+            manifest.files[name] = Entry(path, stat[0], stat[1], None, fingerprint)
+    names = set(name for name, stat in segments.values())
+    for name in [name for name in manifest.files if name.startswith(archive.ARCHIVE_DIRNAME + os.sep) and name not in names]:
+        del manifest.files[name]
+    checked = len(todo)
+    total = len(stats)
+    for name, path, check in (("goals.json", goals_json, check_goals), (dictionary.DICTIONARY_FILE, dictionary.dictionary_path(journal_dir), check_dictionary)):
+        if path is None or not os.path.exists(path):
+            continue
+        stat = history.file_stat(path)
+        entry = manifest.files.get(name)
+        total += 1
+        if full or manifest.stale(name, stat, manifest.files) or entry.checked != fingerprint:
+            file_digest, file_problems = check(path)
+            problems.extend(Problem(name, path, problem) for problem in file_problems)
+            manifest.record(name, path, stat, file_digest, manifest.files)
+            manifest.mark(name, fingerprint if len(file_problems) == 0 else None, manifest.files)
+            checked += 1
+    manifest.save(manifest_path(journal_dir))
+    return problems, checked, total
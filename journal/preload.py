@@ -0,0 +1,86 @@
+import datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from journal import lazy, catalog, goals, scheduler, sampler, banners, tracing
+
+"""
+Background preloading for the morning session
+
+The session opens with the affirmations and the greetings, which only wait on the user. start() runs the session's setup on a worker
+thread meanwhile, so neither the affirmations nor the first prompt wait for it:
+
+  catalog : prompts.toml and quotes.toml (validated, from the journal.catalog cache) and the quote of the day
+  goals   : the goal store and its ranking (journal.scheduler)
+  sampler : the multiline sampler index, brought up to date with the history and saved (make_prompts then reopens it as is)
+  banners : the rendered banner cache
+  related : the TF-IDF matrix of the past free-text answers (journal.related, if numpy is installed), weighted for the session
+  imports : inquirer, prompt_toolkit and yaml, which the prompts and the answer log would otherwise import on first use
+
+result() waits for whatever is still running (usually nothing by the end of the greetings) and re-raises a failure of the worker, so
+an error surfaces where it did without preloading. Until then the worker only touches modules the main thread does not use: the
+affirmations need rich alone.
+"""
+
+WARM_MODULES = ("inquirer", "prompt_toolkit.shortcuts", "yaml")
+
+Session = namedtuple("Session", ["prompts", "quotes", "quote_of_the_day", "goal_store", "active_goals", "focus_goals"])
+
+_pool = None
+_future = None
+
+
+def load(prompts_toml:str, quotes_toml:str, goals_db:str, goals_json:str, journal_dir:str, date:datetime.date=None, kind:str="io"):
+    """
+    Everything the session needs before its first prompt, as a Session. 'kind' is the tracing kind of the steps.
+    """
+    date = date if date is not None else datetime.date.today()
+    with tracing.span("preload", "catalog", kind):
+        prompts, quots = catalog.load_catalog(prompts_toml, quotes_toml)
+        quote_of_the_day = quots.quote_of_the_day(date)
+    with tracing.span("preload", "goals", kind):
+        goal_store = goals.open_store(goals_db, goals_json)
+        goal_schedule = scheduler.GoalScheduler.from_store(goal_store)
+        active_goals = [g for score, g in goal_schedule.ranked()] # Ranked by priority, effort, age and re-selections
+        focus_goals = [g["name"] for score, g in goal_schedule.focus(scheduler.FOCUS_SIZE)]
+    with tracing.span("preload", "sampler", kind):
+        if "multiline" in prompts:
+            sampler.PromptSampler.open(journal_dir, prompts["multiline"], date)
+    with tracing.span("preload", "banners", kind):
+        banners.disk_cache()
+    with tracing.span("preload", "related", kind):
+        try:
+            from journal import related
+        except ImportError:
+            pass
+        else:
+            related.session_index(journal_dir)
+    with tracing.span("preload", "imports", kind):
+        for name in WARM_MODULES:
+            lazy.warm(name)
+    return Session(prompts, quots, quote_of_the_day, goal_store, active_goals, focus_goals)
+
+
+def start(*args, **kwargs):
+    """
+    Run load(*args, **kwargs) on a worker thread
+    """
+    global _pool, _future
+    if _future is not None:
+        return _future
+    _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-preload")
+    _future = _pool.submit(load, *args, kind="background", **kwargs)
+    _pool.shutdown(wait=False)
+    return _future
+
+
+def result(*args, **kwargs):
+    """
+    The Session from start(), waiting for it if needed. Without start(), load(*args, **kwargs) runs here.
+    """
+    global _pool, _future
+    if _future is None:
+        return load(*args, **kwargs)
+    future, _future, _pool = _future, None, None
+    with tracing.span("preload", "wait", "io"):
+        return future.result()
@@ -17,12 +17,13 @@ class PromptBase(BaseModel):
 
 class GoalPrompt(PromptBase):
     prompt_type: Literal["goal"]
-    default: Optional[bool] = None
+    default: Optional[List[str]] = None
     choices: Optional[List[str]] = None
 
     def validate_selections(self, selections: str):
+        choices = set(self.choices)
         for s in selections:
-            if s not in self.choices:
+            if s not in choices:
                 raise ValueError("journal.MultiChoicePrompt.validate_selection: Invalid selection '{0}'. Must be one of {1}".format(s, self.choices))
 
     desc_prompt_label: Optional[str] = "1. Describe the goal in detail"
@@ -49,8 +50,9 @@ class MultiChoicePrompt(PromptBase):
     default: Optional[List[str]] = None
 
     def validate_selections(self, selections: str):
+        choices = set(self.choices)
         for s in selections:
-            if s not in self.choices:
+            if s not in choices:
                 raise ValueError("journal.MultiChoicePrompt.validate_selection: Invalid selection '{0}'. Must be one of {1}".format(s, self.choices))
 
 class TextPrompt(PromptBase):
@@ -0,0 +1,200 @@
+import os
+import sys
+
+import json
+import math
+import mmap
+import random
+import struct
+import datetime
+
+from journal import catalog
+
+"""
+Indexed quote store
+
+The quotes are compiled once (whenever quotes.toml changes) into two files in the catalog cache directory:
+
+  quotes_<key>.dat : one JSON [author, quote] record per line
+  quotes_<key>.idx : little-endian uint64 offsets of the records, plus the end offset
+
+Both are memory-mapped, so fetching quote i is two reads and one small JSON decode, whatever the size of the corpus.
+
+Rotation without repeats uses an affine permutation of the quote numbers, i -> (a * i + b) mod n with gcd(a, n) = 1. Draw k maps to
+cycle k // n and position k % n, and (a, b) is derived from (seed, n, cycle). So only the draw counter has to be stored, and every
+quote comes up once per cycle. The cycles are independent, so the last quote of one cycle can also be the first of the next. The quote
+of the day is draw number date.toordinal(): deterministic, and each quote comes up once per aligned block of n days (the ordinals
+c * n .. c * n + n - 1), not once in any n consecutive days.
+"""
+
+QUOTE_SEED = 0
+OFFSET = struct.Struct("<Q")
+
+
+def affine(n:int, seed:int, cycle:int):
+    """
+    (a, b) with gcd(a, n) == 1 for one cycle of the permutation
+    """
+    if n == 1:
+        return 1, 0
+    rng = random.Random("{0}:{1}:{2}".format(seed, n, cycle))
+    while True:
+        a = rng.randrange(1, n)
+        if math.gcd(a, n) == 1:
+            return a, rng.randrange(n)
+
+
+def permuted(n:int, k:int, seed:int=QUOTE_SEED):
+    """
+    Quote number for draw k. Draws k*n .. (k+1)*n - 1 visit every quote exactly once.
+    """
+    cycle, position = divmod(k, n)
+    a, b = affine(n, seed, cycle)
+    return (a * position + b) % n
+
+
+class Quotes:
+    """
+    The quote of the day and the no-repeat rotation, over a sequence of n (author, quote) tuples
+    """
+    n = 0
+    draws = 0 # Rotation counter of a store without a state file
+
+    def quote_of_the_day(self, date:datetime.date=None, seed:int=QUOTE_SEED):
+        """
+        Draw date.toordinal() of the rotation: each quote once per aligned block of n days (see module docstring)
+        """
+        date = date if date is not None else datetime.date.today()
+        return self[permuted(self.n, date.toordinal(), seed)]
+
+    def next_quote(self, state_path:str, seed:int=QUOTE_SEED):
+        """
+        The next quote of the no-repeat rotation. The draw counter is kept in 'state_path' (restarted if the corpus size changes), or
+        only in memory if 'state_path' is None.
+        """
+        if state_path is None:
+            k = self.draws
+            self.draws += 1
+            return self[permuted(self.n, k, seed)]
+        try:
+            with open(state_path, 'r') as ifile:
+                state = json.load(ifile)
+        except (OSError, ValueError):
+            state = {}
+        k = state.get("draws", 0) if state.get("n") == self.n and state.get("seed") == seed else 0
+        quote = self[permuted(self.n, k, seed)]
+        tmp = "{0}.{1}.tmp".format(state_path, os.getpid())
+        try:
+            with open(tmp, 'w') as ofile:
+                json.dump({"n": self.n, "seed": seed, "draws": k + 1}, ofile)
+            os.replace(tmp, state_path)
+        except OSError as e:
+            sys.stderr.write("journal.quotes: could not save rotation state '{0}' ({1})\n".format(state_path, e))
+        return quote
+
+
+class QuoteStore(Quotes):
+    """
+    Read-only sequence of (author, quote) tuples backed by the memory-mapped .dat/.idx files
+    """
+    def __init__(self, data_path:str, index_path:str):
+        self.data_path = data_path
+        self.index_path = index_path
+        self.n = os.path.getsize(index_path) // OFFSET.size - 1
+        if self.n < 1:
+            raise ValueError("journal.quotes.QuoteStore: '{0}' holds no quotes".format(data_path))
+        with open(data_path, 'rb') as ifile:
+            self.data = mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(index_path, 'rb') as ifile:
+            self.index = mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i:int):
+        if i < 0:
+            i += self.n
+        if i < 0 or i >= self.n:
+            raise IndexError("journal.quotes.QuoteStore: quote index out of range")
+        start = OFFSET.unpack_from(self.index, i * OFFSET.size)[0]
+        end = OFFSET.unpack_from(self.index, (i + 1) * OFFSET.size)[0]
+        author, quote = json.loads(self.data[start:end])
+        return (author, quote)
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+
+class MemoryQuoteStore(Quotes):
+    """
+    Uncached QuoteStore over a list of (author, quote) tuples, for when the cache directory cannot be used
+    """
+    data_path = None
+
+    def __init__(self, quotes:list):
+        self.quotes = quotes
+        self.n = len(quotes)
+        if self.n < 1:
+            raise ValueError("journal.quotes.MemoryQuoteStore: no quotes")
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i:int):
+        return self.quotes[i]
+
+    def close(self):
+        pass
+
+
+def build_store(quotes, data_path:str, index_path:str):
+    """
+    Write the .dat/.idx files for an iterable of (author, quote). Returns the number of quotes.
+    """
+    data_tmp = "{0}.{1}.tmp".format(data_path, os.getpid())
+    index_tmp = "{0}.{1}.tmp".format(index_path, os.getpid())
+    n = 0
+    offset = 0
+    with open(data_tmp, 'wb') as data, open(index_tmp, 'wb') as index:
+        index.write(OFFSET.pack(0))
+        for author, quote in quotes:
+            record = json.dumps([author, quote], ensure_ascii=False).encode("utf-8") + b"\n"
+            data.write(record)
+            offset += len(record)
+            index.write(OFFSET.pack(offset))
+            n += 1
+    os.replace(data_tmp, data_path)
+    os.replace(index_tmp, index_path)
+    return n
+
+
+def open_store(quotes_toml:str, cache_dir:str=catalog.CACHE_DIR):
+    """
+    The QuoteStore for a quotes.toml, recompiled when the file changes. If the cache directory cannot be used, the quotes are kept
+    in memory (MemoryQuoteStore) and a warning is printed.
+    """
+    meta_path = catalog.cache_path("quotes", [quotes_toml], cache_dir=cache_dir)
+    root = os.path.splitext(meta_path)[0]
+    data_path, index_path = root + ".dat", root + ".idx"
+    if catalog.read_cache(meta_path, [quotes_toml]) is None or not (os.path.exists(data_path) and os.path.exists(index_path)):
+        signatures = catalog.source_signatures([quotes_toml])
+        quotes = catalog.compile_quotes(quotes_toml)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            n = build_store(quotes, data_path, index_path)
+        except OSError as e:
+            sys.stderr.write("journal.quotes: could not write the quote store to '{0}' ({1}), keeping the quotes in memory\n".format(cache_dir, e))
+            return MemoryQuoteStore(quotes)
+        catalog.write_cache(meta_path, signatures, {"n": n})
+    return QuoteStore(data_path, index_path)
+
+
+def state_path(store:QuoteStore):
+    """
+    Where the rotation state of a store is kept (None for a MemoryQuoteStore)
+    """
+    if store.data_path is None:
+        return None
+    return os.path.splitext(store.data_path)[0] + ".state.json"
@@ -0,0 +1,175 @@
+from collections import namedtuple
+
+from journal.lazy import lazy_import
+
+prompts = lazy_import("journal.prompts")
+
+"""
+Compact, read-only prompt records
+
+journal.prompts defines the prompts as pydantic models, and building one per prompt on every call costs more than asking the question
+from a recorded source. The records here are frozen namedtuples with the same fields and defaults as the journal.prompts models (no
+per-instance __dict__), and the choice prompts carry a precomputed frozenset for validate_selection(s).
+
+The catalog is converted once (compile_catalog) and the prompt helpers take either a record or the prompt data dict. to_pydantic()
+gives the journal.prompts model of a record when full pydantic validation is wanted.
+"""
+
+
+def record_type(typename:str, fields:list, defaults:dict):
+    """
+    namedtuple class with the given fields, the trailing ones defaulted
+    """
+    names = [f for f in fields if f not in defaults] + [f for f in fields if f in defaults]
+    return namedtuple(typename, names, defaults=[defaults[f] for f in names if f in defaults])
+
+
+BASE_FIELDS = ["name", "prompt", "prompt_type", "description"]
+
+
+class BooleanRecord(record_type("BooleanRecord", BASE_FIELDS + ["default"], {"default": None})):
+    __slots__ = ()
+
+
+class TextRecord(record_type("TextRecord", BASE_FIELDS + ["default"], {"default": None})):
+    __slots__ = ()
+
+
+class SingleLineRecord(record_type("SingleLineRecord", BASE_FIELDS + ["default"], {"default": None})):
+    __slots__ = ()
+
+
+class MultiLineRecord(record_type("MultiLineRecord", BASE_FIELDS + ["default"], {"default": None})):
+    __slots__ = ()
+
+
+class BeliefRecord(record_type("BeliefRecord", BASE_FIELDS + ["default", "scale_min", "scale_max", "scale_label", "reason_label"], {
+        "default": None,
+        "scale_min": 1,
+        "scale_max": 10,
+        "scale_label": "2. How strong is this belief? (1:10)    ",
+        "reason_label": "1. Why do you have this belief?    "})):
+    __slots__ = ()
+
+
+class ChoiceRecord(record_type("ChoiceRecord", BASE_FIELDS + ["choices", "default", "choice_set"], {"default": None, "choice_set": None})):
+    __slots__ = ()
+
+    def validate_selection(self, selection:str):
+        if selection not in self.choice_set:
+            raise ValueError("journal.ChoicePrompt.validate_selection: Invalid selection '{0}'. Must be one of {1}".format(selection, list(self.choices)))
+
+
+class MultiChoiceRecord(record_type("MultiChoiceRecord", BASE_FIELDS + ["choices", "default", "choice_set"], {"default": None, "choice_set": None})):
+    __slots__ = ()
+
+    def validate_selections(self, selections:list):
+        for s in selections:
+            if s not in self.choice_set:
+                raise ValueError("journal.MultiChoicePrompt.validate_selection: Invalid selection '{0}'. Must be one of {1}".format(s, list(self.choices)))
+
+
+class GoalRecord(record_type("GoalRecord", BASE_FIELDS + ["default", "choices", "desc_prompt_label", "effort_label", "priority_label", "choice_set"], {
+        "default": None,
+        "choices": None,
+        "desc_prompt_label": "1. Describe the goal in detail",
+        "effort_label": "2. Estimate the effort (in days | 1:7)",
+        "priority_label": "3. What is the priority? (1:10)",
+        "choice_set": None})):
+    __slots__ = ()
+
+    def validate_selections(self, selections:list):
+        for s in selections:
+            if s not in self.choice_set:
+                raise ValueError("journal.MultiChoicePrompt.validate_selection: Invalid selection '{0}'. Must be one of {1}".format(s, list(self.choices)))
+
+
+RECORDS = {
+    "boolean": BooleanRecord,
+    "choice": ChoiceRecord,
+    "multichoice": MultiChoiceRecord,
+    "text": TextRecord,
+    "singleline": SingleLineRecord,
+    "multiline": MultiLineRecord,
+    "belief": BeliefRecord,
+    "goal": GoalRecord,
+}
+
+MODELS = {
+    "boolean": "BooleanPrompt",
+    "choice": "ChoicePrompt",
+    "multichoice": "MultiChoicePrompt",
+    "text": "TextPrompt",
+    "singleline": "SingleLinePrompt",
+    "multiline": "MultiLinePrompt",
+    "belief": "BeliefPrompt",
+    "goal": "GoalPrompt",
+}
+
+MISSING = object()
+DEFAULTS = {cls: tuple(cls._field_defaults.get(f, MISSING) for f in cls._fields) for cls in RECORDS.values()}
+CHOICE_FIELDS = {cls: (cls._fields.index("choices"), cls._fields.index("choice_set")) for cls in (ChoiceRecord, MultiChoiceRecord, GoalRecord)}
+
+_compiled = (None, None) # (catalog, records) of the last compile_catalog call
+
+
+def record(prompt_data, prompt_type:str=None):
+    """
+    The record for a prompt data dict (unknown keys are ignored, as by the pydantic models). A record is returned as it is.
+    """
+    if type(prompt_data) is not dict:
+        if type(prompt_data) not in RECORDS.values():
+            raise TypeError("journal.records.record: expects a prompt data dict or a prompt record")
+        if prompt_type is not None and prompt_data.prompt_type != prompt_type:
+            raise ValueError("journal.records.record: prompt '{0}' is a '{1}' prompt, not '{2}'".format(prompt_data.name, prompt_data.prompt_type, prompt_type))
+        return prompt_data
+    prompt_type = prompt_type if prompt_type is not None else prompt_data.get("prompt_type")
+    try:
+        cls = RECORDS[prompt_type]
+    except KeyError:
+        raise ValueError("journal.records.record: unknown prompt type '{0}'".format(prompt_type))
+    if prompt_data.get("prompt_type") != prompt_type:
+        raise ValueError("journal.records.record: prompt '{0}' is a '{1}' prompt, not '{2}'".format(prompt_data.get("name"), prompt_data.get("prompt_type"), prompt_type))
+    values = tuple(map(prompt_data.get, cls._fields, DEFAULTS[cls]))
+    if MISSING in values:
+        missing = [f for f, v in zip(cls._fields, values) if v is MISSING]
+        raise ValueError("journal.records.record: {0} prompt '{1}' is missing {2}".format(prompt_type, prompt_data.get("name"), ", ".join(missing)))
+    if cls in CHOICE_FIELDS:
+        i, j = CHOICE_FIELDS[cls]
+        if values[i] is not None:
+            values = list(values)
+            values[i] = tuple(values[i])
+            values[j] = frozenset(values[i])
+    return tuple.__new__(cls, values)
+
+
+def compile_catalog(catalog:dict):
+    """
+    {category: {name: record}} for a validated prompts catalog. The result for the last catalog object is reused, so the helpers can
+    call this on every session; a catalog must not be modified once it is in use.
+    """
+    global _compiled
+    if _compiled[0] is catalog:
+        return _compiled[1]
+    compiled = {category: {name: record(prompt_data) for name, prompt_data in table.items()} for category, table in catalog.items()}
+    _compiled = (catalog, compiled)
+    return compiled
+
+
+def to_dict(prompt_record):
+    """
+    The prompt data dict of a record (fields left at their default are included)
+    """
+    data = prompt_record._asdict()
+    data.pop("choice_set", None)
+    if data.get("choices") is not None:
+        data["choices"] = list(data["choices"])
+    return data
+
+
+def to_pydantic(prompt_record):
+    """
+    The journal.prompts model of a record. Raises pydantic.ValidationError if the record is not a valid prompt.
+    """
+    model = getattr(prompts, MODELS[prompt_record.prompt_type])
+    return model(**to_dict(prompt_record))
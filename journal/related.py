@@ -0,0 +1,253 @@
+import os
+
+import math
+import datetime
+from array import array
+from collections import namedtuple, Counter
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("journal.related requires numpy. Install it with: pip install 'journal.py[stats]'") from e
+
+from journal import history, ingest, manifest, search
+
+"""
+"Related past entries": TF-IDF cosine similarity between a new answer and the free-text answers of past days
+
+Every text/singleline answer and every multiline answer (its lines together) is a document. The term counts of all documents form one
+sparse matrix in CSR layout, kept in flat arrays that grow as days are added:
+
+  indptr  : offsets of each document's terms (array('q'), one more than the documents)
+  indices : term ids (array('q'))
+  counts  : term frequencies (array('d'))
+
+The index is pickled under JOURNAL_DIR/.journal and only new or changed days are re-read; the documents of a changed or removed day are
+marked deleted and dropped when they make up a quarter of the matrix. matrix() turns the arrays into NumPy views (np.frombuffer, no
+copy, only held while it runs) and weighs them once: sublinear tf x smoothed idf, document norms by np.bincount, and a term-major (CSC) ordering of the non-zeros.
+A query only gathers the postings of its own terms and accumulates the dot products with np.bincount, so its cost follows the
+frequency of its terms rather than the size of the history.
+"""
+
+RELATED_INDEX_VERSION = 2
+RELATED_INDEX_FILE = "related.pickle"
+
+TOP_K = 3
+MIN_SCORE = 0.15 # Cosine similarity below which a past entry is not shown
+
+Document = namedtuple("Document", ["date", "prompt", "text"])
+Match = namedtuple("Match", ["score", "date", "prompt", "text"])
+Matrix = namedtuple("Matrix", ["dates", "idf", "norms", "colptr", "rows", "weights"])
+
+
+def answer_document(value):
+    """
+    The text of one free-text answer (a multiline answer's lines joined), or None for other answers
+    """
+    if type(value) is str:
+        return value if value.strip() != "" else None
+    elif type(value) is list and len(value) > 0 and all(type(line) is str for line in value):
+        text = "\n".join(line for line in value if line.strip() != "")
+        return text if text != "" else None
+    return None
+
+
+def tf_weights(counts):
+    """
+    Sublinear term frequency: 1 + log(tf)
+    """
+    return 1.0 + np.log(counts)
+
+
+class RelatedIndex:
+    """
+    Sparse TF-IDF matrix of the free-text answers:
+
+        index = RelatedIndex.open(JOURNAL_DIR)
+        index.related("Cooked dinner with friends, then guitar", k=3, before=datetime.date.today())
+        [Match(score=0.41, date=datetime.date(2024, 5, 2), prompt='...', text='...'), ...]
+    """
+    def __init__(self):
+        self.docs = []
+        self.dates = array('q')
+        self.indptr = array('q', [0])
+        self.indices = array('q')
+        self.counts = array('d')
+        self.vocabulary = {}
+        self.deleted = set()
+        self.day_docs = {} # day filename: [doc ids]
+        self.sources = {}
+        self.weighted = None # Matrix, computed on first query after a change
+
+    def __len__(self):
+        return len(self.docs) - len(self.deleted)
+
+    def add(self, date:datetime.date, prompt:str, text:str):
+        """
+        Append one document (a row). Returns its id, or None if it has no terms.
+        """
+        terms = Counter(search.tokenize(text))
+        if len(terms) == 0:
+            return None
+        self.weighted = None
+        for term, n in terms.items():
+            self.indices.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+            self.counts.append(n)
+        self.indptr.append(len(self.indices))
+        self.docs.append(Document(date.toordinal(), prompt, text))
+        self.dates.append(date.toordinal())
+        return len(self.docs) - 1
+
+    def add_day(self, filename:str, date:datetime.date, answers:list):
+        self.remove_day(filename)
+        ids = []
+        for prompt, value in answers:
+            text = answer_document(value)
+            if text is not None:
+                doc_id = self.add(date, prompt, text)
+                if doc_id is not None:
+                    ids.append(doc_id)
+        self.day_docs[filename] = ids
+
+    def remove_day(self, filename:str):
+        removed = self.day_docs.pop(filename, [])
+        if len(removed) > 0:
+            self.deleted.update(removed)
+            self.weighted = None
+
+    def matrix(self):
+        """
+        The weighted matrix (see module docstring), cached until the index changes
+        """
+        if self.weighted is not None:
+            return self.weighted
+        n = len(self.docs)
+        indptr = np.frombuffer(self.indptr, dtype=np.int64)
+        indices = np.frombuffer(self.indices, dtype=np.int64)
+        counts = np.frombuffer(self.counts, dtype=np.float64)
+        rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+        live = np.ones(n, dtype=bool)
+        if len(self.deleted) > 0:
+            live[np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted))] = False
+        live_terms = live[rows]
+        rows, indices, counts = rows[live_terms], indices[live_terms], counts[live_terms]
+        df = np.bincount(indices, minlength=len(self.vocabulary))
+        idf = np.log((1.0 + len(self)) / (1.0 + df)) + 1.0
+        weights = tf_weights(counts) * idf[indices]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=n))
+        order = np.argsort(indices, kind="stable") # Term-major: the postings of term t are order[colptr[t]:colptr[t + 1]]
+        colptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=colptr[1:])
+        dates = np.array(self.dates, dtype=np.int64) # A copy: a view kept in the cache would stop add() from growing self.dates
+        self.weighted = Matrix(dates, idf, norms, colptr, rows[order], weights[order])
+        return self.weighted
+
+    def related(self, text:str, k:int=TOP_K, before:datetime.date=None, start:datetime.date=None, min_score:float=MIN_SCORE):
+        """
+        The k past documents most similar to 'text' (cosine of the TF-IDF vectors), best first, from the days start..before (exclusive)
+        """
+        terms = Counter(t for t in search.tokenize(text) if t in self.vocabulary)
+        if len(terms) == 0 or len(self) == 0:
+            return []
+        m = self.matrix()
+        ids = np.fromiter((self.vocabulary[t] for t in terms), dtype=np.int64, count=len(terms))
+        query = tf_weights(np.fromiter(terms.values(), dtype=np.float64, count=len(terms))) * m.idf[ids]
+        query_norm = math.sqrt(float(query @ query))
+        lengths = m.colptr[ids + 1] - m.colptr[ids]
+        postings = np.concatenate([np.arange(m.colptr[t], m.colptr[t + 1]) for t in ids])
+        docs = m.rows[postings]
+        dots = np.bincount(docs, weights=m.weights[postings] * np.repeat(query, lengths), minlength=len(self.docs))
+        candidates = np.flatnonzero(dots)
+        if before is not None:
+            candidates = candidates[m.dates[candidates] < before.toordinal()]
+        if start is not None:
+            candidates = candidates[m.dates[candidates] >= start.toordinal()]
+        scores = dots[candidates] / (m.norms[candidates] * query_norm)
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        best = np.argsort(-scores, kind="stable")
+        return [Match(float(scores[i]), datetime.date.fromordinal(self.docs[candidates[i]].date), self.docs[candidates[i]].prompt,
+                      self.docs[candidates[i]].text) for i in best]
+
+    """
+    Building and persistence
+    """
+
+    def compact(self):
+        """
+        Rebuild without the deleted documents
+        """
+        day_of = {d: f for f, ids in self.day_docs.items() for d in ids}
+        fresh = RelatedIndex()
+        fresh.sources = self.sources
+        for d, doc in enumerate(self.docs):
+            if d not in self.deleted:
+                fresh.day_docs.setdefault(day_of[d], []).append(fresh.add(datetime.date.fromordinal(doc.date), doc.prompt, doc.text))
+        self.__dict__.update(fresh.__dict__)
+
+    def update(self, journal_dir:str):
+        """
+        Index new or changed days and drop removed ones. Returns the number of days (re)read.
+        """
+        days, stats = manifest.digests(journal_dir) # Content digests: a day is only re-read when its contents changed
+        removed = set(self.sources) - set(stats)
+        for filename in removed:
+            self.remove_day(filename)
+            del self.sources[filename]
+        changed = [d for d in days if self.sources.get(os.path.basename(d.path)) != stats[os.path.basename(d.path)]]
+        for day, answers in ingest.iter_days(changed):
+            filename = os.path.basename(day.path)
+            self.add_day(filename, day.date, answers)
+            self.sources[filename] = stats[filename]
+        if len(self.deleted) > len(self.docs) // 4:
+            self.compact()
+        return len(changed) + len(removed)
+
+    def save(self, path:str):
+        history.write_index(path, RELATED_INDEX_VERSION, {"index": dict(self.__dict__, weighted=None)})
+
+    @classmethod
+    def open(cls, journal_dir:str):
+        """
+        Load the index for 'journal_dir', update it with any new or changed days and save it back
+        """
+        index = cls()
+        path = os.path.join(history.index_dir(journal_dir), RELATED_INDEX_FILE)
+        stored = history.read_index(path, RELATED_INDEX_VERSION)
+        if stored is not None:
+            index.__dict__.update(stored["index"])
+        if index.update(journal_dir) > 0:
+            index.save(path)
+        return index
+
+
+"""
+Session
+"""
+
+_session = {}
+
+
+def session_index(journal_dir:str):
+    """
+    The index of 'journal_dir', opened and weighted once per process (journal.preload does it while the affirmations are on screen)
+    """
+    if journal_dir not in _session:
+        index = RelatedIndex.open(journal_dir)
+        index.matrix()
+        _session[journal_dir] = index
+    return _session[journal_dir]
+
+
+def format_matches(matches:list, width:int=100):
+    """
+    One line per match: date, similarity and the start of the entry
+    """
+    lines = []
+    for match in matches:
+        text = " ".join(match.text.split())
+        lines.append("  {0}  {1:.2f}  {2}".format(match.date, match.score, text if len(text) <= width else text[:width - 1] + "…"))
+    return "\n".join(lines)
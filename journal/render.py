@@ -0,0 +1,30 @@
+from pygments import highlight
+from pygments.formatters import Terminal256Formatter
+
+from pygments.lexer import Lexer
+from pygments.style import Style
+
+from pygments.token import Token
+
+"""
+Pygments rendering of the green prompt description banners. Only imported when journal.banners has to render a banner it has not cached.
+"""
+
+class JournalPromptStyle(Style):
+    default_style = ""
+    styles = {
+        Token.Text: "bg:#002200 #00ff00",
+    }
+
+
+class PlainGreenLexer(Lexer):
+    def get_tokens_unprocessed(self, text):
+        yield 0, Token.Text, text
+
+
+def description_banner(description:str):
+    """
+    Pad a prompt description with blank lines of the same width and highlight it with the JournalPromptStyle
+    """
+    desc = "{0}\n{0}\n{1}\n{0}\n{0}".format(" "*len(description), description)
+    return highlight(desc, PlainGreenLexer(), Terminal256Formatter(style=JournalPromptStyle))
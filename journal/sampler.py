@@ -0,0 +1,209 @@
+import os
+import sys
+
+import random
+import datetime
+from array import array
+
+from journal import history, ingest
+
+"""
+History-aware sampler for the multiline prompts
+
+Each prompt gets a weight from how recently it was asked and how much was written when it was:
+
+    weight = max(MIN_WEIGHT, recency * depth)
+    recency = min(1, days since last asked / INTERVAL)                  (never asked: 1)
+    depth = DEPTH_FLOOR + (1 - DEPTH_FLOOR) / (1 + average lines / DEPTH_LINES)
+
+so prompts come back once they have rested, sooner if they were skimmed. The weights live in a Fenwick tree: a draw and a weight change
+are O(log n). Only the prompts asked within the last INTERVAL days have a weight that changes from one day to the next, so a new day
+only touches those. The statistics are kept under JOURNAL_DIR/.journal and updated from the day files that are new since the last run.
+"""
+
+SAMPLER_VERSION = 2
+SAMPLER_FILE = "sampler.pickle"
+
+INTERVAL = 14 # days until a prompt is fully rested
+DEPTH_LINES = 3.0
+DEPTH_FLOOR = 0.25
+DEPTH_ALPHA = 0.3 # Exponential moving average of the number of lines answered
+MIN_WEIGHT = 0.01
+
+
+class FenwickTree:
+    """
+    Binary indexed tree of non-negative float weights. Only the weights are pickled: the partial sums, which drift as weights change,
+    are rebuilt on load.
+    """
+    def __init__(self, weights:list=()):
+        self.weights = array('d', weights)
+        self.tree = array('d', [0.0]) + array('d', weights)
+        n = len(self.weights)
+        for i in range(1, n + 1): # O(n) build
+            j = i + (i & -i)
+            if j <= n:
+                self.tree[j] += self.tree[i]
+
+    def __len__(self):
+        return len(self.weights)
+
+    def __getstate__(self):
+        return self.weights
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def total(self):
+        return self.prefix(len(self.weights))
+
+    def prefix(self, i:int):
+        """
+        Sum of the first i weights
+        """
+        s = 0.0
+        while i > 0:
+            s += self.tree[i]
+            i -= i & -i
+        return s
+
+    def set(self, i:int, weight:float):
+        delta = weight - self.weights[i]
+        self.weights[i] = weight
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, u:float):
+        """
+        Smallest index whose prefix sum exceeds u, len(self) if none does. Rounding in the partial sums can make it an index of weight 0.
+        """
+        i = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step > 0:
+            j = i + step
+            if j < len(self.tree) and self.tree[j] <= u:
+                i = j
+                u -= self.tree[j]
+            step >>= 1
+        return i
+
+
+class PromptSampler:
+    """
+    Weighted sampling without replacement over a table of prompts ({name: prompt data}):
+
+        sampler = PromptSampler.open(JOURNAL_DIR, prompts["multiline"])
+        sampler.sample(3)
+    """
+    def __init__(self, table:dict):
+        self.names = list(table.keys())
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        self.texts = {prompt_data["prompt"]: name for name, prompt_data in table.items()}
+        self.stats = {} # name: [last asked (ordinal), times asked, average lines]
+        self.sources = {}
+        self.day = None # ordinal the weights were computed for
+        self.recent = set() # names whose recency is still ramping up at self.day
+        self.tree = FenwickTree([self.weight(name, None) for name in self.names])
+
+    def weight(self, name:str, today:int):
+        if name not in self.stats:
+            return 1.0
+        last, count, lines = self.stats[name]
+        recency = 1.0 if today is None else min(1.0, max(0, today - last) / INTERVAL)
+        depth = DEPTH_FLOOR + (1 - DEPTH_FLOOR) / (1 + lines / DEPTH_LINES)
+        return max(MIN_WEIGHT, recency * depth)
+
+    def reweight(self, names, today:int):
+        for name in names:
+            self.tree.set(self.positions[name], self.weight(name, today))
+            last = self.stats[name][0] if name in self.stats else None
+            if last is not None and today - last < INTERVAL:
+                self.recent.add(name)
+            else:
+                self.recent.discard(name)
+
+    def asked(self, name:str, date:datetime.date, lines:int):
+        """
+        Record that a prompt was asked on 'date' and answered with 'lines' lines
+        """
+        last, count, average = self.stats.get(name, [None, 0, float(lines)])
+        ordinal = date.toordinal()
+        self.stats[name] = [ordinal if last is None else max(last, ordinal), count + 1, average + DEPTH_ALPHA * (lines - average)]
+
+    def refresh(self, today:datetime.date, changed:set=()):
+        """
+        Bring the weights to 'today': the recently asked prompts and those in 'changed' are re-weighted
+        """
+        ordinal = today.toordinal()
+        names = set(changed) | (self.recent if self.day != ordinal else set())
+        self.reweight(sorted(names), ordinal)
+        self.day = ordinal
+
+    def sample(self, k:int, rng=random):
+        """
+        k distinct names, drawn by weight. O(k log n).
+        """
+        k = min(k, len(self.names))
+        drawn = []
+        for _ in range(k):
+            i = self.tree.find(rng.random() * self.tree.total())
+            while i == len(self.tree) or self.tree.weights[i] == 0.0: # Partial sums off by rounding: rebuild them and draw again
+                self.tree = FenwickTree(self.tree.weights)
+                i = self.tree.find(rng.random() * self.tree.total())
+            drawn.append((i, self.tree.weights[i]))
+            self.tree.set(i, 0.0)
+        for i, w in drawn:
+            self.tree.set(i, w)
+        return [self.names[i] for i, w in drawn]
+
+    """
+    Building and persistence
+    """
+
+    def update(self, journal_dir:str):
+        """
+        Fold in the day files that are new since the last run. Returns the names whose statistics changed.
+        """
+        days = history.list_days(journal_dir)
+        new_days = [d for d in days if os.path.basename(d.path) not in self.sources]
+        stats = {os.path.basename(d.path): history.day_stat(d) for d in new_days}
+        changed = set()
+        for day, answers in ingest.iter_days(new_days):
+            for prompt, value in answers:
+                name = self.texts.get(prompt)
+                if name is not None:
+                    self.asked(name, day.date, len(value) if type(value) is list else 1)
+                    changed.add(name)
+            self.sources[os.path.basename(day.path)] = stats[os.path.basename(day.path)]
+        return changed
+
+    def save(self, path:str):
+        history.write_index(path, SAMPLER_VERSION, {"sampler": self.__dict__})
+
+    @classmethod
+    def open(cls, journal_dir:str, table:dict, today:datetime.date=None):
+        """
+        Load the sampler for 'journal_dir', update it from the history and bring its weights to 'today'
+        """
+        today = today if today is not None else datetime.date.today()
+        sampler = cls(table)
+        path = os.path.join(history.index_dir(journal_dir), SAMPLER_FILE)
+        stored = history.read_index(path, SAMPLER_VERSION)
+        changed = set()
+        if stored is not None:
+            state = stored["sampler"]
+            if state["names"] == sampler.names:
+                sampler.__dict__.update(state)
+                sampler.texts = {prompt_data["prompt"]: name for name, prompt_data in table.items()}
+            else: # The table changed: keep the statistics and rebuild the tree
+                sampler.stats = {n: s for n, s in state["stats"].items() if n in table}
+                sampler.sources = state["sources"]
+                changed = set(sampler.stats)
+        changed |= sampler.update(journal_dir)
+        day = sampler.day
+        sampler.refresh(today, changed)
+        if len(changed) > 0 or day != sampler.day:
+            sampler.save(path)
+        return sampler
@@ -0,0 +1,133 @@
+import math
+import heapq
+import datetime
+import itertools
+from collections import namedtuple
+
+"""
+Goal scheduler: a ranked daily focus set from the goal list
+
+    score = priority * w.priority - log(effort) * w.effort + age_days * w.age - log1p(reselections) * w.reselect
+
+Higher priority, smaller effort and older goals rank first; goals that keep being re-selected give way to the others.
+Because age enters linearly, score = key + w.age * today, where key does not depend on the day. The heap is keyed on 'key' alone and
+stays valid from one day to the next; only goals that change are re-pushed (indexed heap with lazy deletion).
+"""
+
+Weights = namedtuple("Weights", ["priority", "effort", "age", "reselect"])
+
+DEFAULT_WEIGHTS = Weights(priority=1.0, effort=0.5, age=0.01, reselect=1.0)
+
+FOCUS_SIZE = 5
+
+
+def goal_day(goal:dict):
+    """
+    The goal's creation date as a (fractional) day number
+    """
+    date = datetime.datetime.fromisoformat(goal["date"])
+    return date.toordinal() + (date.hour * 3600 + date.minute * 60 + date.second) / 86400.0
+
+
+class GoalScheduler:
+    """
+    Indexed max-heap of goals by score:
+
+        schedule = GoalScheduler.from_store(store)
+        schedule.focus(5)              # [(score, goal)] best first
+        schedule.reselected(goal_id)   # O(log n)
+        schedule.update(goal)          # O(log n)
+    """
+    def __init__(self, weights:Weights=DEFAULT_WEIGHTS):
+        self.weights = weights
+        self.heap = []
+        self.entries = {} # goal id: [-key, tie-breaker, goal id, goal, reselections, live]
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, goal:dict, reselections:int):
+        w = self.weights
+        return (goal["priority"] * w.priority
+                - math.log(max(goal["effort"], 1)) * w.effort
+                - goal_day(goal) * w.age
+                - math.log1p(reselections) * w.reselect)
+
+    def score(self, key:float, today:datetime.date=None):
+        today = today if today is not None else datetime.date.today()
+        return key + today.toordinal() * self.weights.age
+
+    def add(self, goal:dict, reselections:int=0):
+        """
+        Add a goal (or replace the goal with the same 'id')
+        """
+        goal_id = goal["id"]
+        if goal_id in self.entries:
+            self.entries[goal_id][5] = False
+        entry = [-self.key(goal, reselections), next(self.counter), goal_id, goal, reselections, True]
+        self.entries[goal_id] = entry
+        heapq.heappush(self.heap, entry)
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.compact()
+
+    def update(self, goal:dict):
+        """
+        Re-score a goal after its priority/effort changed
+        """
+        self.add(goal, self.entries[goal["id"]][4] if goal["id"] in self.entries else 0)
+
+    def reselected(self, goal_id:int, n:int=1):
+        entry = self.entries[goal_id]
+        self.add(entry[3], entry[4] + n)
+
+    def remove(self, goal_id:int):
+        entry = self.entries.pop(goal_id)
+        entry[5] = False
+
+    def compact(self):
+        """
+        Drop the stale heap entries left behind by updates and removals
+        """
+        self.heap = [e for e in self.heap if e[5]]
+        heapq.heapify(self.heap)
+
+    def focus(self, k:int=FOCUS_SIZE, today:datetime.date=None):
+        """
+        The k highest scoring goals, best first, as [(score, goal)]. O(k log n).
+        """
+        top = []
+        while self.heap and len(top) < k:
+            entry = heapq.heappop(self.heap)
+            if entry[5]:
+                top.append(entry)
+        for entry in top:
+            heapq.heappush(self.heap, entry)
+        return [(self.score(-e[0], today), e[3]) for e in top]
+
+    def ranked(self, today:datetime.date=None):
+        """
+        Every goal, best first
+        """
+        return self.focus(len(self.entries), today)
+
+    @classmethod
+    def from_goals(cls, goals:list, selection_counts:dict=None, weights:Weights=DEFAULT_WEIGHTS):
+        """
+        Build the heap in O(n) from goals carrying an 'id', with {goal id: times re-selected}
+        """
+        schedule = cls(weights)
+        selection_counts = selection_counts if selection_counts is not None else {}
+        for goal in goals:
+            n = selection_counts.get(goal["id"], 0)
+            schedule.entries[goal["id"]] = [-schedule.key(goal, n), next(schedule.counter), goal["id"], goal, n, True]
+        schedule.heap = list(schedule.entries.values())
+        heapq.heapify(schedule.heap)
+        return schedule
+
+    @classmethod
+    def from_store(cls, store, weights:Weights=DEFAULT_WEIGHTS):
+        """
+        Schedule the active goals of a journal.goals.GoalStore
+        """
+        return cls.from_goals(store.active(), store.selection_counts(), weights)
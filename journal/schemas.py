@@ -1,5 +1,4 @@
-from jsonschema import validate
-
+import functools
 
 boolean_schema = {
     "type": "object",
@@ -135,3 +134,160 @@ goal_prompt_schema = {
 }
 
 
+
+# journal_metadata_YYYY_MM_DD.yaml: a list of [prompt, answer] pairs
+journal_metadata_schema = {
+    "type": "array",
+    "items": {
+        "type": "array",
+        "prefixItems": [{"type": "string"}],
+        "minItems": 2,
+        "maxItems": 2
+    }
+}
+
+# A dictionary-encoded (format 2) journal_metadata file: [prompt id, answer] pairs (journal.dictionary)
+journal_metadata_ids_schema = {
+    "type": "object",
+    "properties": {
+        "format": {"const": 2},
+        "dictionary": {"type": "integer", "minimum": 0},
+        "answers": {
+            "type": "array",
+            "items": {
+                "type": "array",
+                "prefixItems": [{"type": "integer", "minimum": 0}],
+                "minItems": 2,
+                "maxItems": 2
+            }
+        }
+    },
+    "required": ["format", "dictionary", "answers"]
+}
+
+# journal_prompts.yaml
+prompt_dictionary_schema = {
+    "type": "object",
+    "properties": {
+        "dictionary": {"type": "integer", "minimum": 0},
+        "format": {"const": 1},
+        "days": {"enum": [1, 2]},
+        "prompts": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer", "minimum": 0},
+                    "key": {"type": ["string", "null"]},
+                    "type": {"type": ["string", "null"]},
+                    "text": {"type": "string"},
+                    "aliases": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["id", "key", "type", "text", "aliases"]
+            }
+        }
+    },
+    "required": ["dictionary", "format", "prompts"]
+}
+
+# The answer written for each prompt_type
+answer_schemas = {
+    "boolean": {"type": "boolean"},
+    "choice": {"type": "string"},
+    "multichoice": {"type": "array", "items": {"type": "string"}},
+    "text": {"type": "string"},
+    "singleline": {"type": "string"},
+    "multiline": {"type": "array", "items": {"type": "string"}},
+    "belief": {
+        "type": "array",
+        "items": {
+            "type": "array",
+            "prefixItems": [{"type": "number"}, {"type": "string"}],
+            "minItems": 2,
+            "maxItems": 2
+        }
+    },
+}
+
+
+"""
+Compiled validators
+
+Each schema is checked against its metaschema and compiled once, on first use. jsonschema itself is only imported then.
+"""
+
+prompt_schemas = {
+    "boolean": boolean_schema,
+    "choice": choice_schema,
+    "multichoice": multichoice_schema,
+    "text": text_schema,
+    "singleline": singleline_schema,
+    "multiline": multiline_schema,
+    "belief": belief_schema,
+}
+
+# prompts.toml: {category: {prompt_name: prompt_data}}, each prompt validated against the schema for its prompt_type
+catalog_schema = {
+    "type": "object",
+    "additionalProperties": {
+        "type": "object",
+        "additionalProperties": {
+            "type": "object",
+            "properties": {
+                "prompt_type": {"enum": list(prompt_schemas.keys())}
+            },
+            "required": ["prompt_type"],
+            "allOf": [
+                {
+                    "if": {"properties": {"prompt_type": {"const": prompt_type}}},
+                    "then": schema
+                } for prompt_type, schema in prompt_schemas.items()
+            ]
+        }
+    }
+}
+
+schemas = dict(prompt_schemas, goal=goal_schema, goal_prompt=goal_prompt_schema, catalog=catalog_schema, journal_metadata=journal_metadata_schema,
+               journal_metadata_ids=journal_metadata_ids_schema, prompt_dictionary=prompt_dictionary_schema)
+# "<prompt_type>_answers": a list of answers to prompts of that type
+schemas.update({"{0}_answers".format(prompt_type): {"type": "array", "items": schema} for prompt_type, schema in answer_schemas.items()})
+
+
+@functools.cache
+def get_validator(name:str):
+    """
+    Return the compiled jsonschema validator for the schema 'name' (a key of journal.schemas.schemas)
+    """
+    import jsonschema
+
+    if name not in schemas:
+        raise KeyError("journal.schemas.get_validator: unknown schema '{0}'. Must be one of {1}".format(name, list(schemas.keys())))
+    schema = schemas[name]
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+def validate(instance, name:str):
+    """
+    Drop-in for jsonschema.validate(instance, schema) using the cached validator for 'name'. Raises jsonschema.ValidationError.
+    """
+    error = best_error(instance, name)
+    if error is not None:
+        raise error
+
+
+def best_error(instance, name:str):
+    """
+    The most relevant jsonschema.ValidationError of 'instance' against the schema 'name', or None if it is valid
+    """
+    import jsonschema
+
+    return jsonschema.exceptions.best_match(get_validator(name).iter_errors(instance))
+
+
+def validate_catalog(prompts:dict):
+    """
+    Validate an entire prompts.toml catalog in a single pass, so the individual prompt_* calls can skip validation
+    """
+    validate(prompts, "catalog")
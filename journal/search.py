@@ -0,0 +1,239 @@
+import os
+import sys
+
+import re
+import math
+import heapq
+import datetime
+from array import array
+from collections import namedtuple
+
+from journal import history, ingest, manifest
+
+"""
+Full-text search over the free-text answers in the journal history
+
+Every text/singleline answer, every line of a multiline answer and every belief reason is a document. The inverted index maps
+each term to its postings (doc ids plus token positions, packed in arrays), so phrase queries are answered from positions and
+results are ranked with BM25. The index is pickled under JOURNAL_DIR/.journal and only new or changed days are re-read.
+
+Query syntax:
+    cooking groceries          both terms (AND)
+    "second brain"             phrase
+    guitar OR piano            either group
+    -work / NOT work           exclude
+"""
+
+SEARCH_INDEX_VERSION = 2
+SEARCH_INDEX_FILE = "search.pickle"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r"[\w']+")
+QUERY_RE = re.compile(r'(-?)"([^"]*)"|(\S+)')
+
+Document = namedtuple("Document", ["date", "prompt", "text"])
+Hit = namedtuple("Hit", ["score", "date", "prompt", "text"])
+
+
+def tokenize(text:str):
+    """
+    Lowercase word tokens, in order
+    """
+    return [t.strip("'") for t in TOKEN_RE.findall(text.lower()) if t.strip("'")]
+
+
+def answer_texts(value):
+    """
+    The free-text pieces of one answer: a str, the lines of a multiline answer, or the reasons of a belief list
+    """
+    if type(value) is str:
+        if value.strip() != "":
+            yield value
+    elif type(value) is list:
+        for item in value:
+            if type(item) is str:
+                if item.strip() != "":
+                    yield item
+            elif type(item) is list and len(item) == 2 and type(item[1]) is str and item[1].strip() != "":
+                yield item[1]
+
+
+def parse_query(query:str):
+    """
+    [(required, excluded)] groups, OR'd together. Each of required/excluded is a list of phrases (lists of terms).
+    """
+    groups = [([], [])]
+    negate_next = False
+    for m in QUERY_RE.finditer(query):
+        negated, phrase, word = m.group(1) == "-", m.group(2), m.group(3)
+        if word == "OR":
+            groups.append(([], []))
+            continue
+        elif word == "NOT":
+            negate_next = True
+            continue
+        elif word is not None and word.startswith("-") and len(word) > 1:
+            negated, word = True, word[1:]
+        terms = tokenize(phrase if phrase is not None else word)
+        if len(terms) == 0:
+            continue
+        required, excluded = groups[-1]
+        (excluded if negated or negate_next else required).append(terms)
+        negate_next = False
+    return [g for g in groups if len(g[0]) > 0]
+
+
+class SearchIndex:
+    """
+    Positional inverted index: postings[term] = (doc ids, position offsets, positions), all array('l')
+    """
+    def __init__(self):
+        self.docs = []
+        self.lengths = array('l')
+        self.postings = {}
+        self.deleted = set()
+        self.day_docs = {} # day filename: [doc ids]
+        self.sources = {}
+
+    def __len__(self):
+        return len(self.docs) - len(self.deleted)
+
+    def add(self, date:datetime.date, prompt:str, text:str):
+        doc_id = len(self.docs)
+        tokens = tokenize(text)
+        self.docs.append(Document(date.toordinal(), prompt, text))
+        self.lengths.append(len(tokens))
+        positions = {}
+        for i, t in enumerate(tokens):
+            positions.setdefault(t, []).append(i)
+        for t, pos in positions.items():
+            if t not in self.postings:
+                self.postings[t] = (array('l'), array('l', [0]), array('l'))
+            docs, starts, plist = self.postings[t]
+            docs.append(doc_id)
+            plist.extend(pos)
+            starts.append(len(plist))
+        return doc_id
+
+    def add_day(self, filename:str, date:datetime.date, answers:list):
+        self.remove_day(filename)
+        ids = []
+        for prompt, value in answers:
+            for text in answer_texts(value):
+                ids.append(self.add(date, prompt, text))
+        self.day_docs[filename] = ids
+
+    def remove_day(self, filename:str):
+        self.deleted.update(self.day_docs.pop(filename, []))
+
+    def term_docs(self, term:str):
+        """
+        {doc id: positions} for a term, without deleted documents
+        """
+        if term not in self.postings:
+            return {}
+        docs, starts, plist = self.postings[term]
+        return {d: plist[starts[i]:starts[i + 1]] for i, d in enumerate(docs) if d not in self.deleted}
+
+    def phrase_docs(self, terms:list):
+        """
+        {doc id: phrase frequency} for the documents containing the terms consecutively
+        """
+        postings = [self.term_docs(t) for t in terms]
+        if len(postings) == 0 or any(len(p) == 0 for p in postings):
+            return {}
+        candidates = set(postings[0]).intersection(*postings[1:])
+        matches = {}
+        for d in candidates:
+            following = [set(p[d]) for p in postings[1:]]
+            n = sum(1 for start in postings[0][d] if all(start + i + 1 in s for i, s in enumerate(following)))
+            if n > 0:
+                matches[d] = n
+        return matches
+
+    def bm25(self, tf:int, df:int, doc_id:int, avgdl:float):
+        n = len(self)
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        dl = self.lengths[doc_id]
+        return idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+
+    def search(self, query:str, limit:int=10, start:datetime.date=None, end:datetime.date=None):
+        """
+        Ranked Hits for a query (see module docstring for the syntax)
+        """
+        groups = parse_query(query)
+        if len(self) == 0 or len(groups) == 0:
+            return []
+        avgdl = max(1.0, sum(self.lengths) / len(self.lengths))
+        scores = {}
+        for required, excluded in groups:
+            matched = None
+            group_scores = {}
+            for phrase in required:
+                freqs = self.phrase_docs(phrase)
+                matched = set(freqs) if matched is None else matched & set(freqs)
+                for d, tf in freqs.items():
+                    group_scores[d] = group_scores.get(d, 0.0) + self.bm25(tf, len(freqs), d, avgdl)
+            for phrase in excluded:
+                matched -= set(self.phrase_docs(phrase))
+            for d in matched:
+                scores[d] = max(scores.get(d, 0.0), group_scores[d])
+        lo = start.toordinal() if start is not None else None
+        hi = end.toordinal() if end is not None else None
+        hits = ((s, d) for d, s in scores.items() if (lo is None or self.docs[d].date >= lo) and (hi is None or self.docs[d].date <= hi))
+        top = heapq.nlargest(limit, hits)
+        return [Hit(s, datetime.date.fromordinal(self.docs[d].date), self.docs[d].prompt, self.docs[d].text) for s, d in top]
+
+    """
+    Building and persistence
+    """
+
+    def compact(self):
+        """
+        Rebuild without the deleted documents
+        """
+        docs = [(d, doc) for d, doc in enumerate(self.docs) if d not in self.deleted]
+        day_of = {d: f for f, ids in self.day_docs.items() for d in ids}
+        fresh = SearchIndex()
+        fresh.sources = self.sources
+        for d, doc in docs:
+            new_id = fresh.add(datetime.date.fromordinal(doc.date), doc.prompt, doc.text)
+            fresh.day_docs.setdefault(day_of[d], []).append(new_id)
+        self.__dict__.update(fresh.__dict__)
+
+    def update(self, journal_dir:str):
+        """
+        Index new or changed days and drop removed ones. Returns the number of days (re)read.
+        """
+        days, stats = manifest.digests(journal_dir) # Content digests: a day is only re-read when its contents changed
+        removed = set(self.sources) - set(stats)
+        for filename in removed:
+            self.remove_day(filename)
+            del self.sources[filename]
+        changed = [d for d in days if self.sources.get(os.path.basename(d.path)) != stats[os.path.basename(d.path)]]
+        for day, answers in ingest.iter_days(changed):
+            filename = os.path.basename(day.path)
+            self.add_day(filename, day.date, answers)
+            self.sources[filename] = stats[filename]
+        if len(self.deleted) > len(self.docs) // 4:
+            self.compact()
+        return len(changed) + len(removed)
+
+    def save(self, path:str):
+        history.write_index(path, SEARCH_INDEX_VERSION, {"index": self.__dict__})
+
+    @classmethod
+    def open(cls, journal_dir:str):
+        """
+        Load the index for 'journal_dir', update it with any new or changed days and save it back
+        """
+        index = cls()
+        path = os.path.join(history.index_dir(journal_dir), SEARCH_INDEX_FILE)
+        stored = history.read_index(path, SEARCH_INDEX_VERSION)
+        if stored is not None:
+            index.__dict__.update(stored["index"])
+        if index.update(journal_dir) > 0:
+            index.save(path)
+        return index
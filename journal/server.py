@@ -0,0 +1,307 @@
+import os
+import sys
+
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import datetime
+from collections import namedtuple
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+import journal
+from journal import helpers, sources, history, records, lazy
+
+"""
+Multi-user journaling server
+
+One asyncio process serves the prompts.toml catalog and runs many journal sessions at once over a minimal HTTP/1.1 API, on a TCP port or a
+unix socket. A session asks the same prompts as make_prompts. The catalog is checked against the journal.prompts models once, when the server
+starts; each answer is checked by the prompt helpers (types, ranges, choices) as it arrives, and the finished session is written to the
+user's own journal directory by make_prompts. If that write fails, the last answer is taken back so that answering it again retries.
+Sessions from a previous day, or idle for more than SESSION_TTL seconds, are dropped.
+
+  GET  /catalog                                 the prompt catalog
+  POST /sessions          {"user": "alice"}     start (or continue) the user's session for today
+  GET  /sessions/<id>                           session state and the next prompt
+  POST /sessions/<id>/answers  {"answer": ...}  answer the next prompt
+"""
+
+MAX_BODY = 1 << 20
+SESSION_TTL = 6 * 3600 # seconds
+USER_RE = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]{0,63}$")
+
+PROMPT_FUNCS = (
+    ("bool", helpers.prompt_boolean),
+    ("text", helpers.prompt_text),
+    ("singleline", helpers.prompt_singleline),
+    ("multiline", helpers.prompt_multiline),
+    ("belieflist", helpers.prompt_belief_list),
+)
+
+Request = namedtuple("Request", ["method", "path", "headers", "body"])
+
+
+class HTTPError(Exception):
+    def __init__(self, status:HTTPStatus, message:str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def session_plan(prompts:dict, sample:int):
+    """
+    [(category, name, prompt data)] in the order make_prompts asks them, with 'sample' multiline prompts chosen at random
+    """
+    plan = []
+    for category, func in PROMPT_FUNCS:
+        names = list(prompts.get(category, {}).keys())
+        if category == "multiline":
+            names = random.sample(names, min(sample, len(names)))
+        plan.extend((category, name, prompts[category][name]) for name in names)
+    return plan
+
+
+class Session:
+    """
+    One user's journal session for one day: the planned prompts and the answers given so far
+    """
+    def __init__(self, user:str, date:datetime.date, plan:list):
+        self.id = uuid.uuid4().hex
+        self.user = user
+        self.date = date
+        self.plan = plan
+        self.answers = []
+        self.file = None
+        self.touched = time.monotonic()
+
+    @property
+    def done(self):
+        return len(self.answers) == len(self.plan)
+
+    def next_prompt(self):
+        if self.done:
+            return None
+        category, name, prompt_data = self.plan[len(self.answers)]
+        return dict(prompt_data, category=category, key=name)
+
+    def answer(self, value):
+        """
+        Check an answer to the next prompt with the prompt helpers and record it
+        """
+        if self.done:
+            raise HTTPError(HTTPStatus.CONFLICT, "journal.server: session {0} is already complete".format(self.id))
+        category, name, prompt_data = self.plan[len(self.answers)]
+        func = dict(PROMPT_FUNCS)[category]
+        source = sources.RecordedSource([[prompt_data["prompt"], value]])
+        try:
+            value = func(prompt_data, validate=False, source=source)
+        except (ValueError, TypeError, KeyError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e.args[0]).strip() if e.args else str(e))
+        self.answers.append([prompt_data["prompt"], value])
+        self.touched = time.monotonic()
+
+    def state(self):
+        return {
+            "session": self.id,
+            "user": self.user,
+            "date": str(self.date),
+            "answered": len(self.answers),
+            "total": len(self.plan),
+            "next": self.next_prompt(),
+            "file": self.file,
+        }
+
+
+class JournalServer:
+    """
+    Sessions live in memory, keyed by id, and each user has at most one open session per day. A user's journal_metadata files are
+    written to root/<user>.
+    """
+    def __init__(self, root:str, prompts:dict, sample:int=None):
+        self.root = root
+        self.prompts = prompts
+        self.sample = sample if sample is not None else journal.SAMPLE_MULTILINE
+        self.sessions = {}
+        self.open_sessions = {} # (user, date): session id
+        self.catalog_body = json.dumps(prompts).encode("utf-8")
+        for category, table in records.compile_catalog(prompts).items(): # The journal.prompts models, once for the whole catalog
+            for name, prompt in table.items():
+                records.to_pydantic(prompt)
+        history.yaml_dumper() # Import yaml and journal.habits here rather than in the first executor threads that write sessions, which
+        lazy.warm("journal.habits") # would race to execute the lazy modules
+
+    def user_dir(self, user:str):
+        if type(user) is not str or USER_RE.match(user) is None:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "journal.server: invalid user name {0!r}".format(user))
+        return os.path.join(self.root, user)
+
+    def evict(self, date:datetime.date, now:float):
+        """
+        Drop the sessions of a previous day and those idle for more than SESSION_TTL
+        """
+        for session_id, session in list(self.sessions.items()):
+            if session.date < date or now - session.touched > SESSION_TTL:
+                del self.sessions[session_id]
+                if self.open_sessions.get((session.user, session.date)) == session_id:
+                    del self.open_sessions[(session.user, session.date)]
+
+    def start(self, user:str):
+        journal_dir = self.user_dir(user)
+        date = datetime.date.today()
+        self.evict(date, time.monotonic())
+        if (user, date) in self.open_sessions:
+            return HTTPStatus.OK, self.sessions[self.open_sessions[(user, date)]]
+        if os.path.exists(os.path.join(journal_dir, history.day_filename(date))):
+            raise HTTPError(HTTPStatus.CONFLICT, "journal.server: {0} has already journaled on {1}".format(user, date))
+        session = Session(user, date, session_plan(self.prompts, self.sample))
+        self.sessions[session.id] = session
+        self.open_sessions[(user, date)] = session.id
+        return HTTPStatus.CREATED, session
+
+    def finish(self, session:Session):
+        """
+        Write a completed session with make_prompts (runs in the executor)
+        """
+        journal_dir = self.user_dir(session.user)
+        os.makedirs(journal_dir, exist_ok=True)
+        journal.make_prompts(self.prompts, validated=True, source=sources.RecordedSource(session.answers), date=session.date, journal_dir=journal_dir)
+        return os.path.join(journal_dir, history.day_filename(session.date))
+
+    def get_session(self, session_id:str):
+        if session_id not in self.sessions:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "journal.server: no session {0}".format(session_id))
+        return self.sessions[session_id]
+
+    async def dispatch(self, request:Request):
+        """
+        (status, JSON-able payload or raw bytes) for a request
+        """
+        parts = [p for p in request.path.split("/") if p != ""]
+        if request.method == "GET" and parts == ["catalog"]:
+            return HTTPStatus.OK, self.catalog_body
+        elif request.method == "POST" and parts == ["sessions"]:
+            status, session = self.start(json_body(request).get("user"))
+            return status, session.state()
+        elif request.method == "GET" and len(parts) == 2 and parts[0] == "sessions":
+            return HTTPStatus.OK, self.get_session(parts[1]).state()
+        elif request.method == "POST" and len(parts) == 3 and parts[0] == "sessions" and parts[2] == "answers":
+            session = self.get_session(parts[1])
+            body = json_body(request)
+            if "answer" not in body:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "journal.server: expected {\"answer\": ...}")
+            session.answer(body["answer"])
+            if session.done:
+                try:
+                    session.file = await asyncio.get_running_loop().run_in_executor(None, self.finish, session)
+                except Exception as e:
+                    session.answers.pop() # Answering the last prompt again retries the write
+                    sys.stderr.write("journal.server: could not write the session of {0} for {1} ({2!r})\n".format(session.user, session.date, e))
+                    raise HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, "journal.server: could not write the session ({0}). Answer the last prompt again to retry.".format(e))
+                self.open_sessions.pop((session.user, session.date), None)
+                self.sessions.pop(session.id, None)
+            return HTTPStatus.OK, session.state()
+        raise HTTPError(HTTPStatus.NOT_FOUND, "journal.server: no route for {0} {1}".format(request.method, request.path))
+
+    async def handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        """
+        One client connection; requests are served in turn while the client keeps it alive
+        """
+        try:
+            while True:
+                request = None
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    status, payload = await self.dispatch(request)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e: # Answer rather than drop the connection, then close it
+                    sys.stderr.write("journal.server: internal error on {0} ({1!r})\n".format("{0} {1}".format(request.method, request.path) if request is not None else "a request", e))
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "journal.server: internal error"}
+                    request = None
+                keep_alive = request is not None and request.headers.get("connection", "").lower() != "close"
+                writer.write(response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host:str="127.0.0.1", port:int=8765, unix_path:str=None, ready=None):
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+            address = unix_path
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            address = "http://{0}:{1}".format(*server.sockets[0].getsockname()[:2])
+        sys.stderr.write("journal serve: listening on {0}, journal directories under '{1}'\n".format(address, self.root))
+        if ready is not None:
+            ready.set_result(server)
+        async with server:
+            await server.serve_forever()
+
+
+def json_body(request:Request):
+    try:
+        body = json.loads(request.body) if request.body else {}
+    except json.JSONDecodeError as e:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "journal.server: invalid JSON body ({0})".format(e))
+    if type(body) is not dict:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "journal.server: the request body must be a JSON object")
+    return body
+
+
+async def read_request(reader:asyncio.StreamReader):
+    """
+    Parse one HTTP/1.1 request. None at end of stream.
+    """
+    line = await reader.readline()
+    if line == b"":
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "journal.server: malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "journal.server: invalid Content-Length {0!r}".format(headers.get("content-length")))
+    if length > MAX_BODY:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "journal.server: request body over {0} bytes".format(MAX_BODY))
+    body = await reader.readexactly(length) if length > 0 else b""
+    return Request(method, urlsplit(target).path, headers, body)
+
+
+def response(status:HTTPStatus, payload, keep_alive:bool=True):
+    body = payload if type(payload) is bytes else json.dumps(payload).encode("utf-8")
+    head = "HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\nContent-Length: {2}\r\nConnection: {3}\r\n\r\n".format(
+        status.value, status.phrase, len(body), "keep-alive" if keep_alive else "close")
+    return head.encode("latin-1") + body
+
+
+def serve(root:str, prompts:dict, host:str="127.0.0.1", port:int=8765, unix_path:str=None):
+    """
+    Run the server until interrupted
+    """
+    try:
+        asyncio.run(JournalServer(root, prompts).serve(host, port, unix_path))
+    except KeyboardInterrupt:
+        pass
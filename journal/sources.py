@@ -0,0 +1,278 @@
+import os
+import sys
+
+import abc
+import json
+
+from journal.lazy import lazy_import
+
+inquirer = lazy_import("inquirer")
+yaml = lazy_import("yaml")
+
+from journal import helpers, history, dictionary
+
+"""
+Answer sources for the journal prompts
+
+helpers.prompt_* and helpers.create_goal_list ask an AnswerSource for each answer instead of calling inquirer, input() or the
+prompt_toolkit session themselves:
+
+  InteractiveSource : the terminal (the default)
+  RecordedSource    : a pre-recorded session, e.g. a journal_metadata_<date>.yaml file or the same list of [prompt, answer] pairs as JSON
+
+load_session() reads one recorded session from a YAML/JSON file and stream_sessions() reads many from a stream (stdin) of JSON lines.
+A session record is either a bare list of [prompt, answer] pairs or a mapping:
+
+  {"date": "2025-06-01", "answers": [[prompt, answer], ...], "goals": {"selected": [name, ...], "new": [{"name": ..., "description": ..., "priority": 3, "effort": 5}]}}
+
+Without "selected", every active goal is kept.
+"""
+
+
+class AnswerSource(abc.ABC):
+    """
+    Abstract base class. Every source implements answer(prompt); non-interactive sources get every prompt type from it.
+    'prompt' is the journal.records record of the prompt being asked.
+    """
+    interactive = False
+
+    @abc.abstractmethod
+    def answer(self, prompt):
+        """
+        The answer to one prompt
+        """
+
+    def skips(self, prompt_text:str):
+        """
+        True if the prompt is left out of this session (not recorded)
+        """
+        return False
+
+    def sample(self, category:str, prompts:dict, k:int):
+        """
+        Names of the k prompts asked from a sampled category ({name: prompt data}), or None to let make_prompts choose them
+        """
+        return None
+
+    def boolean(self, prompt):
+        return self.answer(prompt)
+
+    def choice(self, prompt):
+        return self.answer(prompt)
+
+    def multichoice(self, prompt):
+        return self.answer(prompt)
+
+    def text(self, prompt):
+        return self.answer(prompt)
+
+    def singleline(self, prompt):
+        return self.answer(prompt)
+
+    def multiline(self, prompt):
+        return self.answer(prompt)
+
+    def belief(self, prompt, scale_label:str, reason_label:str):
+        return tuple(self.answer(prompt))
+
+    def belief_list(self, prompt, scale_label:str, reason_label:str):
+        return self.answer(prompt)
+
+    def goal_selection(self, prompt):
+        """
+        Names of the existing goals to continue
+        """
+        return self.answer(prompt)
+
+    def new_goals(self, prompt):
+        """
+        (name, description, priority, effort) of each new goal, as they are given
+        """
+        return iter(())
+
+
+class InteractiveSource(AnswerSource):
+    """
+    Answers typed at the terminal
+    """
+    interactive = True
+
+    def answer(self, prompt):
+        """
+        Ask a prompt with the method for its prompt_type (a belief prompt with its own labels)
+        """
+        if prompt.prompt_type == "belief":
+            return self.belief(prompt, prompt.scale_label, prompt.reason_label)
+        elif prompt.prompt_type == "goal":
+            return self.goal_selection(prompt)
+        return getattr(self, prompt.prompt_type)(prompt)
+
+    def boolean(self, prompt):
+        answers = inquirer.prompt([
+            inquirer.Confirm(
+                name=prompt.name,
+                message=prompt.prompt,
+                default=False
+            )
+        ])
+        return answers[prompt.name]
+
+    def choice(self, prompt):
+        answers = inquirer.prompt([
+            inquirer.List(
+                name=prompt.name,
+                message=prompt.prompt,
+                choices=prompt.choices,
+                default=prompt.default
+            )])
+        return answers[prompt.name]
+
+    def multichoice(self, prompt):
+        answers = inquirer.prompt([
+            inquirer.Checkbox(
+                name=prompt.name,
+                message=prompt.prompt,
+                choices=prompt.choices,
+                default=prompt.default
+            )
+        ])
+        return answers[prompt.name]
+
+    def text(self, prompt):
+        return helpers.text_input(prompt.prompt)
+
+    def singleline(self, prompt):
+        sys.stderr.write(helpers.question_mark + prompt.prompt + "\n")
+        user_input = input(">")
+        while user_input == "":
+            sys.stderr.write("journal.py needs a non-trivial single-line input\n")
+            user_input = input()
+        return user_input
+
+    def multiline(self, prompt):
+        sys.stderr.write(helpers.question_mark + prompt.prompt + "\n\n")
+        sys.stderr.write("List your answers below (Empty response terminates):\n")
+        lines = []
+        while True:
+            line = input(">")
+            if line == "":
+                break
+            else:
+                lines.append(line)
+        return lines
+
+    def belief(self, prompt, scale_label:str, reason_label:str):
+        sys.stderr.write(helpers.question_mark + prompt.prompt + "\n\n")
+        return helpers.get_belief(scale_label, reason_label)
+
+    def belief_list(self, prompt, scale_label:str, reason_label:str):
+        sys.stderr.write(helpers.question_mark + prompt.prompt + "\n\n")
+        beliefs = []
+        while True:
+            belief_score, reason = helpers.get_belief(scale_label, reason_label)
+            if belief_score is None and reason is None:
+                break
+            beliefs.append([belief_score, reason])
+        return beliefs
+
+    def goal_selection(self, prompt):
+        answers = inquirer.prompt([
+            inquirer.Checkbox(
+                name=prompt.name,
+                message=prompt.prompt,
+                choices=prompt.choices,
+                default=prompt.default
+            )
+        ])
+        return answers[prompt.name]
+
+    def new_goals(self, prompt):
+        while True:
+            name, goal_desc, priority, effort = helpers.get_goal(prompt.prompt, prompt.description, prompt.desc_prompt_label,
+                                                                 prompt.priority_label, prompt.effort_label)
+            if goal_desc is None and priority is None and effort is None:
+                break
+            yield name, goal_desc, priority, effort
+
+
+class RecordedSource(AnswerSource):
+    """
+    A pre-recorded session. Answers are looked up by prompt text; prompts without a recorded answer are skipped, and a sampled
+    category asks exactly the recorded prompts, in the recorded order.
+    """
+    def __init__(self, answers:list, goals:dict=None, date=None, path:str=None):
+        if type(answers) is not list or not all(type(a) is list and len(a) == 2 for a in answers):
+            raise ValueError("journal.sources.RecordedSource: answers must be a list of [prompt, answer] pairs ({0})".format(path))
+        self.answers = dict(answers)
+        self.order = {prompt: i for i, (prompt, value) in enumerate(answers)}
+        self.goals = goals
+        self.date = date
+        self.path = path
+
+    def answer(self, prompt):
+        try:
+            return self.answers[prompt.prompt]
+        except KeyError:
+            raise KeyError("journal.sources.RecordedSource: no recorded answer for '{0}' ({1})".format(prompt.prompt, self.path))
+
+    def skips(self, prompt_text:str):
+        return prompt_text not in self.answers
+
+    def sample(self, category:str, prompts:dict, k:int):
+        names = [name for name, prompt_data in prompts.items() if prompt_data["prompt"] in self.answers]
+        return sorted(names, key=lambda name: self.order[prompts[name]["prompt"]])
+
+    def goal_selection(self, prompt):
+        if self.goals is None or "selected" not in self.goals: # Nothing recorded: every active goal continues
+            return list(prompt.choices)
+        return self.goals["selected"]
+
+    def new_goals(self, prompt):
+        for goal in (self.goals or {}).get("new", []):
+            yield goal["name"], goal["description"], goal["priority"], goal["effort"]
+
+
+def session_record(record, path:str=None):
+    """
+    RecordedSource for a parsed session record (see module docstring)
+    """
+    if record is None:
+        record = []
+    if type(record) is list:
+        return RecordedSource(record, path=path)
+    elif type(record) is dict:
+        date = history.parse_date(record["date"]) if record.get("date") is not None else None
+        return RecordedSource(record.get("answers", []), record.get("goals"), date, path)
+    raise ValueError("journal.sources.session_record: a session must be a list of [prompt, answer] pairs or a mapping ({0})".format(path))
+
+
+def load_session(path:str):
+    """
+    Read a recorded session from a YAML (journal_metadata_<date>.yaml) or JSON file. The date defaults to the one in the filename.
+    """
+    with open(path, 'r') as ifile:
+        if path.endswith(".json"):
+            record = json.load(ifile)
+        else:
+            record = yaml.load(ifile, Loader=history.yaml_loader())
+    if type(record) is dict and "format" in record: # A dictionary-encoded journal_metadata file
+        record = dictionary.decode_day(record, os.path.dirname(os.path.abspath(path)), path)
+    source = session_record(record, path)
+    if source.date is None:
+        m = history.DAY_FILE_RE.match(os.path.basename(path))
+        if m is not None:
+            source.date = history.parse_date("-".join(m.groups()))
+    return source
+
+
+def stream_sessions(stream):
+    """
+    Recorded sessions from a stream of JSON lines, one session per line
+    """
+    for n, line in enumerate(stream, 1):
+        if line.strip() == "":
+            continue
+        yield session_record(json.loads(line), "{0}:{1}".format(getattr(stream, "name", "<stream>"), n))
+
+
+interactive = InteractiveSource()
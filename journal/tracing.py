@@ -0,0 +1,254 @@
+import os
+import sys
+
+import json
+import time
+import datetime
+import contextlib
+
+from journal import history
+
+"""
+Opt-in latency instrumentation for the journal session (journal --profile)
+
+The prompt helpers, make_prompts, create_goal_list and the affirmations wrap their steps in span(group, step, kind). Each span records
+how long one part of a step took, by kind:
+
+  render     : banners, Markdown and other output
+  validation : schema and pydantic validation, answer checks
+  io         : answer log, journal_metadata file, goal store and sampler index reads/writes
+  user       : waiting for the answer (the source call: typing at the terminal, or a recorded lookup)
+  pause      : deliberate pauses between steps (the affirmations)
+  background : setup run on the journal.preload worker thread, overlapping the other spans (not part of the session's wall time)
+
+Nothing is recorded unless enable() was called, and span() then costs one global lookup. Each session (session()) writes its spans to a
+JSON lines trace in JOURNAL_DIR/.journal/profile:
+
+  {"session": "2025-06-01T07:12:03.120456", "date": "2025-06-01", "version": 1}
+  {"group": "boolean", "step": "cooking_today", "kind": "user", "start_ms": 812.4, "ms": 2210.7}
+  ...
+  {"total_ms": 412874.2}
+
+summarize() tabulates the traces of one or many sessions (journal profile aggregates them across days).
+"""
+
+TRACE_VERSION = 1
+TRACE_DIRNAME = "profile"
+KINDS = ("render", "validation", "io", "user", "pause", "background")
+TOOL_KINDS = ("render", "validation", "io")
+
+_trace_dir = None # Set by enable()
+_active = None # The Trace of the running session
+_written = [] # Trace files written since enable()
+
+
+class Trace:
+    """
+    The spans of one session
+    """
+    def __init__(self, date:datetime.date):
+        self.date = date
+        self.started = datetime.datetime.now()
+        self.t0 = time.perf_counter()
+        self.spans = []
+
+    def add(self, group:str, step:str, kind:str, start:float, end:float):
+        self.spans.append({"group": group, "step": step, "kind": kind, "start_ms": round((start - self.t0) * 1000.0, 3), "ms": round((end - start) * 1000.0, 3)})
+
+    def write(self, path:str):
+        tmp = "{0}.{1}.tmp".format(path, os.getpid())
+        with open(tmp, 'w') as ofile:
+            ofile.write(json.dumps({"session": self.started.isoformat(), "date": str(self.date), "version": TRACE_VERSION}) + "\n")
+            for s in self.spans:
+                ofile.write(json.dumps(s) + "\n")
+            ofile.write(json.dumps({"total_ms": round((time.perf_counter() - self.t0) * 1000.0, 3)}) + "\n")
+        os.replace(tmp, path)
+
+
+class Span:
+    __slots__ = ("trace", "group", "step", "kind", "start")
+
+    def __init__(self, trace:Trace, group:str, step:str, kind:str):
+        self.trace = trace
+        self.group = group
+        self.step = step
+        self.kind = kind
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.group, self.step, self.kind, self.start, time.perf_counter())
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(group:str, step:str, kind:str):
+    """
+    Context manager timing one part of a step. A no-op unless a profiled session is running.
+    """
+    if _active is None:
+        return NULL_SPAN
+    return Span(_active, group, step, kind)
+
+
+def timed(iterable, group:str, step:str, kind:str):
+    """
+    Time each item produced by 'iterable' (e.g. a generator that prompts for one goal at a time)
+    """
+    if _active is None:
+        return iterable
+    return _timed(iter(iterable), group, step, kind)
+
+
+def _timed(iterator, group, step, kind):
+    while True:
+        with span(group, step, kind):
+            item = next(iterator, StopIteration)
+        if item is StopIteration:
+            return
+        yield item
+
+
+def trace_dir(journal_dir:str):
+    return os.path.join(history.index_dir(journal_dir), TRACE_DIRNAME)
+
+
+def enable(journal_dir:str):
+    """
+    Record the sessions run from now on, writing their traces under 'journal_dir'
+    """
+    global _trace_dir
+    _trace_dir = trace_dir(journal_dir)
+    _written.clear()
+
+
+@contextlib.contextmanager
+def session(date:datetime.date=None):
+    """
+    Record the spans of one session and write its trace when it ends (also when it is interrupted)
+    """
+    global _active
+    if _trace_dir is None or _active is not None:
+        yield None
+        return
+    _active = Trace(date if date is not None else datetime.date.today())
+    try:
+        yield _active
+    finally:
+        trace, _active = _active, None
+        path = os.path.join(_trace_dir, "profile_{0}_{1}.jsonl".format(str(trace.date).replace("-", "_"), trace.started.strftime("%H%M%S%f")))
+        try:
+            os.makedirs(_trace_dir, exist_ok=True)
+            trace.write(path)
+            _written.append(path)
+        except OSError as e:
+            sys.stderr.write("journal.tracing: could not write trace '{0}' ({1})\n".format(path, e))
+
+
+"""
+Reading and summarizing traces
+"""
+
+def read_trace(path:str):
+    """
+    (header, spans, total_ms) of a trace file. A trace cut short (no total line) has total_ms None.
+    """
+    header, spans, total = None, [], None
+    with open(path, 'r') as ifile:
+        for line in ifile:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if "session" in record:
+                header = record
+            elif "total_ms" in record:
+                total = record["total_ms"]
+            else:
+                spans.append(record)
+    if header is None or header.get("version") != TRACE_VERSION:
+        raise ValueError("journal.tracing.read_trace: '{0}' is not a version {1} trace".format(path, TRACE_VERSION))
+    return header, spans, total
+
+
+def list_traces(journal_dir:str, start:datetime.date=None, end:datetime.date=None):
+    """
+    Trace files under 'journal_dir' for sessions dated start..end (inclusive), oldest first
+    """
+    directory = trace_dir(journal_dir)
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.startswith("profile_") and n.endswith(".jsonl"))
+    except FileNotFoundError:
+        return []
+    paths = []
+    for name in names:
+        try:
+            date = history.parse_date(name[len("profile_"):len("profile_") + 10])
+        except ValueError:
+            continue
+        if (start is None or date >= start) and (end is None or date <= end):
+            paths.append(os.path.join(directory, name))
+    return paths
+
+
+def summarize(paths:list, by:str="group"):
+    """
+    {"sessions": n, "total_ms": ..., "rows": {row: {kind: ms}}} over the traces, where a row is a span group or ("group", "step") with by="step"
+    """
+    rows = {}
+    sessions = 0
+    total = 0.0
+    for path in paths:
+        header, spans, total_ms = read_trace(path)
+        sessions += 1
+        total += total_ms if total_ms is not None else sum(s["ms"] for s in spans)
+        for s in spans:
+            row = s["group"] if by == "group" else "{0}.{1}".format(s["group"], s["step"])
+            kinds = rows.setdefault(row, dict.fromkeys(KINDS, 0.0))
+            kinds[s["kind"]] = kinds.get(s["kind"], 0.0) + s["ms"]
+    return {"sessions": sessions, "total_ms": total, "rows": rows}
+
+
+def format_summary(summary:dict, per_session:bool=True):
+    """
+    The summary as a table (milliseconds, per session on average unless per_session is False)
+    """
+    n = max(1, summary["sessions"]) if per_session else 1
+    lines = ["{0:32s} {1}{2:>11s}".format("step", "".join("{0:>11s}".format(k) for k in KINDS), "tool")]
+    totals = dict.fromkeys(KINDS, 0.0)
+    for row, kinds in sorted(summary["rows"].items(), key=lambda item: -sum(item[1][k] for k in TOOL_KINDS)):
+        for k in KINDS:
+            totals[k] += kinds.get(k, 0.0)
+        lines.append("{0:32s} {1}{2:11.2f}".format(row[:32], "".join("{0:11.2f}".format(kinds.get(k, 0.0) / n) for k in KINDS),
+                                                   sum(kinds.get(k, 0.0) for k in TOOL_KINDS) / n))
+    tool = sum(totals[k] for k in TOOL_KINDS)
+    lines.append("{0:32s} {1}{2:11.2f}".format("total", "".join("{0:11.2f}".format(totals[k] / n) for k in KINDS), tool / n))
+    wall = summary["total_ms"] / n
+    lines.append("{0} session(s), {1:.1f} ms per session: tool {2:.1f} ms ({3:.1f}%), user {4:.1f} ms, pauses {5:.1f} ms, untraced {6:.1f} ms".format(
+        summary["sessions"], wall, tool / n, 100.0 * tool / n / wall if wall > 0 else 0.0, totals["user"] / n, totals["pause"] / n,
+        wall - sum(v for k, v in totals.items() if k != "background") / n))
+    return "\n".join(lines)
+
+
+def report():
+    """
+    Print the summary of the sessions traced since enable() to stderr
+    """
+    if len(_written) == 0:
+        return
+    sys.stderr.write("\n" + format_summary(summarize(_written)) + "\n")
+    sys.stderr.write("Trace{0}: {1}\n".format("s" if len(_written) > 1 else "", _written[0] if len(_written) == 1 else os.path.dirname(_written[0])))
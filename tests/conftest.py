@@ -0,0 +1,26 @@
+import pytest
+
+import journal
+from journal import catalog
+
+ANSWERS = {
+    "boolean": True,
+    "text": "cooked dinner with friends",
+    "singleline": "fine",
+    "multiline": ["walk", "coffee"],
+    "belief": [[7, "slept well"]],
+}
+
+
+@pytest.fixture(scope="session")
+def prompts():
+    prompts, quotes = catalog.load_catalog(journal.PROMPTS_TOML, journal.QUOTES_TOML, use_cache=False)
+    return prompts
+
+
+@pytest.fixture
+def session_answers(prompts):
+    """
+    [prompt, answer] pairs answering every prompt of the catalog
+    """
+    return [[p["prompt"], ANSWERS[p["prompt_type"]]] for table in prompts.values() for p in table.values()]
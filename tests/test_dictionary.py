@@ -0,0 +1,26 @@
+import os
+import datetime
+
+import journal
+from journal import dictionary, history, sources
+
+
+def write_session(prompts, answers, journal_dir, date):
+    journal.make_prompts(prompts, validated=True, source=sources.RecordedSource(answers), date=date, journal_dir=journal_dir)
+    with open(os.path.join(journal_dir, history.day_filename(date)), 'rb') as ifile:
+        return ifile.read()
+
+
+def test_session_after_migrating_back_is_format_1(tmp_path, prompts, session_answers):
+    journal_dir = str(tmp_path)
+    first = write_session(prompts, session_answers, journal_dir, datetime.date(2025, 1, 1))
+    assert dictionary.day_format(first) == 1
+
+    dictionary.migrate(journal_dir, prompts, to=2, processes=1)
+    assert dictionary.day_format(write_session(prompts, session_answers, journal_dir, datetime.date(2025, 1, 2))) == 2
+
+    dictionary.migrate(journal_dir, prompts, to=1, processes=1)
+    with open(os.path.join(journal_dir, history.day_filename(datetime.date(2025, 1, 1))), 'rb') as ifile:
+        assert ifile.read() == first
+    assert dictionary.day_format(write_session(prompts, session_answers, journal_dir, datetime.date(2025, 1, 3))) == 1
+    assert history.load_day(history.list_days(journal_dir)[-1]) == history.load_day(history.list_days(journal_dir)[0])
@@ -0,0 +1,17 @@
+import datetime
+
+from journal import related
+
+
+def test_add_after_query(tmp_path):
+    index = related.RelatedIndex()
+    index.add_day("a", datetime.date(2025, 1, 1), [["What did you do today?", "cooked dinner with friends"]])
+    assert [m.date for m in index.related("dinner with friends")] == [datetime.date(2025, 1, 1)]
+
+    index.add_day("b", datetime.date(2025, 1, 2), [["What did you do today?", "played guitar after dinner"]])
+    assert [m.date for m in index.related("guitar")] == [datetime.date(2025, 1, 2)]
+    assert [m.date for m in index.related("dinner", before=datetime.date(2025, 1, 2))] == [datetime.date(2025, 1, 1)]
+
+    index.save(str(tmp_path / related.RELATED_INDEX_FILE))
+    index.add_day("a", datetime.date(2025, 1, 1), [["What did you do today?", "a walk"]])
+    assert [m.date for m in index.related("dinner")] == [datetime.date(2025, 1, 2)]
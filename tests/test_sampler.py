@@ -0,0 +1,27 @@
+import pickle
+
+from journal import sampler
+
+
+class LastDraw:
+    """
+    rng whose every draw is the largest float below 1
+    """
+    def random(self):
+        return 1.0 - 2.0 ** -53
+
+
+def test_sample_skips_drawn_prompts_despite_drift():
+    prompts = sampler.PromptSampler({name: {"prompt": name.upper()} for name in "abcd"})
+    prompts.tree.tree[4] += 1e-9 # As if rounding had accumulated in the partial sum of all four weights
+    drawn = prompts.sample(4, rng=LastDraw())
+    assert sorted(drawn) == ["a", "b", "c", "d"]
+    assert list(prompts.tree.weights) == [1.0] * 4
+
+
+def test_tree_is_rebuilt_on_load():
+    tree = sampler.FenwickTree([0.5, 1.5, 2.0])
+    tree.tree[2] += 1e-9
+    loaded = pickle.loads(pickle.dumps(tree))
+    assert list(loaded.weights) == [0.5, 1.5, 2.0]
+    assert list(loaded.tree) == list(sampler.FenwickTree([0.5, 1.5, 2.0]).tree)
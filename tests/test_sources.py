@@ -0,0 +1,17 @@
+from journal import goals, helpers, sources
+
+
+def goal(name:str, priority:int=3):
+    return {"prompt_type": "goal", "name": name, "description": "{0}, in detail".format(name), "priority": priority, "effort": 5, "date": "2025-01-01"}
+
+
+def test_new_goals_without_selection_keep_active_goals(tmp_path):
+    store = goals.GoalStore(str(tmp_path / "goals.sqlite3"))
+    for name in ("write", "run"):
+        store.insert(goal(name))
+    source = sources.session_record({"answers": [], "goals": {"new": [goal("read", priority=5)]}})
+    goal_list = helpers.create_goal_list(store.active(), store=store, source=source)
+    assert goal_list[0]["name"] == "read"
+    assert sorted(g["name"] for g in goal_list[1:]) == ["run", "write"]
+    assert sorted(g["name"] for g in store.active()) == ["read", "run", "write"]
+    store.close()